@@ -0,0 +1,244 @@
+"""tex2qmd benchmarks: every `time_*` function is timed by run.py on each case.
+
+A case is a list of documents (the real corpus under source/, the fiscalité chapters alone, or
+one synthetic document made of those chapters repeated 10 or 100 times). Documents carry their LaTeX and the
+pandoc-like Markdown / JSON produced by pandoc_stub.py, so transforms are timed on their own.
+"""
+import contextlib
+import functools
+import io
+import re
+import tempfile
+from pathlib import Path
+
+from tex2qmd.backend import SubprocessBackend
+from tex2qmd.book import Book, Chapter, build_books, build_chapter_pipeline
+from tex2qmd.convert import (
+    _escape_html_comment,
+    add_placeholders_to_empty_sections,
+    extract_tex_comments,
+    extract_tex_label_captions,
+    fix_tabular_blocks,
+    inject_qmd_comments,
+    prefix_footnote_labels,
+    remove_pandoc_table_attribute_blocks,
+    replace_ref_with_caption,
+    shift_heading_levels,
+)
+from tex2qmd.legislation import LEGISLATION_ENTRIES, _legislation_matcher, link_legislation_citations
+from tex2qmd.pandoc_ast import transform_ast_json
+
+import pandoc_stub
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+SOURCE_DIR = REPO_ROOT / "source"
+SYNTHETIC_BASE_DIR = SOURCE_DIR / "Fiscalité" / "Chapitres"
+PANDOC_STUB = BENCH_DIR / "pandoc_stub.py"
+LABEL_RE = re.compile(r"\\(label|ref)\{([^}]*)\}")
+
+
+class Doc:
+    """One benchmark input: LaTeX source plus everything derived from it once."""
+
+    __slots__ = ("name", "tex", "markdown", "json", "captions", "comments")
+
+    def __init__(self, name: str, tex: str):
+        self.name = name
+        self.tex = tex
+        self.markdown = pandoc_stub.latex_to_markdown(tex)
+        self.json = pandoc_stub.latex_to_json(tex)
+        self.captions = extract_tex_label_captions(tex)
+        self.comments = extract_tex_comments(tex)
+
+    @property
+    def size(self) -> int:
+        return len(self.tex.encode("utf-8"))
+
+
+def _read(path: Path) -> str:
+    raw = path.read_bytes()
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("latin-1")
+
+
+def corpus_docs() -> list[Doc]:
+    """Every .tex file under source/."""
+    return [Doc(str(p.relative_to(SOURCE_DIR)), _read(p)) for p in sorted(SOURCE_DIR.rglob("*.tex"))]
+
+
+def fiscalite_docs() -> list[Doc]:
+    """The fiscalité chapters (source/Fiscalité/Chapitres/*.tex), one document each."""
+    return [Doc(p.name, _read(p)) for p in sorted(SYNTHETIC_BASE_DIR.glob("*.tex"))]
+
+
+def synthetic_docs(scale: int) -> list[Doc]:
+    """One document: the fiscalité chapters repeated `scale` times, labels made unique per copy."""
+    base = "\n".join(_read(p) for p in sorted(SYNTHETIC_BASE_DIR.glob("*.tex")))
+    copies = [LABEL_RE.sub(lambda m, k=k: f"\\{m.group(1)}{{{m.group(2)}-{k}}}", base) for k in range(scale)]
+    return [Doc(f"fiscalite-x{scale}", "\n".join(copies))]
+
+
+def load_case(name: str) -> list[Doc]:
+    """'corpus', 'fiscalite', or 'x<N>' for a synthetic document scaled N times."""
+    if name == "corpus":
+        return corpus_docs()
+    if name == "fiscalite":
+        return fiscalite_docs()
+    if name.startswith("x") and name[1:].isdigit():
+        return synthetic_docs(int(name[1:]))
+    raise ValueError(f"Unknown case: {name}")
+
+
+# --- LaTeX-side transforms ---------------------------------------------------------------
+
+def time_extract_tex_comments(docs: list[Doc]) -> None:
+    for doc in docs:
+        extract_tex_comments(doc.tex)
+
+
+def time_extract_tex_label_captions(docs: list[Doc]) -> None:
+    for doc in docs:
+        extract_tex_label_captions(doc.tex)
+
+
+# --- Markdown-side transforms ------------------------------------------------------------
+
+def time_replace_ref_with_caption(docs: list[Doc]) -> None:
+    for doc in docs:
+        replace_ref_with_caption(doc.markdown, doc.captions)
+
+
+def inject_qmd_comments_linear(qmd_content: str, comments_with_anchors: list[tuple[str, str]]) -> str:
+    """Previous inject_qmd_comments: one scan of the lines per comment, then one list.insert each."""
+    if not comments_with_anchors:
+        return qmd_content
+    qmd_lines = qmd_content.splitlines(keepends=True)
+    inserts: list[tuple[int, str]] = []
+    for comment_text, anchor in comments_with_anchors:
+        comment_line = "<!-- " + _escape_html_comment(comment_text) + " -->\n"
+        if not anchor:
+            inserts.append((len(qmd_lines), comment_line))
+            continue
+        anchor_key = anchor[:50]
+        for idx, qline in enumerate(qmd_lines):
+            if anchor in qline or anchor_key in qline:
+                inserts.append((idx, comment_line))
+                break
+        else:
+            inserts.append((len(qmd_lines), comment_line))
+    inserts.sort(key=lambda x: x[0], reverse=True)
+    for idx, comment_line in inserts:
+        qmd_lines.insert(idx, comment_line)
+    return "".join(qmd_lines)
+
+
+INJECT_IMPLEMENTATIONS = {"indexed": inject_qmd_comments, "linear": inject_qmd_comments_linear}
+
+
+def time_inject_qmd_comments(docs: list[Doc], implementation: str) -> None:
+    """Current (indexed) implementation against the previous O(comments x lines) one."""
+    inject = INJECT_IMPLEMENTATIONS[implementation]
+    for doc in docs:
+        inject(doc.markdown, doc.comments)
+
+
+time_inject_qmd_comments.params = (list(INJECT_IMPLEMENTATIONS),)
+time_inject_qmd_comments.param_names = ("implementation",)
+
+
+def time_remove_pandoc_table_attribute_blocks(docs: list[Doc]) -> None:
+    for doc in docs:
+        remove_pandoc_table_attribute_blocks(doc.markdown)
+
+
+def time_shift_heading_levels(docs: list[Doc]) -> None:
+    for doc in docs:
+        shift_heading_levels(doc.markdown)
+
+
+def time_add_placeholders_to_empty_sections(docs: list[Doc]) -> None:
+    for doc in docs:
+        add_placeholders_to_empty_sections(doc.markdown)
+
+
+def time_fix_tabular_blocks(docs: list[Doc]) -> None:
+    for doc in docs:
+        fix_tabular_blocks(doc.markdown)
+
+
+def time_prefix_footnote_labels(docs: list[Doc]) -> None:
+    for doc in docs:
+        prefix_footnote_labels(doc.markdown, "chapitre")
+
+
+def time_link_legislation_citations(docs: list[Doc]) -> None:
+    for doc in docs:
+        link_legislation_citations(doc.markdown, LEGISLATION_ENTRIES)
+
+
+MONTHS = ("janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août", "septembre", "octobre", "novembre", "décembre")
+
+
+@functools.lru_cache(maxsize=None)
+def padded_legislation_entries(n_patterns: int) -> list[dict]:
+    """LEGISLATION_ENTRIES followed by synthetic décrets, up to `n_patterns` patterns in all."""
+    entries = list(LEGISLATION_ENTRIES)
+    count = sum(len(e["patterns"]) for e in entries)
+    for i in range(max(0, n_patterns - count)):
+        year = 1950 + i % 70
+        day, month = 1 + i % 28, MONTHS[i % 12]
+        entries.append({
+            "key": f"decret{year}_{i}",
+            "patterns": [f"décret n° {year}-{100 + i} du {day} {month} {year}"],
+            "title": f"Décret n° {year}-{100 + i} du {day} {month} {year}",
+            "issued": f"{year}-{1 + i % 12:02d}-{day:02d}",
+        })
+    return entries
+
+
+def time_link_legislation_citations_scaled(docs: list[Doc], n_patterns: int, cache: str) -> None:
+    """Real entries padded with synthetic décrets; 'cold' recompiles the matcher on each run."""
+    entries = padded_legislation_entries(n_patterns)
+    if cache == "cold":
+        _legislation_matcher.cache_clear()
+    for doc in docs:
+        link_legislation_citations(doc.markdown, entries)
+
+
+time_link_legislation_citations_scaled.params = ([100, 1000], ["cold", "warm"])
+time_link_legislation_citations_scaled.param_names = ("n_patterns", "cache")
+
+
+def time_transform_ast(docs: list[Doc]) -> None:
+    for doc in docs:
+        transform_ast_json(doc.json, doc.captions)
+
+
+def time_chapter_pipeline(docs: list[Doc]) -> None:
+    """Every Markdown post-processing stage, as run for a fiscalité chapter."""
+    book = Book("bench", SOURCE_DIR, SOURCE_DIR, [], legislation=True)
+    for doc in docs:
+        chapter = Chapter(doc.name, "bench.qmd", doc.name)
+        build_chapter_pipeline(book, chapter, doc.captions, doc.comments).run(doc.markdown)
+
+
+# --- End to end --------------------------------------------------------------------------
+
+def time_build_books(docs: list[Doc]) -> None:
+    """build_books() on the documents (pandoc stub, every chapter reconverted)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir = Path(tmp) / "source"
+        source_dir.mkdir()
+        chapters = []
+        for i, doc in enumerate(docs):
+            (source_dir / f"{i}.tex").write_text(doc.tex, encoding="utf-8")
+            chapters.append(Chapter(f"{i}.tex", f"c{i}.qmd", doc.name))
+        book = Book("bench", source_dir, Path(tmp) / "out", chapters, legislation=True)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            build_books([book], force=True, backend=SubprocessBackend(str(PANDOC_STUB)))
+
+
+time_build_books.repeat = 2  # seconds per run on the corpus: one pandoc process per file
@@ -0,0 +1,103 @@
+"""Peak memory of `tex2qmd build` per conversion mode: Markdown, --ast and --stream.
+
+    python benchmarks/memory.py                 # guide_IR (v2).tex body repeated 40 times (~3 MB)
+    python benchmarks/memory.py --scale 40 --scale 160
+
+The input is the old income tax guide with its body repeated `scale` times (preamble kept once,
+labels made unique per copy), converted as a one-chapter book with the pandoc stub. Each
+build runs in a fresh interpreter, so peaks do not carry over from one mode to the next, and
+reports its own ru_maxrss. Pandoc processes are not counted: a forked child inherits the
+parent's peak before it execs, so RUSAGE_CHILDREN would only repeat the tex2qmd figure.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+BENCH_DIR = Path(__file__).resolve().parent
+QUARTO_DIR = BENCH_DIR.parent / "quarto"
+GUIDE = BENCH_DIR.parent / "source" / "Old versions" / "guide IR" / "guide_IR (v2).tex"
+PANDOC_STUB = BENCH_DIR / "pandoc_stub.py"
+LABEL_RE = re.compile(r"\\(label|ref)\{([^}]*)\}")
+MODES = (("markdown", []), ("--ast", ["--ast"]), ("--stream", ["--stream"]))
+
+# Runs the CLI in the child, then records its peak resident set size (KiB on Linux)
+CHILD = """\
+import json, resource, runpy, sys
+result_path, sys.argv = sys.argv[1], ["tex2qmd", *sys.argv[2:]]
+try:
+    runpy.run_module("tex2qmd", run_name="__main__", alter_sys=True)
+except SystemExit as exc:
+    if exc.code:
+        raise
+with open(result_path, "w") as f:
+    json.dump(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, f)
+"""
+
+
+def scaled_guide(scale: int) -> str:
+    """guide_IR (v2).tex with its document body repeated `scale` times."""
+    raw = GUIDE.read_bytes()
+    try:
+        tex = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        tex = raw.decode("latin-1")
+    head, _, rest = tex.partition("\\begin{document}")
+    body = rest.rpartition("\\end{document}")[0]
+    copies = [LABEL_RE.sub(lambda m, k=k: f"\\{m.group(1)}{{{m.group(2)}-{k}}}", body) for k in range(scale)]
+    return f"{head}\\begin{{document}}\n{''.join(copies)}\n\\end{{document}}\n"
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python benchmarks/memory.py", description=__doc__.split("\n")[0])
+    parser.add_argument("--scale", type=int, action="append", help="Copies of the guide body (repeatable). Default: 40.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        bin_dir = tmp_path / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "pandoc").symlink_to(PANDOC_STUB)
+        env = dict(
+            os.environ,
+            PATH=f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+            PYTHONPATH=os.pathsep.join(filter(None, [str(QUARTO_DIR), os.environ.get("PYTHONPATH")])),
+            XDG_CACHE_HOME=str(tmp_path / "cache"),
+        )
+        env.pop("TEX2QMD_PANDOC_SERVER", None)
+        result_path = tmp_path / "rusage.json"
+        for scale in args.scale or [40]:
+            source_dir = tmp_path / f"source-x{scale}"
+            source_dir.mkdir()
+            tex_path = source_dir / "guide.tex"
+            tex_path.write_text(scaled_guide(scale), encoding="utf-8")
+            manifest = tmp_path / f"books-x{scale}.json"
+            manifest.write_text(
+                json.dumps({"books": [{
+                    "name": "guide",
+                    "source_dir": str(source_dir),
+                    "out_dir": str(tmp_path / f"out-x{scale}"),
+                    "chapters": [{"tex": "guide.tex", "qmd": "guide.qmd", "title": "Guide"}],
+                }]}),
+                encoding="utf-8",
+            )
+            print(f"== x{scale}: {tex_path.stat().st_size / 1e6:.1f} MB of LaTeX")
+            for label, flags in MODES:
+                command = [
+                    sys.executable, "-c", CHILD, str(result_path),
+                    "build", str(manifest), "--force", "--no-ref-index", *flags,
+                ]
+                t0 = perf_counter()
+                subprocess.run(command, env=env, cwd=tmp_path, stdout=subprocess.DEVNULL, check=True)
+                elapsed = perf_counter() - t0
+                maxrss = json.loads(result_path.read_text())
+                print(f"  {label:<10} peak RSS {maxrss / 1024:7.1f} MiB  ({elapsed:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Offline pandoc stand-in for the benchmarks: LaTeX -> pandoc-like Markdown or JSON AST.
+
+Only the constructs the tex2qmd transforms care about are rendered the way pandoc renders
+them (sections, footnotes, refs, labels, tabular environments); everything else passes
+through. Accepts `--version`, `-f`, `-t`, `-o` and reads stdin when no file is given.
+"""
+import json
+import re
+import sys
+
+SECTION_RE = re.compile(r"^\\(sub)*section\*?\{(.*)\}\s*$")
+FOOTNOTE_RE = re.compile(r"\\footnote\{([^{}]*)\}")
+REF_RE = re.compile(r"\\ref\{([^}]*)\}")
+LABEL_RE = re.compile(r"\\label\{([^}]*)\}")
+COMMAND_RE = re.compile(r"\\(?:newcommand|renewcommand|def)\b.*$")
+
+
+def latex_to_markdown(text: str) -> str:
+    out: list[str] = []
+    notes: list[str] = []
+    in_tabular = False
+
+    def note(m: re.Match) -> str:
+        notes.append(m.group(1))
+        return f"[^{len(notes)}]"
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("%") or COMMAND_RE.match(stripped):
+            continue
+        if stripped.startswith("\\begin{tabular}"):
+            in_tabular = True
+            out.extend(["", "::: tabular", "\\|c\\|c\\|"])
+            continue
+        if stripped.startswith("\\end{tabular}"):
+            in_tabular = False
+            out.extend([":::", ""])
+            continue
+        if in_tabular:
+            out.append(stripped.replace("\\hline", "").replace("\\\\", "\\"))
+            continue
+        m = SECTION_RE.match(stripped)
+        if m:
+            depth = 1 + len(m.group(1) or "") // 3
+            out.extend(["", "#" * depth + " " + m.group(2), ""])
+            continue
+        line = FOOTNOTE_RE.sub(note, line)
+        line = REF_RE.sub(r'[\\[\1\\]](#\1){reference-type="ref" reference="\1"}', line)
+        line = LABEL_RE.sub(r' []{#\1 label="\1"}', line)
+        out.append(line)
+    for i, body in enumerate(notes, start=1):
+        out.extend(["", f"[^{i}]: {body}"])
+    return "\n".join(out) + "\n"
+
+
+def _words(text: str) -> list[dict]:
+    inlines: list[dict] = []
+    for word in text.split():
+        if inlines:
+            inlines.append({"t": "Space"})
+        inlines.append({"t": "Str", "c": word})
+    return inlines
+
+
+def latex_to_json(text: str) -> str:
+    blocks: list[dict] = []
+    for paragraph in latex_to_markdown(text).split("\n\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        m = re.match(r"^(#+) (.*)$", paragraph)
+        if m:
+            blocks.append({"t": "Header", "c": [len(m.group(1)), ["", [], []], _words(m.group(2))]})
+        elif paragraph.startswith("::: tabular"):
+            body = paragraph.split("\n")[1:-1]
+            blocks.append({"t": "Div", "c": [["", ["tabular"], []], [{"t": "RawBlock", "c": ["markdown", "\n".join(body)]}]]})
+        else:
+            blocks.append({"t": "Para", "c": _words(paragraph)})
+    return json.dumps({"pandoc-api-version": [1, 23, 1], "meta": {}, "blocks": blocks})
+
+
+def _inlines_text(inlines: list[dict]) -> str:
+    return "".join(x["c"] if x["t"] == "Str" else " " for x in inlines if x["t"] in ("Str", "Space"))
+
+
+def json_to_markdown(text: str) -> str:
+    out: list[str] = []
+    for block in json.loads(text)["blocks"]:
+        t, c = block["t"], block.get("c")
+        if t == "Header":
+            out.append("#" * c[0] + " " + _inlines_text(c[2]))
+        elif t in ("Para", "Plain"):
+            out.append(_inlines_text(c))
+        elif t == "RawBlock":
+            out.append(c[1])
+    return "\n\n".join(out) + "\n"
+
+
+def main(argv: list[str]) -> int:
+    if argv and argv[0] == "--version":
+        print("pandoc 0.0-stub")
+        return 0
+    src = out = None
+    from_, to = "latex", "markdown"
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in ("-f", "-t", "-o"):
+            value = argv[i + 1]
+            if arg == "-f":
+                from_ = value
+            elif arg == "-t":
+                to = value
+            else:
+                out = value
+            i += 2
+            continue
+        if not arg.startswith("-"):
+            src = arg
+        i += 1
+    if src:
+        raw = open(src, "rb").read()
+        try:
+            text = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            text = raw.decode("latin-1")
+    else:
+        text = sys.stdin.buffer.read().decode("utf-8")
+    if from_ == "json":
+        result = json_to_markdown(text)
+    elif to == "json":
+        result = latex_to_json(text)
+    else:
+        result = latex_to_markdown(text)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(result)
+    else:
+        sys.stdout.buffer.write(result.encode("utf-8"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
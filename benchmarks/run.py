@@ -0,0 +1,119 @@
+"""Run the tex2qmd benchmarks and print (or save / compare) the timings.
+
+    python benchmarks/run.py                       # every benchmark, cases corpus fiscalite x10 x100
+    python benchmarks/run.py -k tabular --case x10
+    python benchmarks/run.py --json results.json   # keep numbers for the next release
+    python benchmarks/run.py --compare results.json
+"""
+import argparse
+import datetime
+import gc
+import inspect
+import itertools
+import json
+import platform
+import statistics
+import sys
+from pathlib import Path
+from time import perf_counter
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path[:0] = [str(BENCH_DIR), str(BENCH_DIR.parent / "quarto")]
+
+import benchmarks  # noqa: E402
+
+DEFAULT_CASES = ("corpus", "fiscalite", "x10", "x100")
+
+
+def discover(keyword: str | None) -> list[tuple[str, object, tuple]]:
+    """(name, function, extra arguments) of every benchmark.
+
+    A function with an asv-style `params` attribute (one list of values per extra argument)
+    gives one benchmark per combination, named `name[value,value]`.
+    """
+    found = [
+        (name[len("time_"):], func)
+        for name, func in inspect.getmembers(benchmarks, inspect.isfunction)
+        if name.startswith("time_") and func.__module__ == benchmarks.__name__
+    ]
+    order = {func: inspect.getsourcelines(func)[1] for _name, func in found}
+    found.sort(key=lambda item: order[item[1]])
+    expanded = []
+    for name, func in found:
+        params = getattr(func, "params", None)
+        if params is None:
+            expanded.append((name, func, ()))
+            continue
+        for combination in itertools.product(*params):
+            expanded.append((f"{name}[{','.join(map(str, combination))}]", func, combination))
+    return [item for item in expanded if not keyword or keyword in item[0]]
+
+
+def measure(func, docs, repeat: int, args: tuple = ()) -> list[float]:
+    """Wall times of `repeat` calls (GC disabled while timing, one warm-up call)."""
+    func(docs, *args)
+    times = []
+    for _ in range(repeat):
+        gc.disable()
+        try:
+            t0 = perf_counter()
+            func(docs, *args)
+            times.append(perf_counter() - t0)
+        finally:
+            gc.enable()
+    return times
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python benchmarks/run.py",
+        description="Time the tex2qmd transforms and the end-to-end conversion (offline pandoc stub).",
+    )
+    parser.add_argument("--case", action="append", help=f"corpus, fiscalite or xN (repeatable). Default: {' '.join(DEFAULT_CASES)}.")
+    parser.add_argument("-k", "--keyword", help="Only benchmarks whose name contains this string.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Timed runs per benchmark (default: 5).")
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file.")
+    parser.add_argument("--compare", type=Path, help="Previous --json results: print the ratio to them.")
+    args = parser.parse_args(argv)
+
+    baseline: dict[tuple[str, str], float] = {}
+    if args.compare:
+        data = json.loads(args.compare.read_text(encoding="utf-8"))
+        baseline = {(r["case"], r["name"]): r["median_s"] for r in data["results"]}
+
+    selected = discover(args.keyword)
+    results = []
+    for case in args.case or DEFAULT_CASES:
+        docs = benchmarks.load_case(case)
+        size = sum(doc.size for doc in docs)
+        print(f"== {case}: {len(docs)} document(s), {size / 1e6:.2f} MB of LaTeX")
+        for name, func, extra in selected:
+            # A benchmark may cap its repetitions (asv-style `repeat` attribute)
+            repeat = min(args.repeat, getattr(func, "repeat", args.repeat))
+            times = measure(func, docs, repeat, extra)
+            median = statistics.median(times)
+            line = f"  {name:<48} min {min(times) * 1000:10.2f} ms  median {median * 1000:10.2f} ms  {size / median / 1e6:8.1f} MB/s"
+            if (case, name) in baseline:
+                line += f"  x{median / baseline[case, name]:.2f} vs baseline"
+            print(line)
+            results.append({
+                "case": case,
+                "name": name,
+                "repeat": repeat,
+                "min_s": min(times),
+                "median_s": median,
+                "input_bytes": size,
+            })
+
+    if args.json:
+        meta = {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        }
+        args.json.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n", encoding="utf-8")
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Time tex2qmd command-line startup: `--help` and a no-op rebuild (every chapter up to date).
+
+    python benchmarks/startup.py                # median of 10 runs, budget 100 ms
+    python benchmarks/startup.py -r 20 --budget 80
+
+Each command runs in a fresh interpreter, as from a shell. The no-op rebuild converts the
+fiscalité chapters once (pandoc stub) into a temporary directory, then times runs where the
+incremental cache skips everything. Exits with status 1 when a median is over the budget.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+BENCH_DIR = Path(__file__).resolve().parent
+QUARTO_DIR = BENCH_DIR.parent / "quarto"
+SOURCE_DIR = BENCH_DIR.parent / "source" / "Fiscalité" / "Chapitres"
+PANDOC_STUB = BENCH_DIR / "pandoc_stub.py"
+
+
+def wall_times(argv: list[str], env: dict[str, str], repeat: int) -> list[float]:
+    times = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        subprocess.run(argv, env=env, cwd=QUARTO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(perf_counter() - t0)
+    return times
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python benchmarks/startup.py", description=__doc__.split("\n")[0])
+    parser.add_argument("-r", "--repeat", type=int, default=10, help="Runs per command (default: 10).")
+    parser.add_argument("--budget", type=float, default=100.0, help="Maximum median in ms (default: 100).")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        bin_dir = tmp_path / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "pandoc").symlink_to(PANDOC_STUB)
+        env = dict(
+            os.environ,
+            PATH=f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+            XDG_CACHE_HOME=str(tmp_path / "cache"),
+            TEX2QMD_SOURCE_DIR=str(SOURCE_DIR),
+        )
+        env.pop("TEX2QMD_PANDOC_SERVER", None)
+        manifest = tmp_path / "books.json"
+        chapters = [{"tex": p.name, "qmd": p.stem + ".qmd", "title": p.stem} for p in sorted(SOURCE_DIR.glob("*.tex"))]
+        manifest.write_text(
+            json.dumps({"books": [{
+                "name": "fiscalite",
+                "source_dir": str(SOURCE_DIR),
+                "out_dir": str(tmp_path / "out"),
+                "legislation": True,
+                "chapters": chapters,
+            }]}),
+            encoding="utf-8",
+        )
+        build = [sys.executable, "-m", "tex2qmd", "build", str(manifest)]
+        wall_times(build, env, 1)  # fills the cache and the pandoc version memo
+
+        commands = [
+            ("tex2qmd-fiscalite --help", [sys.executable, "-m", "tex2qmd.fiscalite", "--help"]),
+            ("tex2qmd --help", [sys.executable, "-m", "tex2qmd", "--help"]),
+            (f"tex2qmd build (no-op, {len(chapters)} chapters)", build),
+            ("python -c pass (interpreter)", [sys.executable, "-c", "pass"]),
+        ]
+        over = False
+        for label, command in commands:
+            times = wall_times(command, env, args.repeat)
+            median = statistics.median(times) * 1000
+            status = ""
+            if command is not commands[-1][1]:
+                status = "ok" if median <= args.budget else "OVER BUDGET"
+                over = over or median > args.budget
+            print(f"  {label:<40} min {min(times) * 1000:7.1f} ms  median {median:7.1f} ms  {status}")
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Time the OpenFisca table chunks of indirecte.qmd in a fresh kernel: lean Table vs pandas Styler.
+
+    python benchmarks/table_kernel.py           # median of 10 runs
+    python benchmarks/table_kernel.py -r 20
+
+Each run is a fresh interpreter (as a Quarto kernel) in quarto/fiscalite/ that displays the
+three registered tables of the chapter, read from their static Markdown: once as Table HTML
+(what the chunks do), once as DataFrame.style.hide(axis="index") HTML (what they did before,
+skipped when pandas is not installed). The difference is the import and render time saved.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+BOOK_DIR = REPO_ROOT / "quarto" / "fiscalite"
+TABLES = ("tva_historique", "tabac_taux_normal", "alcools_droits")
+
+CHUNK = (
+    "from quarto.openfisca_tables.registry import get_table\n"
+    "import chapters.indirecte.openfisca_tables\n"
+    "for name in {tables!r}:\n"
+    "    {display}\n"
+)
+LEAN = "get_table(name)._repr_html_()"
+STYLER = "get_table(name).to_pandas().style.hide(axis='index')._repr_html_()"
+
+
+def wall_times(code: str, env: dict[str, str], repeat: int) -> list[float]:
+    times = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        subprocess.run([sys.executable, "-c", code], env=env, cwd=BOOK_DIR, stdout=subprocess.DEVNULL, check=True)
+        times.append(perf_counter() - t0)
+    return times
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python benchmarks/table_kernel.py", description=__doc__.split("\n")[0])
+    parser.add_argument("-r", "--repeat", type=int, default=10, help="Runs per variant (default: 10).")
+    args = parser.parse_args(argv)
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])),
+        QUARTO_PARAM_USE_OPENFISCA_TABLES="false",  # static tables: no openfisca-france needed
+    )
+    has_pandas = subprocess.run([sys.executable, "-c", "import pandas, jinja2"], capture_output=True).returncode == 0
+    variants = [
+        ("python -c pass (interpreter)", "pass"),
+        ("Table HTML (3 tables)", CHUNK.format(tables=TABLES, display=LEAN)),
+    ]
+    if has_pandas:
+        variants.append(("pandas Styler HTML (3 tables)", CHUNK.format(tables=TABLES, display=STYLER)))
+    medians = {}
+    for label, code in variants:
+        times = wall_times(code, env, args.repeat)
+        medians[label] = statistics.median(times) * 1000
+        print(f"  {label:<40} min {min(times) * 1000:7.1f} ms  median {medians[label]:7.1f} ms")
+    if has_pandas:
+        saved = medians[variants[2][0]] - medians[variants[1][0]]
+        print(f"  {'saved per kernel':<40} {saved:7.1f} ms")
+    else:
+        print("  pandas Styler variant skipped (pandas or jinja2 not installed)")
+
+
+if __name__ == "__main__":
+    main()
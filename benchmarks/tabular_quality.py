@@ -0,0 +1,54 @@
+"""Measure how well fix_tabular_blocks repairs the ``::: tabular`` blocks of a case.
+
+    python benchmarks/tabular_quality.py                   # corpus
+    python benchmarks/tabular_quality.py --case x10 --json quality.json
+    python benchmarks/tabular_quality.py --list            # one line per malformed table
+
+Figures (see tex2qmd/tabular.py): tables flagged as malformed, mean header fill, share of
+columns typed as years / amounts / percents, empty and padded cells. Compare them before
+and after a change to the repair heuristics.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path[:0] = [str(BENCH_DIR), str(BENCH_DIR.parent / "quarto")]
+
+import benchmarks  # noqa: E402
+from tex2qmd.convert import TABULAR_BLOCK_RE  # noqa: E402
+from tex2qmd.tabular import parse_tabular, tabular_quality  # noqa: E402
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python benchmarks/tabular_quality.py", description=__doc__.split("\n")[0])
+    parser.add_argument("--case", action="append", help="corpus or xN (repeatable). Default: corpus.")
+    parser.add_argument("--list", action="store_true", help="List the tables flagged as malformed.")
+    parser.add_argument("--json", type=Path, help="Write the figures to this JSON file.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for case in args.case or ["corpus"]:
+        tables = []
+        for doc in benchmarks.load_case(case):
+            for match in TABULAR_BLOCK_RE.finditer(doc.markdown):
+                table = parse_tabular(match.group(1))
+                if table is None:
+                    continue
+                tables.append(table)
+                if args.list and table.malformed:
+                    print(f"  {doc.name}: {table.ncols} cols, header {table.header}")
+        quality = results[case] = tabular_quality(tables)
+        print(
+            f"== {case}: {quality['tables']} tables, {quality['malformed']} malformed ({quality['malformed_rate']:.1%}), "
+            f"header fill {quality['header_fill']:.1%}, typed columns {quality['typed_column_rate']:.1%}, "
+            f"empty cells {quality['empty_cell_rate']:.1%}, padded cells {quality['padded_cell_rate']:.1%}"
+        )
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@ from quarto.openfisca_tables.core import (
     table_from_parameters_df,
     table_from_parameters_md,
 )
+from quarto.openfisca_tables.registry import register_table
+from quarto.openfisca_tables.table import Table
 
 __all__ = [
     "ParameterSpec",
@@ -56,6 +58,34 @@ ALCOOLS_DROITS_SPEC: list[ParameterSpec] = [
 ]
 
 
+# Registered tables: precomputed by `python -m quarto.openfisca_tables.registry`,
+# read in chunks with get_table(name)
+register_table(
+    "tva_historique",
+    TVA_PARAMETERS_SPEC,
+    row_column_name="Type de taux",
+    start_year=DEFAULT_TVA_START_YEAR,
+    static_md="chapters/indirecte/tables/tva_historique_static.md",
+    caption="Évolution des taux de TVA en France depuis 1972.",
+)
+register_table(
+    "tabac_taux_normal",
+    TABAC_TAUX_NORMAL_SPEC,
+    row_column_name="Type de tabac",
+    start_year=DEFAULT_TABAC_START_YEAR,
+    static_md="chapters/indirecte/tables/tabac_taux_normal_static.md",
+    caption="Évolution des taux normaux du droit de consommation sur les tabacs (par type).",
+)
+register_table(
+    "alcools_droits",
+    ALCOOLS_DROITS_SPEC,
+    row_column_name="Type de boisson",
+    start_year=DEFAULT_ALCOOLS_START_YEAR,
+    static_md="chapters/indirecte/tables/alcools_droits_static.md",
+    caption="Évolution des droits par type de boisson (€/hl ou assimilé).",
+)
+
+
 # --- TVA table (predefined use of table_from_parameters) ---
 # Uses metadata.unit and units.yaml from the package for formatting (e.g. "20 %").
 
@@ -63,7 +93,7 @@ ALCOOLS_DROITS_SPEC: list[ParameterSpec] = [
 def table_tva_historique(
     annees: list[int] | None = None,
     start_year: int = DEFAULT_TVA_START_YEAR,
-) -> "pd.DataFrame | None":
+) -> Table | None:
     """
     Build the "Évolution des taux de TVA en France" table from openfisca-france parameters.
     Unit formatting (e.g. %) comes from parameter metadata and units.yaml.
@@ -95,8 +125,9 @@ def table_tva_historique_df(
     annees: list[int] | None = None,
     start_year: int = DEFAULT_TVA_START_YEAR,
 ) -> "pd.DataFrame | None":
-    """Return the TVA historique table as a pandas DataFrame for Quarto. In a chunk: table_tva_historique_df()"""
-    return table_tva_historique(annees=annees, start_year=start_year)
+    """Return the TVA historique table as a pandas DataFrame (imports pandas)."""
+    table = table_tva_historique(annees=annees, start_year=start_year)
+    return table.to_pandas() if table is not None else None
 
 
 # --- Tabac table (taux normal droit de consommation par type, evolution) ---
@@ -105,7 +136,7 @@ def table_tva_historique_df(
 def table_tabac_taux_normal(
     annees: list[int] | None = None,
     start_year: int = DEFAULT_TABAC_START_YEAR,
-) -> "pd.DataFrame | None":
+) -> Table | None:
     """Évolution des taux normaux du droit de consommation sur les tabacs (par type). Units from package."""
     return table_from_parameters(
         parameters=TABAC_TAUX_NORMAL_SPEC,
@@ -120,8 +151,9 @@ def table_tabac_taux_normal_df(
     annees: list[int] | None = None,
     start_year: int = DEFAULT_TABAC_START_YEAR,
 ) -> "pd.DataFrame | None":
-    """Return the tabac taux normal table as a DataFrame for Quarto."""
-    return table_tabac_taux_normal(annees=annees, start_year=start_year)
+    """Return the tabac taux normal table as a pandas DataFrame (imports pandas)."""
+    table = table_tabac_taux_normal(annees=annees, start_year=start_year)
+    return table.to_pandas() if table is not None else None
 
 
 # --- Alcools table (droits par type de boisson, evolution) ---
@@ -130,7 +162,7 @@ def table_tabac_taux_normal_df(
 def table_alcools_droits(
     annees: list[int] | None = None,
     start_year: int = DEFAULT_ALCOOLS_START_YEAR,
-) -> "pd.DataFrame | None":
+) -> Table | None:
     """Évolution des droits (€/hl ou assimilé) par type de boisson. Units from package."""
     return table_from_parameters(
         parameters=ALCOOLS_DROITS_SPEC,
@@ -145,5 +177,6 @@ def table_alcools_droits_df(
     annees: list[int] | None = None,
     start_year: int = DEFAULT_ALCOOLS_START_YEAR,
 ) -> "pd.DataFrame | None":
-    """Return the alcools droits table as a DataFrame for Quarto."""
-    return table_alcools_droits(annees=annees, start_year=start_year)
+    """Return the alcools droits table as a pandas DataFrame (imports pandas)."""
+    table = table_alcools_droits(annees=annees, start_year=start_year)
+    return table.to_pandas() if table is not None else None
@@ -2,61 +2,107 @@
 Core helpers to build tables from OpenFisca-France parameters for Quarto.
 
 These helpers load parameters and units from the installed openfisca-france package
-via importlib.resources (no filesystem paths). Requires: openfisca-france, pyyaml, pandas.
+via importlib.resources (no filesystem paths). Requires: openfisca-france and pyyaml
+(or a compiled parameter store, see store.py). Parsed files are cached per process (see
+clear_parameter_cache). Tables are lean Table objects (table.py); pandas is only imported by
+Table.to_pandas() and the *_df helpers. pyyaml, importlib.metadata and importlib.resources are
+imported on first use: parameters_available() probes with find_spec, so a kernel that falls
+back to static tables never imports them.
 """
 
 from __future__ import annotations
 
-import importlib.resources
+import bisect
+import datetime
+import functools
+import importlib.util
+from pathlib import Path
 from typing import Any, Callable
 
-try:
-    import yaml
-except ImportError:
-    yaml = None
-
-try:
-    import pandas as pd
-except ImportError:
-    pd = None
+from .table import MISSING, Table
 
 
 # Type for parameter spec: (package_relative_path, row_label)
 ParameterSpec = tuple[str, str]
 
 
-def load_parameter_from_package(relative_path: str) -> dict[str, Any] | None:
+@functools.lru_cache(maxsize=None)
+def module_available(name: str) -> bool:
+    """True if module `name` is installed (importlib.util.find_spec: nothing is imported)."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+@functools.lru_cache(maxsize=1)
+def _yaml() -> Any:
+    """The yaml module, imported on first use (None if pyyaml is not installed)."""
+    if not module_available("yaml"):
+        return None
+    import yaml
+
+    return yaml
+
+
+def _parse_yaml(text: str) -> Any:
+    """yaml.safe_load, with the libyaml C loader when available."""
+    yaml = _yaml()
+    return yaml.load(text, Loader=getattr(yaml, "CSafeLoader", None) or yaml.SafeLoader)
+
+
+@functools.lru_cache(maxsize=1)
+def openfisca_france_version() -> str | None:
+    """Installed openfisca-france version (None if not installed). Part of every cache key."""
+    if not module_available("openfisca_france"):
+        return None
+    import importlib.metadata
+
+    try:
+        return importlib.metadata.version("openfisca-france")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def parameters_available() -> bool:
     """
-    Load a parameter YAML from the installed openfisca-france package.
+    Cheap probe: can parameters be read at all?
 
-    relative_path: path relative to the package root, e.g.
-        "parameters/taxation_indirecte/tva/taux_normal.yaml"
+    True with a usable compiled parameter store (see store.py: present, readable, built for
+    the installed version), or with openfisca-france and pyyaml installed. Checked without
+    importing either, so table builders can be skipped outright when they would only fail.
     """
-    if yaml is None:
-        return None
+    from .store import load_parameter_store
+
+    # Loaded once per process: the tables read their parameters from it right after
+    if load_parameter_store() is not None:
+        return True
+    return module_available("openfisca_france") and module_available("yaml")
+
+
+@functools.lru_cache(maxsize=None)
+def _load_parameter_cached(version: str | None, relative_path: str) -> dict[str, Any] | None:
+    import importlib.resources
+
     try:
         parts = relative_path.split("/")
         ref = importlib.resources.files("openfisca_france")
         for p in parts:
             ref = ref / p
         text = ref.read_text(encoding="utf-8")
-        return yaml.safe_load(text)
+        return _parse_yaml(text)
     except Exception:
         return None
 
 
-def load_units_from_package() -> dict[str, dict[str, Any]]:
-    """
-    Load units.yaml from the installed openfisca-france package.
+@functools.lru_cache(maxsize=None)
+def _load_units_cached(version: str | None) -> dict[str, dict[str, Any]]:
+    import importlib.resources
 
-    Returns a dict mapping unit name (e.g. '/1') to unit info (short_label, ratio, etc.).
-    """
-    if yaml is None:
-        return {}
     try:
         ref = importlib.resources.files("openfisca_france") / "units.yaml"
         text = ref.read_text(encoding="utf-8")
-        data = yaml.safe_load(text)
+        data = _parse_yaml(text)
         if not isinstance(data, list):
             return {}
         return {u["name"]: u for u in data if isinstance(u, dict) and "name" in u}
@@ -64,6 +110,58 @@ def load_units_from_package() -> dict[str, dict[str, Any]]:
         return {}
 
 
+def load_parameter_from_package(relative_path: str) -> dict[str, Any] | None:
+    """
+    Load a parameter YAML from the installed openfisca-france package.
+
+    relative_path: path relative to the package root, e.g.
+        "parameters/taxation_indirecte/tva/taux_normal.yaml"
+
+    Read from the compiled parameter store when one is available (see store.py), otherwise
+    parsed once per process, keyed by (openfisca-france version, path); the returned dict is
+    shared between callers and must not be modified. See clear_parameter_cache().
+    """
+    from .store import stored_parameter
+
+    stored = stored_parameter(relative_path)
+    if stored is not None:
+        return stored
+    if _yaml() is None or not module_available("openfisca_france"):
+        return None
+    return _load_parameter_cached(openfisca_france_version(), relative_path)
+
+
+def load_units_from_package() -> dict[str, dict[str, Any]]:
+    """
+    Load units.yaml from the installed openfisca-france package.
+
+    Returns a dict mapping unit name (e.g. '/1') to unit info (short_label, ratio, etc.).
+    Cached like load_parameter_from_package.
+    """
+    from .store import stored_units
+
+    stored = stored_units()
+    if stored is not None:
+        return stored
+    if _yaml() is None or not module_available("openfisca_france"):
+        return {}
+    return _load_units_cached(openfisca_france_version())
+
+
+def clear_parameter_cache() -> None:
+    """Forget cached parameters, subtrees, units, package version and store (e.g. after upgrading openfisca-france)."""
+    from .store import load_parameter_store
+    from .subtree import clear_subtree_cache
+
+    load_parameter_store.cache_clear()
+    clear_subtree_cache()
+    _load_parameter_cached.cache_clear()
+    _load_units_cached.cache_clear()
+    openfisca_france_version.cache_clear()
+    module_available.cache_clear()
+    _yaml.cache_clear()
+
+
 def _unit_short_label(unit_info: dict[str, Any] | None) -> str:
     """Extract short_label from a unit entry (handles string or {one, other} dict)."""
     if not unit_info:
@@ -86,8 +184,6 @@ def _unit_short_label_for_year(unit_info: dict[str, Any] | None, year: int | Non
         return ""
     if "units" in unit_info and year is not None:
         # Date-dependent unit (e.g. currency): pick sub-unit in effect at start of year
-        import datetime
-
         sub_units = unit_info["units"]
         if hasattr(sub_units, "keys"):
             year_start = datetime.date(year, 1, 1)
@@ -130,6 +226,61 @@ def format_value_with_unit(
     return s
 
 
+def _as_date(d: Any) -> datetime.date:
+    """Date key of a parameter value (datetime.date from YAML, or 'YYYY-MM-DD' string)."""
+    if isinstance(d, datetime.date):
+        return d
+    text = str(d)
+    try:
+        return datetime.date.fromisoformat(text[:10])
+    except ValueError:
+        return datetime.date(int(text[:4]), 1, 1)
+
+
+def _number(v: Any) -> float | None:
+    """Numeric value of a parameter entry ({"value": x} or x); None for null/non-numeric entries."""
+    if isinstance(v, dict) and v.get("value") is not None:
+        return float(v["value"])
+    if isinstance(v, (int, float)):
+        return float(v)
+    return None
+
+
+class StepFunction:
+    """
+    Parameter values as a step function: sorted start dates and the value in effect from each.
+
+    Entries without a numeric value (e.g. {"value": null}) are skipped, as in value_at_year:
+    the previous value stays in effect. Lookups are a bisect on the dates.
+    """
+
+    __slots__ = ("dates", "values")
+
+    def __init__(self, dates: list[datetime.date], values: list[float]):
+        self.dates = dates
+        self.values = values
+
+    @classmethod
+    def from_param_data(cls, param_data: dict[str, Any] | None) -> "StepFunction":
+        points: list[tuple[datetime.date, float]] = []
+        if param_data and "values" in param_data:
+            for d, v in param_data["values"].items():
+                number = _number(v)
+                if number is not None:
+                    points.append((_as_date(d), number))
+        points.sort(key=lambda p: p[0])
+        return cls([d for d, _v in points], [v for _d, v in points])
+
+    def at(self, when: datetime.date) -> float | None:
+        """Value in effect on `when` (None before the first date)."""
+        i = bisect.bisect_right(self.dates, when) - 1
+        return self.values[i] if i >= 0 else None
+
+    def at_year(self, year: int) -> float | None:
+        """Value from the latest date within or before `year` (value_at_year semantics)."""
+        return self.at(datetime.date(year, 12, 31))
+
+
 def value_at_year(param_data: dict[str, Any], year: int) -> float | None:
     """
     Get parameter value in effect at the start of year.
@@ -139,26 +290,18 @@ def value_at_year(param_data: dict[str, Any], year: int) -> float | None:
     """
     if not param_data or "values" not in param_data:
         return None
+    return StepFunction.from_param_data(param_data).at_year(year)
 
-    def _date_key(d: Any) -> Any:
-        return d if hasattr(d, "year") else str(d)
-
-    dates = sorted(param_data["values"].keys(), key=_date_key, reverse=True)
-    for d in dates:
-        y = d.year if hasattr(d, "year") else int(str(d)[:4])
-        if y <= year:
-            v = param_data["values"][d]
-            if isinstance(v, dict) and v.get("value") is not None:
-                return float(v["value"])
-            if isinstance(v, (int, float)):
-                return float(v)
-    return None
+
+def value_at_date(param_data: dict[str, Any], when: datetime.date) -> float | None:
+    """Get parameter value in effect on a given day."""
+    if not param_data or "values" not in param_data:
+        return None
+    return StepFunction.from_param_data(param_data).at(when)
 
 
 def _max_year_in_param_data(param_data_list: list[tuple[str, dict[str, Any]]]) -> int:
     """Latest year that appears in any of the parameter values."""
-    import datetime
-
     out = datetime.date.today().year
     for _label, data in param_data_list:
         if not data or "values" not in data:
@@ -169,6 +312,62 @@ def _max_year_in_param_data(param_data_list: list[tuple[str, dict[str, Any]]]) -
     return out
 
 
+GRANULARITIES = ("year", "month", "day")
+
+
+def _period_end(start: datetime.date, granularity: str) -> datetime.date:
+    """Last day of the period (year, month or day) starting at `start`."""
+    if granularity == "year":
+        return datetime.date(start.year, 12, 31)
+    if granularity == "month":
+        next_month = datetime.date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        return next_month - datetime.timedelta(days=1)
+    return start
+
+
+def _period_start(d: datetime.date, granularity: str) -> datetime.date:
+    if granularity == "year":
+        return datetime.date(d.year, 1, 1)
+    if granularity == "month":
+        return datetime.date(d.year, d.month, 1)
+    return d
+
+
+def _previous_period(start: datetime.date, granularity: str) -> datetime.date:
+    return _period_start(start - datetime.timedelta(days=1), granularity)
+
+
+def periods_where_any_change(
+    start: datetime.date,
+    steps: list[StepFunction],
+    granularity: str = "year",
+    end: datetime.date | None = None,
+) -> list[datetime.date]:
+    """
+    Start dates of the periods from `start` onward where at least one step function changes.
+
+    Only periods containing a breakpoint of some parameter can differ from the previous one,
+    so the breakpoints are merged and each is checked once (no period-by-period scan). A period's
+    value is the one in effect on its last day.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}, got {granularity!r}")
+    first = _period_start(start, granularity)
+    candidates = sorted({_period_start(d, granularity) for step in steps for d in step.dates})
+
+    def profile(period: datetime.date) -> tuple[float | None, ...]:
+        when = _period_end(period, granularity)
+        return tuple(step.at(when) for step in steps)
+
+    out = [first]
+    for period in candidates:
+        if period <= first or (end is not None and period > end):
+            continue
+        if profile(period) != profile(_previous_period(period, granularity)):
+            out.append(period)
+    return out
+
+
 def _years_where_any_change(
     start_year: int,
     param_data_list: list[tuple[str, dict[str, Any]]],
@@ -179,15 +378,19 @@ def _years_where_any_change(
         return []
     if max_year is None:
         max_year = _max_year_in_param_data(param_data_list)
+    steps = [StepFunction.from_param_data(data) for _label, data in param_data_list]
+    periods = periods_where_any_change(
+        datetime.date(start_year, 1, 1), steps, "year", datetime.date(max_year, 12, 31)
+    )
+    return [p.year for p in periods]
 
-    def profile(y: int) -> tuple[float | None, ...]:
-        return tuple(value_at_year(data, y) for _label, data in param_data_list)
 
-    change_years: list[int] = [start_year]
-    for y in range(start_year + 1, max_year + 1):
-        if profile(y) != profile(y - 1):
-            change_years.append(y)
-    return change_years
+def _period_label(period: datetime.date, granularity: str) -> str:
+    if granularity == "year":
+        return str(period.year)
+    if granularity == "month":
+        return period.strftime("%Y-%m")
+    return period.isoformat()
 
 
 def table_from_parameters(
@@ -196,62 +399,67 @@ def table_from_parameters(
     annees: list[int] | None = None,
     start_year: int | None = None,
     format_value: Callable[[float], str] | None = None,
-) -> "pd.DataFrame | None":
+    granularity: str = "year",
+) -> Table | None:
     """
     Build a table from a list of OpenFisca parameters (generic).
 
     parameters: list of (path_in_package, row_label), e.g.
-        [("parameters/.../taux_normal.yaml", "Normal"), ...]
+        [("parameters/.../taux_normal.yaml", "Normal"), ...]; a glob path
+        ("parameters/.../taxes_assurances/*", "{description}") gives one row per parameter
+        of the subtree, loaded in bulk (see subtree.py).
     row_column_name: name of the first column (row labels).
     annees: years to show as columns. If None, years from start_year where at least
         one parameter changes.
     start_year: first year when annees is None (required if annees is None).
     format_value: optional formatter for numeric cells, e.g. lambda v: f"{v*100:.1f}".replace(".", ",").
         If None, uses parameter units from metadata + units.yaml.
+    granularity: "year" (default), "month" or "day": with annees=None, one column per
+        month ("YYYY-MM") or day ("YYYY-MM-DD") where a value changes.
 
-    Returns a DataFrame with row_column_name + one column per year. Missing values as "–".
+    Returns a Table with row_column_name + one column per period. Missing values as "–".
     """
-    if pd is None:
-        return None
+    from .subtree import expand_parameter_spec
 
-    param_data_list: list[tuple[str, dict[str, Any]]] = []
-    for path, label in parameters:
-        data = load_parameter_from_package(path)
-        if data is None:
-            continue
-        param_data_list.append((label, data))
+    param_data_list = expand_parameter_spec(parameters)
 
     if not param_data_list:
         return None
 
-    if annees is None:
+    # One sorted step function per parameter, reused for change detection and every cell
+    steps = [StepFunction.from_param_data(data) for _label, data in param_data_list]
+    if annees is not None:
+        periods = [datetime.date(y, 1, 1) for y in annees]
+        granularity = "year"
+    else:
         if start_year is None:
             return None
-        annees = _years_where_any_change(start_year, param_data_list)
+        max_year = _max_year_in_param_data(param_data_list)
+        periods = periods_where_any_change(
+            datetime.date(start_year, 1, 1), steps, granularity, datetime.date(max_year, 12, 31)
+        )
 
     # When format_value is None, use parameter units (metadata.unit + units.yaml)
     use_units = format_value is None
     if use_units:
         units = load_units_from_package()
 
-    rows: list[dict[str, Any]] = []
-    for label, data in param_data_list:
-        row: dict[str, Any] = {row_column_name: label}
-        for year in annees:
-            val = value_at_year(data, year)
+    labels = [_period_label(p, granularity) for p in periods]
+    rows: list[tuple[str, ...]] = []
+    for (label, data), step in zip(param_data_list, steps):
+        row = [label]
+        for period in periods:
+            val = step.at(_period_end(period, granularity))
             if val is not None:
                 if use_units:
-                    row[str(year)] = format_value_with_unit(val, data, units, year)
+                    row.append(format_value_with_unit(val, data, units, period.year))
                 else:
-                    row[str(year)] = format_value(val)
+                    row.append(format_value(val))
             else:
-                row[str(year)] = "–"
-        rows.append(row)
+                row.append(MISSING)
+        rows.append(tuple(row))
 
-    df = pd.DataFrame(rows)
-    cols = [row_column_name] + [str(y) for y in annees]
-    df = df[[c for c in cols if c in df.columns]]
-    return df
+    return Table([row_column_name, *labels], rows)
 
 
 def table_from_parameters_md(
@@ -260,19 +468,19 @@ def table_from_parameters_md(
     annees: list[int] | None = None,
     start_year: int | None = None,
     format_value: Callable[[float], str] | None = None,
-    unavailable_message: str = "*Tableau non disponible (installer openfisca-france, pyyaml et pandas).*",
+    unavailable_message: str = "*Tableau non disponible (installer openfisca-france et pyyaml).*",
 ) -> str:
     """Return the table as a Markdown pipe table."""
-    df = table_from_parameters(
+    table = table_from_parameters(
         parameters=parameters,
         row_column_name=row_column_name,
         annees=annees,
         start_year=start_year,
         format_value=format_value,
     )
-    if df is None:
+    if table is None:
         return unavailable_message
-    return _dataframe_to_markdown(df)
+    return table.to_markdown()
 
 
 def table_from_parameters_df(
@@ -282,52 +490,53 @@ def table_from_parameters_df(
     start_year: int | None = None,
     format_value: Callable[[float], str] | None = None,
 ) -> "pd.DataFrame | None":
-    """Return the table as a pandas DataFrame for Quarto to render."""
-    return table_from_parameters(
+    """Return the table as a pandas DataFrame (imports pandas; chunks can display the Table itself)."""
+    table = table_from_parameters(
         parameters=parameters,
         row_column_name=row_column_name,
         annees=annees,
         start_year=start_year,
         format_value=format_value,
     )
-
-
-def _dataframe_to_markdown(df: "pd.DataFrame") -> str:
-    """Convert DataFrame to Markdown pipe table."""
-    lines = []
-    cols = list(df.columns)
-    lines.append("| " + " | ".join(str(c) for c in cols) + " |")
-    lines.append("|" + "|".join("---" for _ in cols) + "|")
-    for _, row in df.iterrows():
-        lines.append("| " + " | ".join(str(row[c]) for c in cols) + " |")
-    return "\n".join(lines)
+    return table.to_pandas() if table is not None else None
 
 
 def get_table_or_static(
-    openfisca_func: Callable[[], "pd.DataFrame | None"],
+    openfisca_func: Callable[[], Table | None],
     static_md_path: str,
     use_openfisca_env_var: str = "QUARTO_PARAM_USE_OPENFISCA_TABLES",
-) -> "pd.DataFrame":
+) -> Table:
     """
-    Return a DataFrame for Quarto: from OpenFisca if param is true, else parse static markdown table.
+    Return a Table for Quarto: from OpenFisca if param is true, else the static markdown table.
+
+    openfisca_func is not called when no parameters can be read (see parameters_available()).
+    The static table is read through the compiled fallback store (see static.py).
     """
     import os
-    from pathlib import Path
     import sys
 
+    from .registry import find_book_dir
+    from .static import read_static_table
+
     use_of = os.environ.get(use_openfisca_env_var, "true").lower() in ("true", "1", "yes")
     if use_of:
-        df = openfisca_func()
-        if df is not None:
+        table = openfisca_func() if parameters_available() else None
+        if table is not None:
             # Use OpenFisca output only if it contains data.
-            if not hasattr(df, "empty") or not df.empty:
+            if not hasattr(table, "empty") or not table.empty:
                 print(f"[openfisca] using OpenFisca for {static_md_path}", file=sys.stderr)
-                return df
+                return table
         print(f"[openfisca] fallback to static table for {static_md_path}", file=sys.stderr)
-    # Parse static markdown table (skip caption/note lines)
     path = Path(static_md_path)
-    if not path.is_file() or pd is None:
-        return pd.DataFrame() if pd else None  # type: ignore[return-value]
+    table = read_static_table(path, find_book_dir(path.resolve().parent))
+    return table if table is not None else Table(())
+
+
+def read_markdown_table(path: str | Path) -> Table | None:
+    """Parse a Markdown pipe table file (caption/note lines starting with * are skipped)."""
+    path = Path(path)
+    if not path.is_file():
+        return None
     text = path.read_text(encoding="utf-8")
     lines = [l.strip() for l in text.strip().split("\n") if l.strip() and not l.strip().startswith("*")]
     rows = []
@@ -337,5 +546,5 @@ def get_table_or_static(
             if cells and not all(c == "" or set(c) <= set("-") for c in cells):
                 rows.append(cells)
     if rows:
-        return pd.DataFrame(rows[1:], columns=rows[0])
-    return pd.DataFrame()
+        return Table(rows[0], rows[1:])
+    return Table(())
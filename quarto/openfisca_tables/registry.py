@@ -0,0 +1,248 @@
+"""
+Registry of the book's OpenFisca tables, and a batch builder that precomputes them.
+
+Chapter modules (chapters/*/openfisca_tables.py) register their tables with register_table().
+build_all_tables() loads the union of their parameters once, computes every table and writes
+Markdown, HTML and (if pandas and pyarrow are installed) Parquet artifacts. Table chunks then
+call get_table(name), which reads the precomputed Markdown and only builds the table live (or
+falls back to the static table) when the artifact is missing or stale: built for another
+openfisca-france version, or from a spec that has changed since (the manifest records a
+fingerprint of each spec). Tables are lean Table objects that the kernel displays without
+importing pandas.
+
+Build the artifacts from the book directory (the one containing chapters/):
+
+    PYTHONPATH=../.. python -m quarto.openfisca_tables.registry
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import sys
+from pathlib import Path
+
+from .core import (
+    ParameterSpec,
+    load_parameter_from_package,
+    openfisca_france_version,
+    parameters_available,
+    read_markdown_table,
+    table_from_parameters,
+)
+from .static import read_static_table
+from .store import STORE_DIRNAME, discover_spec_modules
+from .subtree import is_glob, load_parameter_subtree, subtree_root
+from .table import Table
+
+TABLES_DIRNAME = "tables"
+TABLES_MANIFEST = "manifest.json"
+USE_OPENFISCA_ENV_VAR = "QUARTO_PARAM_USE_OPENFISCA_TABLES"
+
+
+class TableSpec:
+    """One OpenFisca table of the book: parameters, layout and static fallback."""
+
+    __slots__ = ("name", "parameters", "row_column_name", "start_year", "static_md", "caption")
+
+    def __init__(
+        self,
+        name: str,
+        parameters: list[ParameterSpec],
+        row_column_name: str,
+        start_year: int,
+        static_md: str | None = None,
+        caption: str = "",
+    ):
+        self.name = name
+        self.parameters = parameters
+        self.row_column_name = row_column_name
+        self.start_year = start_year
+        self.static_md = static_md  # relative to the book directory
+        self.caption = caption
+
+    def fingerprint(self) -> str:
+        """Hash of what the table content depends on (parameters, row labels, layout)."""
+        key = [self.parameters, self.row_column_name, self.start_year]
+        return hashlib.sha256(json.dumps(key, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+    def build(self) -> Table | None:
+        """Compute the table from OpenFisca parameters (None if unavailable)."""
+        return table_from_parameters(
+            parameters=self.parameters,
+            row_column_name=self.row_column_name,
+            start_year=self.start_year,
+            format_value=None,  # use units from package
+        )
+
+
+TABLE_REGISTRY: dict[str, TableSpec] = {}
+
+
+def register_table(
+    name: str,
+    parameters: list[ParameterSpec],
+    row_column_name: str,
+    start_year: int,
+    static_md: str | None = None,
+    caption: str = "",
+) -> TableSpec:
+    """Add a table to TABLE_REGISTRY (re-registering a name replaces it)."""
+    spec = TableSpec(name, parameters, row_column_name, start_year, static_md, caption)
+    TABLE_REGISTRY[name] = spec
+    return spec
+
+
+def find_book_dir(start: Path | None = None) -> Path:
+    """First directory above `start` (cwd) containing chapters/__init__.py; cwd if none."""
+    start = (start or Path.cwd()).resolve()
+    for candidate in [start, *start.parents]:
+        if (candidate / "chapters" / "__init__.py").exists():
+            return candidate
+    return start
+
+
+def tables_dir(book_dir: Path) -> Path:
+    return book_dir / STORE_DIRNAME / TABLES_DIRNAME
+
+
+def load_registered_tables(book_dir: Path) -> dict[str, TableSpec]:
+    """Import the chapter table modules of the book so that they register their tables."""
+    if str(book_dir) not in sys.path:
+        sys.path.insert(0, str(book_dir))
+    for name in discover_spec_modules(book_dir):
+        importlib.import_module(name)
+    return TABLE_REGISTRY
+
+
+def build_all_tables(
+    book_dir: Path | None = None,
+    specs: list[TableSpec] | None = None,
+) -> dict[str, list[Path]]:
+    """Compute every registered table and write its artifacts. Returns name -> artifact files.
+
+    Parameters shared by several tables are loaded once (union of all specs). Tables that cannot
+    be built (openfisca-france missing, parameters not found) are not written. Artifacts are
+    written atomically and left untouched when their content is unchanged.
+    """
+    from ..tex2qmd.output import write_if_changed
+
+    book_dir = book_dir or find_book_dir()
+    if specs is None:
+        specs = list(load_registered_tables(book_dir).values())
+    for path in dict.fromkeys(p for spec in specs for p, _label in spec.parameters):
+        if is_glob(path):
+            load_parameter_subtree(subtree_root(path))
+        else:
+            load_parameter_from_package(path)
+
+    out_dir = tables_dir(book_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written: dict[str, list[Path]] = {}
+    for spec in specs:
+        table = spec.build()
+        if table is None or table.empty:
+            continue
+        md_path = out_dir / f"{spec.name}.md"
+        write_if_changed(md_path, table.to_markdown() + "\n")
+        html_path = out_dir / f"{spec.name}.html"
+        write_if_changed(html_path, table.to_html() + "\n")
+        written[spec.name] = [md_path, html_path]
+        parquet_path = out_dir / f"{spec.name}.parquet"
+        try:
+            write_if_changed(parquet_path, table.to_pandas().to_parquet(index=False))
+        except ImportError:
+            pass
+        else:
+            written[spec.name].append(parquet_path)
+    fingerprints = {spec.name: spec.fingerprint() for spec in specs if spec.name in written}
+    manifest = {"version": openfisca_france_version(), "tables": dict(sorted(fingerprints.items()))}
+    write_if_changed(out_dir / TABLES_MANIFEST, json.dumps(manifest, indent=2) + "\n")
+    return written
+
+
+def _built_table_path(book_dir: Path, spec: TableSpec) -> Path | None:
+    """Precomputed Markdown of a table, if built for the installed openfisca-france version from this spec."""
+    out_dir = tables_dir(book_dir)
+    try:
+        manifest = json.loads((out_dir / TABLES_MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    installed = openfisca_france_version()
+    if installed is not None and manifest.get("version") != installed:
+        return None
+    tables = manifest.get("tables")
+    if not isinstance(tables, dict) or spec.name not in tables:
+        return None  # not built, or a manifest from before fingerprints
+    if tables[spec.name] != spec.fingerprint():
+        print(
+            f"[openfisca] precomputed table {spec.name} is stale (its spec changed); "
+            "rebuild with python -m quarto.openfisca_tables.registry",
+            file=sys.stderr,
+        )
+        return None
+    path = out_dir / f"{spec.name}.md"
+    return path if path.is_file() else None
+
+
+def get_table(name: str, use_openfisca_env_var: str = USE_OPENFISCA_ENV_VAR) -> Table:
+    """
+    Table of a registered table for a Quarto chunk (displayed as HTML or Markdown as is).
+
+    With OpenFisca enabled (env var, default true): precomputed artifact, else live build
+    (skipped when no parameters can be read, see parameters_available()).
+    Otherwise, or if both fail: the static Markdown table of the spec, from the static store.
+    """
+    book_dir = find_book_dir()
+    use_of = os.environ.get(use_openfisca_env_var, "true").lower() in ("true", "1", "yes")
+    spec = TABLE_REGISTRY.get(name)
+    if spec is None:
+        spec = load_registered_tables(book_dir).get(name)
+    if spec is None:
+        raise KeyError(f"Unknown table: {name}")
+    if use_of:
+        built = _built_table_path(book_dir, spec)
+        if built is not None:
+            table = read_markdown_table(built)
+            if table is not None and not table.empty:
+                print(f"[openfisca] using precomputed table {built.name}", file=sys.stderr)
+                return table
+        if parameters_available():
+            table = spec.build()
+            if table is not None and not table.empty:
+                print(f"[openfisca] using OpenFisca for {name}", file=sys.stderr)
+                return table
+        print(f"[openfisca] fallback to static table for {name}", file=sys.stderr)
+    table = read_static_table(book_dir / spec.static_md, book_dir) if spec.static_md else None
+    return table if table is not None else Table(())
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m quarto.openfisca_tables.registry",
+        description="Precompute every registered OpenFisca table of the book (Markdown, HTML, Parquet).",
+    )
+    parser.add_argument(
+        "--book-dir",
+        type=Path,
+        default=None,
+        help="Book directory containing chapters/ (default: found from the current directory).",
+    )
+    args = parser.parse_args(argv)
+    book_dir = (args.book_dir or find_book_dir()).resolve()
+    specs = load_registered_tables(book_dir)
+    written = build_all_tables(book_dir, list(specs.values()))
+    for name in specs:
+        if name in written:
+            print(f"[openfisca] {name}: " + ", ".join(p.name for p in written[name]))
+        else:
+            print(f"[openfisca] {name}: not built (OpenFisca data unavailable)", file=sys.stderr)
+    print(f"[openfisca] {len(written)}/{len(specs)} tables -> {tables_dir(book_dir)}")
+
+
+if __name__ == "__main__":
+    # Chapter modules register into the imported module's TABLE_REGISTRY, not into __main__'s
+    importlib.import_module(__spec__.name).main()
@@ -0,0 +1,146 @@
+"""
+Compiled static-table store: the fallback tables of the book, parsed once and pickled.
+
+When OpenFisca is disabled or unavailable, table chunks show the static Markdown tables taken
+from the .tex (chapters/*/tables/*_static.md). The store keeps each of them already parsed
+(columns and tuple rows), keyed by path relative to the book and stamped with the file's
+mtime and size: a kernel reads one pickle, and only re-parses (and re-stores) a table whose
+Markdown changed since it was compiled.
+
+Build it from the book directory (the one containing chapters/):
+
+    PYTHONPATH=../.. python -m quarto.openfisca_tables.static
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import os
+import pickle
+from pathlib import Path
+from typing import Any
+
+from .store import STORE_DIRNAME
+from .table import Table
+
+STATIC_STORE_FILENAME = "static_tables.pickle"
+STATIC_STORE_FORMAT = 1
+STATIC_TABLES_GLOB = "chapters/*/tables/*_static.md"
+
+
+def static_store_path(book_dir: Path) -> Path:
+    return book_dir / STORE_DIRNAME / STATIC_STORE_FILENAME
+
+
+def discover_static_tables(book_dir: Path) -> list[Path]:
+    """Static Markdown tables of the book (chapters/*/tables/*_static.md)."""
+    return sorted(book_dir.glob(STATIC_TABLES_GLOB))
+
+
+def _key(path: Path, book_dir: Path) -> str:
+    """Store key of a table: its path relative to the book (absolute if outside it)."""
+    path = path.resolve()
+    try:
+        return path.relative_to(book_dir.resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def _stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@functools.lru_cache(maxsize=None)
+def load_static_store(store_path: Path) -> dict[str, Any]:
+    """Entries of a store, read once per process: key -> (stamp, columns, rows). Empty if absent or unreadable."""
+    try:
+        with store_path.open("rb") as f:
+            data = pickle.load(f)
+    except Exception:
+        return {}
+    if not isinstance(data, dict) or data.get("format") != STATIC_STORE_FORMAT:
+        return {}
+    return data["tables"]
+
+
+def _save_static_store(store_path: Path, tables: dict[str, Any]) -> None:
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = store_path.with_name(f"{store_path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        pickle.dump({"format": STATIC_STORE_FORMAT, "tables": tables}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, store_path)
+
+
+def read_static_table(path: Path, book_dir: Path) -> Table | None:
+    """
+    Static Markdown table at `path` (None if the file does not exist).
+
+    Taken from the store when its stamp matches the file; otherwise parsed with
+    read_markdown_table and written back to the store (best effort: a read-only book is fine).
+    """
+    from .core import read_markdown_table
+
+    stamp = _stamp(path)
+    if stamp is None:
+        return None
+    store_path = static_store_path(book_dir)
+    tables = load_static_store(store_path)
+    key = _key(path, book_dir)
+    entry = tables.get(key)
+    if entry is not None and entry[0] == stamp:
+        return Table(entry[1], entry[2])
+    table = read_markdown_table(path)
+    if table is None:
+        return None
+    tables[key] = (stamp, table.columns, table.rows)
+    try:
+        _save_static_store(store_path, tables)
+    except OSError:
+        pass
+    return table
+
+
+def build_static_store(book_dir: Path) -> tuple[Path, list[str]]:
+    """Parse every static table of the book into a fresh store. Returns (store_path, keys)."""
+    from .core import read_markdown_table
+
+    tables: dict[str, Any] = {}
+    for path in discover_static_tables(book_dir):
+        stamp = _stamp(path)
+        table = read_markdown_table(path)
+        if stamp is not None and table is not None:
+            tables[_key(path, book_dir)] = (stamp, table.columns, table.rows)
+    store_path = static_store_path(book_dir)
+    _save_static_store(store_path, tables)
+    load_static_store.cache_clear()
+    return store_path, sorted(tables)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m quarto.openfisca_tables.static",
+        description=f"Compile the book's static fallback tables ({STATIC_TABLES_GLOB}) into one pickle.",
+    )
+    parser.add_argument(
+        "--book-dir",
+        type=Path,
+        default=None,
+        help="Book directory containing chapters/ (default: found from the current directory).",
+    )
+    args = parser.parse_args(argv)
+    from .registry import find_book_dir
+
+    book_dir = (args.book_dir or find_book_dir()).resolve()
+    store_path, keys = build_static_store(book_dir)
+    for key in keys:
+        print(f"[openfisca] {key}")
+    print(f"[openfisca] {len(keys)} static tables -> {store_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Compiled parameter store: every parameter used by the table specs, pickled in one file.
+
+Quarto starts a fresh kernel per render; with a store, table chunks read one pickle instead
+of importing openfisca_france resources and parsing YAML. The store records the
+openfisca-france version it was built from and is ignored when another version is installed.
+
+Build it from the book directory (the one containing chapters/):
+
+    PYTHONPATH=../.. python -m quarto.openfisca_tables.store
+
+Specs are the module-level *_SPEC lists of chapters/*/openfisca_tables.py (or the modules
+given on the command line). A glob spec path ("parameters/.../taxes_assurances/*") stores
+every file of its directory (see subtree.py).
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import importlib
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import Any, Iterable
+
+STORE_ENV_VAR = "QUARTO_OPENFISCA_PARAMETER_STORE"
+STORE_DIRNAME = ".openfisca-store"
+STORE_FILENAME = "parameters.pickle"
+STORE_FORMAT = 1
+
+
+def default_store_path(start: Path | None = None) -> Path | None:
+    """Store file: $QUARTO_OPENFISCA_PARAMETER_STORE, else the first .openfisca-store/ above `start` (cwd)."""
+    raw = os.environ.get(STORE_ENV_VAR)
+    if raw:
+        return Path(raw).expanduser()
+    start = (start or Path.cwd()).resolve()
+    for candidate in [start, *start.parents]:
+        path = candidate / STORE_DIRNAME / STORE_FILENAME
+        if path.is_file():
+            return path
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def load_parameter_store() -> dict[str, Any] | None:
+    """Read the store once per process. None if absent, unreadable or built for another version."""
+    from .core import openfisca_france_version
+
+    path = default_store_path()
+    if path is None or not path.is_file():
+        return None
+    try:
+        with path.open("rb") as f:
+            data = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get("format") != STORE_FORMAT:
+        return None
+    installed = openfisca_france_version()
+    # Without openfisca-france installed, the store is the only source: use it as is.
+    if installed is not None and data.get("version") != installed:
+        return None
+    return data
+
+
+def stored_parameter(relative_path: str) -> dict[str, Any] | None:
+    store = load_parameter_store()
+    if store is None:
+        return None
+    return store["parameters"].get(relative_path)
+
+
+def stored_subtree(relative_dir: str) -> dict[str, Any] | None:
+    """Parsed files under `relative_dir` (path -> content), if the store holds this subtree or a parent of it."""
+    store = load_parameter_store()
+    prefix = relative_dir + "/"
+    if store is None or not any(
+        root == relative_dir or prefix.startswith(root + "/") for root in store.get("subtrees", ())
+    ):
+        return None
+    return {path: data for path, data in store["parameters"].items() if path.startswith(prefix)}
+
+
+def stored_units() -> dict[str, dict[str, Any]] | None:
+    store = load_parameter_store()
+    if store is None:
+        return None
+    return store["units"]
+
+
+def collect_spec_paths(modules: Iterable[Any]) -> list[str]:
+    """Parameter paths of every module-level *_SPEC list [(path, label), ...], in order, deduplicated."""
+    paths: dict[str, None] = {}
+    for module in modules:
+        for name, value in vars(module).items():
+            if not name.endswith("_SPEC") or not isinstance(value, list):
+                continue
+            for item in value:
+                if isinstance(item, tuple) and item and isinstance(item[0], str):
+                    paths.setdefault(item[0], None)
+    return list(paths)
+
+
+def discover_spec_modules(book_dir: Path) -> list[str]:
+    """Module names of chapters/*/openfisca_tables.py under book_dir."""
+    return sorted(
+        f"chapters.{p.parent.name}.openfisca_tables"
+        for p in (book_dir / "chapters").glob("*/openfisca_tables.py")
+    )
+
+
+def build_parameter_store(paths: Iterable[str], store_path: Path) -> tuple[Path, list[str]]:
+    """Load `paths` from the installed package and pickle them with units.yaml.
+
+    Glob paths store every file of their subtree. Returns (store_path, missing paths).
+    Raises RuntimeError if openfisca-france or pyyaml is missing.
+    """
+    from .core import _load_parameter_cached, _load_units_cached, _yaml, openfisca_france_version
+    from .subtree import _load_files, is_glob, subtree_root
+
+    # Read from the package itself, never from a previous store
+    version = openfisca_france_version()
+    if version is None or _yaml() is None:
+        raise RuntimeError("openfisca-france and pyyaml are required to build the store")
+    parameters: dict[str, Any] = {}
+    subtrees: list[str] = []
+    missing: list[str] = []
+    for path in paths:
+        if is_glob(path):
+            root = subtree_root(path)
+            files = _load_files(root, os.cpu_count() or 1)
+            if not files:
+                missing.append(path)
+            elif root not in subtrees:
+                subtrees.append(root)
+                parameters.update(files)
+            continue
+        data = _load_parameter_cached(version, path)
+        if data is None:
+            missing.append(path)
+        else:
+            parameters[path] = data
+    units = _load_units_cached(version)
+    store = {
+        "format": STORE_FORMAT,
+        "version": version,
+        "parameters": parameters,
+        "subtrees": subtrees,
+        "units": units,
+    }
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = store_path.with_name(store_path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+        pickle.dump(store, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, store_path)
+    load_parameter_store.cache_clear()
+    return store_path, missing
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m quarto.openfisca_tables.store",
+        description="Compile the OpenFisca parameters used by the book's table specs into one pickle.",
+    )
+    parser.add_argument(
+        "modules",
+        nargs="*",
+        help="Modules defining *_SPEC lists (default: chapters/*/openfisca_tables.py of the current book).",
+    )
+    parser.add_argument(
+        "-o", "--output",
+        type=Path,
+        default=Path(STORE_DIRNAME) / STORE_FILENAME,
+        help=f"Store file (default: {STORE_DIRNAME}/{STORE_FILENAME}).",
+    )
+    args = parser.parse_args(argv)
+
+    book_dir = Path.cwd()
+    if str(book_dir) not in sys.path:
+        sys.path.insert(0, str(book_dir))
+    module_names = args.modules or discover_spec_modules(book_dir)
+    modules = [importlib.import_module(name) for name in module_names]
+    paths = collect_spec_paths(modules)
+    try:
+        store_path, missing = build_parameter_store(paths, args.output)
+    except RuntimeError as exc:
+        print(f"[openfisca] {exc}", file=sys.stderr)
+        sys.exit(1)
+    for path in missing:
+        print(f"[openfisca] missing parameter: {path}", file=sys.stderr)
+    print(f"[openfisca] {len(paths) - len(missing)} parameters -> {store_path}")
+
+
+if __name__ == "__main__":
+    main()
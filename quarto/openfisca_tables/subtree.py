@@ -0,0 +1,190 @@
+"""
+Bulk loader for whole OpenFisca parameter directories, and glob specs built on it.
+
+Many candidate tables cover a directory rather than a few files (taxes_assurances/,
+contributions_sociales/csg/remplacement/, produits_energetiques/ticpe/). load_parameter_subtree
+walks such a directory once, parses its YAML files (in a process pool for large trees) and
+flattens them into one mapping: parameter path -> parameter data, nested parameters of a file
+included (path/of/file/child). Subtrees are cached per process like single parameters, and
+read from the compiled store when it was built with them (see store.py).
+
+A spec entry whose path contains a glob (`*`, `?`, `[`) expands to every parameter of the
+subtree it matches, in path order, with one bulk load:
+
+    ("parameters/taxation_indirecte/taxes_assurances/*", "{description}")
+
+The label is then a str.format template with {name} (last path segment), {description}
+(the parameter's description, else name) and {path}; an empty label means "{description}".
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+from pathlib import Path
+from typing import Any, Iterable
+
+from .core import StepFunction, _parse_yaml, _yaml, module_available, openfisca_france_version
+
+GLOB_CHARS = "*?["
+# Below this many files, a process pool costs more than it saves
+PARALLEL_LOAD_MIN_FILES = 256
+# Keys of a parameter node that are not child parameters
+NODE_KEYS = frozenset({"description", "metadata", "documentation", "reference", "values", "brackets"})
+
+_subtrees: dict[tuple[str | None, str], dict[str, dict[str, Any]]] = {}
+
+
+def is_glob(path: str) -> bool:
+    return any(c in path for c in GLOB_CHARS)
+
+
+def subtree_root(pattern: str) -> str:
+    """Directory part of a glob spec path, before the first segment with a glob character."""
+    parts: list[str] = []
+    for part in pattern.strip("/").split("/"):
+        if is_glob(part):
+            break
+        parts.append(part)
+    return "/".join(parts)
+
+
+def _walk(ref: Any, prefix: str, out: list[tuple[str, Any]]) -> None:
+    """(relative path, resource) of every .yaml under `ref` (index.yaml node files skipped)."""
+    for child in sorted(ref.iterdir(), key=lambda c: c.name):
+        if child.is_dir():
+            _walk(child, f"{prefix}/{child.name}", out)
+        elif child.name.endswith(".yaml") and child.name != "index.yaml":
+            out.append((f"{prefix}/{child.name}", child))
+
+
+def _parse_file(path: str) -> Any:
+    """Parsed YAML file (None if unreadable). Top-level so it can run in a process pool."""
+    try:
+        return _parse_yaml(Path(path).read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def _parse_resource(ref: Any) -> Any:
+    try:
+        return _parse_yaml(ref.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def _load_files(relative_dir: str, jobs: int) -> dict[str, Any]:
+    """Package-relative .yaml path -> parsed content, for every file under `relative_dir`."""
+    import importlib.resources
+
+    ref = importlib.resources.files("openfisca_france")
+    for part in relative_dir.split("/"):
+        ref = ref / part
+    if not ref.is_dir():
+        return {}
+    files: list[tuple[str, Any]] = []
+    _walk(ref, relative_dir, files)
+    # libyaml keeps the GIL while parsing: only processes run parsers in parallel
+    if jobs > 1 and len(files) >= PARALLEL_LOAD_MIN_FILES and all(isinstance(r, Path) for _p, r in files):
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(jobs, len(files))) as pool:
+            parsed = list(pool.map(_parse_file, [str(r) for _p, r in files], chunksize=16))
+    else:
+        parsed = [_parse_resource(r) for _p, r in files]
+    return {path: data for (path, _r), data in zip(files, parsed) if data is not None}
+
+
+def _flatten(path: str, data: Any, metadata: dict[str, Any], out: dict[str, dict[str, Any]]) -> None:
+    """Add the parameters (nodes with values) of `data` to `out`; children inherit metadata (unit)."""
+    if not isinstance(data, dict):
+        return
+    own = data.get("metadata")
+    if isinstance(own, dict):
+        metadata = {**metadata, **own}
+    if "values" in data:
+        out[path] = data if own == metadata else {**data, "metadata": metadata}
+        return
+    for name, child in data.items():
+        if name not in NODE_KEYS and isinstance(child, dict):
+            _flatten(f"{path}/{name}", child, metadata, out)
+
+
+def flatten_parameter_files(files: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """Parameter path (file path without .yaml, then nested keys) -> parameter data, sorted by path."""
+    out: dict[str, dict[str, Any]] = {}
+    for path in sorted(files):
+        _flatten(path[: -len(".yaml")], files[path], {}, out)
+    return out
+
+
+def load_parameter_subtree(relative_dir: str, jobs: int | None = None) -> dict[str, dict[str, Any]]:
+    """
+    Every parameter under a package directory, e.g. "parameters/taxation_indirecte/taxes_assurances".
+
+    Returns {parameter path: parameter data} in path order (empty if the directory or
+    openfisca-france is missing). Loaded once per process per openfisca-france version; from
+    the compiled store when it holds this subtree. jobs: worker processes for large trees
+    (default: one per CPU). The returned dicts are shared and must not be modified.
+    """
+    from .store import stored_subtree
+
+    relative_dir = relative_dir.strip("/")
+    key = (openfisca_france_version(), relative_dir)
+    if key in _subtrees:
+        return _subtrees[key]
+    # A loaded parent directory already holds this subtree
+    for (version, root), loaded in list(_subtrees.items()):
+        if version == key[0] and relative_dir.startswith(root + "/"):
+            prefix = relative_dir + "/"
+            subtree = _subtrees[key] = {p: d for p, d in loaded.items() if p.startswith(prefix)}
+            return subtree
+    files = stored_subtree(relative_dir)
+    if files is None:
+        if _yaml() is None or not module_available("openfisca_france"):
+            return {}
+        files = _load_files(relative_dir, jobs or os.cpu_count() or 1)
+    subtree = _subtrees[key] = flatten_parameter_files(files)
+    return subtree
+
+
+def subtree_step_functions(relative_dir: str, jobs: int | None = None) -> dict[str, StepFunction]:
+    """Parameter path -> StepFunction for every parameter under `relative_dir` (see load_parameter_subtree)."""
+    return {
+        path: StepFunction.from_param_data(data)
+        for path, data in load_parameter_subtree(relative_dir, jobs).items()
+    }
+
+
+def clear_subtree_cache() -> None:
+    _subtrees.clear()
+
+
+def _glob_label(label: str, path: str, data: dict[str, Any]) -> str:
+    name = path.rsplit("/", 1)[-1]
+    description = data.get("description") or name
+    if not label:
+        return str(description)
+    return label.format(name=name, description=description, path=path)
+
+
+def expand_parameter_spec(parameters: Iterable[tuple[str, str]]) -> list[tuple[str, dict[str, Any]]]:
+    """
+    (row label, parameter data) for each spec entry, glob entries expanded over their subtree.
+
+    Plain entries go through load_parameter_from_package and are dropped when missing.
+    """
+    from .core import load_parameter_from_package
+
+    out: list[tuple[str, dict[str, Any]]] = []
+    for path, label in parameters:
+        if not is_glob(path):
+            data = load_parameter_from_package(path)
+            if data is not None:
+                out.append((label, data))
+            continue
+        pattern = path.strip("/").removesuffix(".yaml")
+        for param_path, data in load_parameter_subtree(subtree_root(pattern)).items():
+            if fnmatch.fnmatchcase(param_path, pattern):
+                out.append((_glob_label(label, param_path, data), data))
+    return out
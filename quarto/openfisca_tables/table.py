@@ -0,0 +1,99 @@
+"""
+Lean table type returned by the table helpers: column names and tuple rows, no pandas.
+
+A Quarto kernel only needs to print a small table, so Table renders itself directly as
+Markdown and HTML (the notebook display hooks _repr_markdown_ / _repr_html_) instead of going
+through a DataFrame and its Styler. to_pandas() converts on request (pandas imported then).
+"""
+
+from __future__ import annotations
+
+from html import escape
+from typing import Any, Iterable, Iterator, Sequence
+
+# Cell shown for a missing value
+MISSING = "–"
+
+
+def _md_cell(value: Any) -> str:
+    return str(value).replace("|", "\\|").replace("\n", " ")
+
+
+class Table:
+    """Column names and rows (tuples of cells, one per column)."""
+
+    __slots__ = ("columns", "rows")
+
+    def __init__(self, columns: Sequence[str], rows: Iterable[Sequence[Any]] = ()):
+        self.columns = tuple(columns)
+        width = len(self.columns)
+        # Short rows are padded, long ones cut, as read_markdown_table does with ragged lines
+        self.rows = tuple(
+            tuple(row[:width]) + (MISSING,) * (width - len(row)) if len(row) != width else tuple(row)
+            for row in rows
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict[str, Any]], columns: Sequence[str]) -> "Table":
+        """Table from dicts keyed by column name (missing keys as MISSING)."""
+        return cls(columns, (tuple(r.get(c, MISSING) for c in columns) for r in records))
+
+    @property
+    def empty(self) -> bool:
+        """True without rows or columns (same meaning as DataFrame.empty)."""
+        return not self.rows or not self.columns
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[tuple[Any, ...]]:
+        return iter(self.rows)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Table):
+            return NotImplemented
+        return self.columns == other.columns and self.rows == other.rows
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"<Table {len(self.rows)} rows x {len(self.columns)} columns: {', '.join(self.columns)}>"
+
+    def column(self, name: str) -> tuple[Any, ...]:
+        """Cells of one column, top to bottom (ValueError for an unknown name)."""
+        i = self.columns.index(name)
+        return tuple(row[i] for row in self.rows)
+
+    def to_markdown(self) -> str:
+        """Markdown pipe table (| in cells escaped)."""
+        lines = ["| " + " | ".join(_md_cell(c) for c in self.columns) + " |"]
+        lines.append("|" + "|".join("---" for _ in self.columns) + "|")
+        for row in self.rows:
+            lines.append("| " + " | ".join(_md_cell(v) for v in row) + " |")
+        return "\n".join(lines)
+
+    def to_html(self) -> str:
+        """HTML table without index column, as DataFrame.to_html(index=False, border=0)."""
+        head = "".join(f"<th>{escape(str(c))}</th>" for c in self.columns)
+        body = "\n".join(
+            "    <tr>" + "".join(f"<td>{escape(str(v))}</td>" for v in row) + "</tr>" for row in self.rows
+        )
+        return (
+            '<table class="dataframe">\n'
+            f"  <thead>\n    <tr>{head}</tr>\n  </thead>\n"
+            f"  <tbody>\n{body}\n  </tbody>\n"
+            "</table>"
+        )
+
+    def to_pandas(self) -> "Any":
+        """pandas DataFrame with the same columns and rows (imports pandas)."""
+        import pandas as pd
+
+        return pd.DataFrame(list(self.rows), columns=list(self.columns))
+
+    # Notebook display: Quarto takes HTML for HTML formats, Markdown (a real pandoc table) otherwise
+    def _repr_html_(self) -> str:
+        return self.to_html()
+
+    def _repr_markdown_(self) -> str:
+        return self.to_markdown()
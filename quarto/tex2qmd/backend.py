@@ -0,0 +1,233 @@
+"""Pandoc backends: how LaTeX is turned into pandoc output, always returned in memory.
+
+- SubprocessBackend: one `pandoc` process per document, output read from stdout (no temp file).
+- ServerBackend: a long-running `pandoc server` (pandoc >= 3.0) reached over HTTP; several
+  documents go in one `/batch` request, so pandoc starts once for the whole run.
+
+get_backend() returns the server backend when a URL is given and the server answers, and
+falls back to the subprocess backend otherwise. The server cannot read files, so a document
+with \\input or \\include is converted by the pandoc executable instead (with a warning).
+
+subprocess and urllib are imported when a document is converted, not at import time (CLI startup).
+"""
+from pathlib import Path
+import json
+import re
+import sys
+
+from .cache import pandoc_version
+
+PANDOC_SERVER_ENV_VAR = "TEX2QMD_PANDOC_SERVER"
+
+# \input{file} / \include{file}
+TEX_INPUT_RE = re.compile(r"\\(?:input|include)\s*\{([^}]+)\}")
+# Unescaped % (start of a LaTeX comment)
+_COMMENT_START_RE = re.compile(r"(?<!\\)%")
+
+
+class PandocError(RuntimeError):
+    """Pandoc could not convert a document."""
+
+
+def decode_tex(raw: bytes) -> str:
+    """LaTeX bytes as text: UTF-8, else latin-1 (what pandoc falls back to)."""
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("latin-1")
+
+
+def read_tex(tex_path: Path) -> str:
+    """LaTeX source as text (see decode_tex)."""
+    return decode_tex(tex_path.read_bytes())
+
+
+def includes_files(tex: str) -> bool:
+    """Whether the LaTeX source has an \\input or \\include outside comments."""
+    for match in TEX_INPUT_RE.finditer(tex):
+        line = tex[tex.rfind("\n", 0, match.start()) + 1 : match.start()]
+        if not _COMMENT_START_RE.search(line):
+            return True
+    return False
+
+
+class SubprocessBackend:
+    """Run the pandoc executable once per document."""
+
+    name = "subprocess"
+
+    def __init__(self, pandoc: str = "pandoc"):
+        self.pandoc = pandoc
+
+    def version(self) -> str:
+        return pandoc_version(self.pandoc)
+
+    def convert(self, tex_path: Path, to: str = "markdown") -> str:
+        import subprocess
+
+        try:
+            result = subprocess.run(
+                [self.pandoc, str(tex_path), "-f", "latex", "-t", to],
+                capture_output=True,
+            )
+        except OSError as exc:
+            raise PandocError(f"cannot run {self.pandoc}: {exc}") from None
+        if result.returncode != 0:
+            raise PandocError(result.stderr.decode("utf-8", errors="replace"))
+        return result.stdout.decode("utf-8", errors="replace")
+
+    def convert_text(self, text: str, from_: str, to: str = "markdown") -> str:
+        """Convert a document given as text (e.g. pandoc JSON back to Markdown)."""
+        import subprocess
+
+        try:
+            result = subprocess.run(
+                [self.pandoc, "-f", from_, "-t", to],
+                input=text.encode("utf-8"),
+                capture_output=True,
+            )
+        except OSError as exc:
+            raise PandocError(f"cannot run {self.pandoc}: {exc}") from None
+        if result.returncode != 0:
+            raise PandocError(result.stderr.decode("utf-8", errors="replace"))
+        return result.stdout.decode("utf-8", errors="replace")
+
+    def convert_batch(self, tex_paths: list[Path], to: str = "markdown") -> list[str | PandocError]:
+        outcomes: list[str | PandocError] = []
+        for tex_path in tex_paths:
+            try:
+                outcomes.append(self.convert(tex_path, to))
+            except PandocError as exc:
+                outcomes.append(exc)
+        return outcomes
+
+
+class ServerBackend:
+    """Send documents to a running `pandoc server` (e.g. `pandoc server --port 3030`).
+
+    The server does not read files: documents with \\input or \\include go to `fallback`
+    (the pandoc executable), so included files are followed as without a server.
+    """
+
+    name = "server"
+
+    def __init__(self, url: str, timeout: float = 120.0, fallback: SubprocessBackend | None = None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.fallback = fallback or SubprocessBackend()
+
+    def _request(self, path: str, payload=None):
+        import urllib.request
+
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(
+            self.url + path,
+            data=data,
+            headers={"Content-Type": "application/json", "Accept": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            body = response.read().decode("utf-8")
+        try:
+            return json.loads(body)
+        except ValueError:
+            return body  # e.g. /version as plain text
+
+    def available(self) -> bool:
+        try:
+            self._request("/version")
+        except OSError:
+            return False
+        return True
+
+    def version(self) -> str:
+        try:
+            return f"pandoc-server {self._request('/version')}"
+        except OSError:
+            return ""
+
+    @staticmethod
+    def _warn_fallback(tex_path: Path) -> None:
+        print(f"{tex_path}: \\input/\\include not followed by the pandoc server; using the pandoc executable", file=sys.stderr)
+
+    @staticmethod
+    def _output(result) -> str:
+        if isinstance(result, dict) and "output" in result:
+            return result["output"]
+        if isinstance(result, dict) and "error" in result:
+            raise PandocError(str(result["error"]))
+        raise PandocError(str(result))
+
+    def convert(self, tex_path: Path, to: str = "markdown") -> str:
+        tex = read_tex(tex_path)
+        if includes_files(tex):
+            self._warn_fallback(tex_path)
+            return self.fallback.convert(tex_path, to)
+        return self.convert_text(tex, "latex", to)
+
+    def convert_text(self, text: str, from_: str, to: str = "markdown") -> str:
+        """Convert a document given as text (e.g. pandoc JSON back to Markdown)."""
+        import urllib.error
+
+        try:
+            return self._output(self._request("/", {"text": text, "from": from_, "to": to}))
+        except urllib.error.HTTPError as exc:
+            raise PandocError(exc.read().decode("utf-8", errors="replace")) from None
+        except OSError as exc:
+            raise PandocError(f"pandoc server {self.url}: {exc}") from None
+
+    def convert_batch(self, tex_paths: list[Path], to: str = "markdown") -> list[str | PandocError]:
+        """Convert every document in one /batch request (one outcome per path, in order).
+
+        Documents with \\input or \\include are left out of the batch and converted by `fallback`.
+        """
+        import urllib.error
+
+        outcomes: list[str | PandocError | None] = [None] * len(tex_paths)
+        batch: list[int] = []
+        payloads: list[dict] = []
+        for i, tex_path in enumerate(tex_paths):
+            tex = read_tex(tex_path)
+            if includes_files(tex):
+                self._warn_fallback(tex_path)
+                try:
+                    outcomes[i] = self.fallback.convert(tex_path, to)
+                except PandocError as exc:
+                    outcomes[i] = exc
+            else:
+                batch.append(i)
+                payloads.append({"text": tex, "from": "latex", "to": to})
+        if not batch:
+            return outcomes
+        try:
+            results = self._request("/batch", payloads)
+        except urllib.error.HTTPError:
+            # One bad document fails the whole batch: retry one by one to isolate it
+            results = None
+        except OSError as exc:
+            error = PandocError(f"pandoc server {self.url}: {exc}")
+            for i in batch:
+                outcomes[i] = error
+            return outcomes
+        if results is None or not isinstance(results, list) or len(results) != len(batch):
+            for i, payload in zip(batch, payloads):
+                try:
+                    outcomes[i] = self.convert_text(payload["text"], "latex", to)
+                except PandocError as exc:
+                    outcomes[i] = exc
+            return outcomes
+        for i, result in zip(batch, results):
+            try:
+                outcomes[i] = self._output(result)
+            except PandocError as exc:
+                outcomes[i] = exc
+        return outcomes
+
+
+def get_backend(server_url: str | None = None) -> SubprocessBackend | ServerBackend:
+    """ServerBackend for `server_url` if it answers, else SubprocessBackend."""
+    if server_url:
+        backend = ServerBackend(server_url)
+        if backend.available():
+            return backend
+        print(f"pandoc server not reachable at {server_url}; using the pandoc executable", file=sys.stderr)
+    return SubprocessBackend()
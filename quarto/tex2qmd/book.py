@@ -0,0 +1,528 @@
+"""Generic book conversion: LaTeX chapters -> Quarto .qmd, for one or several books.
+
+A book is described by its source directory, output directory and ordered chapters, either in
+Python (see fiscalite.py) or in a YAML/JSON manifest read by load_manifest():
+
+    books:
+      - name: fiscalite
+        source_dir: ${TEX2QMD_SOURCE_DIR:-../source/Fiscalité/Chapitres}  # relative to the manifest
+        out_dir: fiscalite
+        legislation: true                            # link citations + write legislation.bib
+        table_format: pipe                           # repaired tabulars: pipe (default) or grid
+        chapters:
+          - tex: 1-Presentation.tex
+            qmd: presentation.qmd
+            title: Présentation générale
+          - tex: 5-Indirecte.tex
+            qmd: indirecte.qmd
+            title: La fiscalité indirecte
+            inject: tex2qmd.fiscalite:inject_openfisca_tables_indirecte
+
+build_books() converts the chapters of all books in one process pool, with one incremental
+cache per book.
+"""
+from pathlib import Path
+import importlib
+import json
+import os
+import re
+import sys
+
+from .backend import PandocError, ServerBackend, SubprocessBackend, decode_tex, read_tex
+from .cache import (
+    BuildCache,
+    chapter_key,
+    legislation_fingerprint,
+    pipeline_fingerprint,
+)
+from .convert import (
+    iter_shift_heading_levels,
+    iter_add_placeholders_to_empty_sections,
+    fix_tabular_blocks,
+    extract_tex_comments,
+    inject_qmd_comments,
+    extract_tex_label_captions,
+    replace_ref_with_caption,
+    remove_pandoc_table_attribute_blocks,
+    prefix_footnote_labels,
+)
+from .figures import chapter_figures, convert_figures, figure_links, link_figures
+from .legislation import (
+    LEGISLATION_ENTRIES,
+    link_legislation_citations,
+    write_legislation_bib,
+)
+from .output import write_if_changed
+from .pandoc_ast import transform_ast_json
+from .pipeline import Pipeline, format_timings
+from .profiling import (
+    StageRecorder,
+    chapter_profile_path,
+    format_profile_summary,
+    write_chapter_profile,
+    write_profile_report,
+)
+from .refindex import RefTarget
+from .stream import convert_chapter_streaming
+from .tabular import TABLE_FORMATS
+
+
+class Chapter:
+    """One LaTeX file of a book and the .qmd generated from it."""
+
+    __slots__ = ("tex", "qmd", "title", "inject")
+
+    def __init__(self, tex: str, qmd: str, title: str, inject: str | None = None):
+        self.tex = tex  # relative to the book's source_dir
+        self.qmd = qmd
+        self.title = title
+        self.inject = inject  # optional "module:function" (str -> str) run last
+
+    @property
+    def name(self) -> str:
+        return self.qmd.replace(".qmd", "")
+
+
+class Book:
+    """A Quarto book generated from a directory of LaTeX chapters."""
+
+    __slots__ = ("name", "source_dir", "out_dir", "chapters", "legislation", "table_format")
+
+    def __init__(
+        self,
+        name: str,
+        source_dir: Path,
+        out_dir: Path,
+        chapters: list[Chapter],
+        legislation: bool = False,
+        table_format: str = "pipe",
+    ):
+        self.name = name
+        self.source_dir = source_dir
+        self.out_dir = out_dir
+        self.chapters = chapters
+        self.legislation = legislation
+        self.table_format = table_format  # repaired tabulars: "pipe" or "grid" table
+
+    def tex_path(self, chapter: Chapter) -> Path:
+        return self.source_dir / chapter.tex
+
+    def qmd_path(self, chapter: Chapter) -> Path:
+        return self.out_dir / "chapters" / chapter.name / chapter.qmd
+
+
+# ${VAR:-default} in manifest paths: VAR when set and non-empty, else default (as in the shell)
+ENV_DEFAULT_RE = re.compile(r"\$\{(\w+):-([^}]*)\}")
+
+
+def _expand_vars(raw: str) -> str:
+    """$VAR, ${VAR} and ${VAR:-default} expanded from the environment."""
+    raw = ENV_DEFAULT_RE.sub(lambda m: os.environ.get(m.group(1)) or m.group(2), raw)
+    return os.path.expandvars(raw)
+
+
+def _manifest_path(raw: str, base_dir: Path) -> Path:
+    path = Path(_expand_vars(raw)).expanduser()
+    return path if path.is_absolute() else (base_dir / path).resolve()
+
+
+def load_manifest(path: Path) -> list[Book]:
+    """Books of a YAML (or .json) manifest.
+
+    Paths may use $VAR and ${VAR:-default}; relative paths are resolved from the manifest's directory.
+    """
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        data = json.loads(text)
+    else:
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError("pyyaml is required to read YAML manifests (pip install pyyaml)") from None
+        data = yaml.safe_load(text)
+    if not isinstance(data, dict) or not isinstance(data.get("books"), list):
+        raise ValueError(f"{path}: expected a 'books' list")
+
+    base_dir = path.resolve().parent
+    books: list[Book] = []
+    for raw in data["books"]:
+        try:
+            chapters = [
+                Chapter(c["tex"], c["qmd"], c["title"], c.get("inject"))
+                for c in raw["chapters"]
+            ]
+            books.append(Book(
+                name=raw["name"],
+                source_dir=_manifest_path(raw["source_dir"], base_dir),
+                out_dir=_manifest_path(raw["out_dir"], base_dir),
+                chapters=chapters,
+                legislation=bool(raw.get("legislation", False)),
+                table_format=raw.get("table_format", "pipe"),
+            ))
+        except (KeyError, TypeError) as exc:
+            raise ValueError(f"{path}: invalid book entry {raw!r} ({exc!r})") from None
+        if books[-1].table_format not in TABLE_FORMATS:
+            raise ValueError(f"{path}: table_format must be one of {', '.join(TABLE_FORMATS)} ({books[-1].name})")
+    return books
+
+
+def _resolve_inject(spec: str):
+    module_name, _, func_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def build_chapter_pipeline(
+    book: Book,
+    chapter: Chapter,
+    label_to_caption: dict[str, str],
+    comments_with_anchors: list[tuple[str, str]],
+    refs: dict[str, RefTarget] | None = None,
+    figures: dict[str, str] | None = None,
+) -> Pipeline:
+    """Post-processing applied to pandoc's Markdown output, in order."""
+    pipeline = (
+        Pipeline()
+        .text("replace_ref_with_caption", lambda c: replace_ref_with_caption(c, label_to_caption, refs))
+        .text("inject_qmd_comments", lambda c: inject_qmd_comments(c, comments_with_anchors))
+        .text("remove_pandoc_table_attribute_blocks", remove_pandoc_table_attribute_blocks)
+        .lines("shift_heading_levels", iter_shift_heading_levels)
+        .lines("add_placeholders_to_empty_sections", iter_add_placeholders_to_empty_sections)
+        .text("fix_tabular_blocks", lambda c: fix_tabular_blocks(c, book.table_format))
+    )
+    return _add_final_stages(pipeline, book, chapter, figures)
+
+
+def build_ast_chapter_pipeline(
+    book: Book,
+    chapter: Chapter,
+    label_to_caption: dict[str, str],
+    comments_with_anchors: list[tuple[str, str]],
+    backend: SubprocessBackend | ServerBackend,
+    refs: dict[str, RefTarget] | None = None,
+    figures: dict[str, str] | None = None,
+) -> Pipeline:
+    """Post-processing applied to pandoc's JSON output: one tree walk, then one Markdown write."""
+    pipeline = (
+        Pipeline()
+        .text("transform_ast", lambda d: transform_ast_json(d, label_to_caption, book.table_format, refs))
+        .text("write_markdown", lambda d: backend.convert_text(d, "json", "markdown"))
+        .text("inject_qmd_comments", lambda c: inject_qmd_comments(c, comments_with_anchors))
+    )
+    return _add_final_stages(pipeline, book, chapter, figures)
+
+
+def _add_final_stages(pipeline: Pipeline, book: Book, chapter: Chapter, figures: dict[str, str] | None = None) -> Pipeline:
+    if figures:
+        pipeline.text("link_figures", lambda c: link_figures(c, figures))
+    pipeline.text("prefix_footnote_labels", lambda c: prefix_footnote_labels(c, chapter.name))
+    if book.legislation:
+        pipeline.text("link_legislation_citations", lambda c: link_legislation_citations(c, LEGISLATION_ENTRIES))
+    if chapter.inject:
+        pipeline.text(chapter.inject.rpartition(":")[2], _resolve_inject(chapter.inject))
+    return pipeline
+
+
+def _stage(recorder: StageRecorder | None, name: str, func, data):
+    """func(data), recorded as a profiling stage when there is a recorder."""
+    return func(data) if recorder is None else recorder.run(name, func, data)
+
+
+def convert_chapter(
+    book: Book,
+    chapter: Chapter,
+    timings: bool = False,
+    backend: SubprocessBackend | ServerBackend | None = None,
+    converted: str | PandocError | None = None,
+    ast: bool = False,
+    stream: bool = False,
+    profile_dir: Path | None = None,
+    cprofile: bool = False,
+    refs: dict[str, RefTarget] | None = None,
+    figures: dict[str, str] | None = None,
+) -> tuple[bool, str]:
+    """Convert one chapter (pandoc + post-processing). Returns (ok, message).
+
+    `converted` is pandoc's outcome when the chapter was already sent in a batch request;
+    otherwise the chapter goes through `backend` (default: the pandoc executable).
+    With ast=True, pandoc produces its JSON AST and the transforms run on the tree
+    (see pandoc_ast.py) before one Markdown write. With stream=True, the chapter is
+    converted section by section (see stream.py), unless it has an injection.
+    With timings=True, the message also lists the duration of each post-processing stage.
+    With profile_dir, every stage is profiled and the chapter profile is written there
+    (see profiling.py), plus a cProfile dump with cprofile=True.
+    `refs` resolves references to labels of other chapters (see refindex.py); `figures` points
+    images to the chapter's copies (see figures.py).
+
+    Top-level function so it can be sent to a process pool; never prints, the caller
+    reports messages in chapter order.
+    """
+    if profile_dir is None:
+        return _convert_chapter(book, chapter, timings, backend, converted, ast, stream, refs=refs, figures=figures)
+
+    # A profile left by an earlier run must not be merged if this chapter is skipped
+    chapter_profile_path(profile_dir, book.name, chapter.qmd).unlink(missing_ok=True)
+    recorder = StageRecorder()
+    profiler = None
+    if cprofile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        try:
+            outcome = _convert_chapter(book, chapter, timings, backend, converted, ast, stream, recorder, refs, figures)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        if recorder.stages:
+            mode = "stream" if stream and not chapter.inject else "ast" if ast else "markdown"
+            path = write_chapter_profile(profile_dir, book.name, chapter.qmd, chapter.tex, mode, recorder)
+            if profiler is not None:
+                profiler.dump_stats(path.with_suffix(".pstats"))
+    finally:
+        recorder.close()
+    return outcome
+
+
+def _convert_chapter(
+    book: Book,
+    chapter: Chapter,
+    timings: bool,
+    backend: SubprocessBackend | ServerBackend | None,
+    converted: str | PandocError | None,
+    ast: bool,
+    stream: bool,
+    recorder: StageRecorder | None = None,
+    refs: dict[str, RefTarget] | None = None,
+    figures: dict[str, str] | None = None,
+) -> tuple[bool, str]:
+    tex_path = book.tex_path(chapter)
+    qmd_path = book.qmd_path(chapter)
+    qmd_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if not tex_path.exists():
+        return True, f"Skip (missing): {tex_path}"
+
+    backend = backend or SubprocessBackend()
+    if stream and not chapter.inject:
+        try:
+            ok, message = _stage(
+                recorder, "stream", lambda p: convert_chapter_streaming(book, chapter, backend, timings, refs, figures), tex_path
+            )
+        except PandocError as exc:
+            return False, f"Pandoc failed for {chapter.tex}: {exc}"
+        if recorder is not None:
+            recorder.stages[-1]["bytes_out"] = qmd_path.stat().st_size
+        return ok, message
+
+    # Match pandoc's encoding so anchor text finds the right line in qmd (pandoc uses latin1 when tex is not UTF-8)
+    tex_content = _stage(recorder, "read_tex", read_tex, tex_path)
+    comments_with_anchors = extract_tex_comments(tex_content)
+    label_to_caption = extract_tex_label_captions(tex_content)
+    if ast:
+        pipeline = build_ast_chapter_pipeline(
+            book, chapter, label_to_caption, comments_with_anchors, backend, refs, figures
+        )
+    else:
+        pipeline = build_chapter_pipeline(book, chapter, label_to_caption, comments_with_anchors, refs, figures)
+
+    try:
+        if isinstance(converted, PandocError):
+            raise converted
+        if converted is None:
+            to = "json" if ast else "markdown"
+            converted = _stage(recorder, "pandoc", lambda p: backend.convert(p, to=to), tex_path)
+        content = pipeline.run(converted, recorder)
+    except PandocError as exc:
+        return False, f"Pandoc failed for {chapter.tex}: {exc}"
+
+    header = f"---\ntitle: \"{chapter.title}\"\n---\n\n"
+    written = _stage(recorder, "write_qmd", lambda text: write_if_changed(qmd_path, text), header + content)
+    if recorder is not None:
+        recorder.stages[-1]["bytes_out"] = recorder.stages[-1]["bytes_in"] if written else 0
+    message = f"OK: {chapter.tex} -> {chapter.qmd}" + ("" if written else " (unchanged)")
+    if timings:
+        message += "\n" + format_timings(pipeline.timings)
+    return True, message
+
+
+Outcome = tuple[bool, str] | BaseException
+
+
+def _run_chapters(
+    tasks: list[tuple[Book, Chapter]],
+    jobs: int,
+    timings: bool = False,
+    backend: SubprocessBackend | ServerBackend | None = None,
+    ast: bool = False,
+    stream: bool = False,
+    profile_dir: Path | None = None,
+    cprofile: bool = False,
+    extras: list[dict] | None = None,
+) -> list[Outcome]:
+    """Convert chapters, sequentially or in a process pool; one outcome per chapter, in order.
+
+    With a pandoc server (and no streaming), every chapter is sent in one batch first; the
+    pool then only runs the post-processing. `extras` holds more keyword arguments of
+    convert_chapter for each chapter (refs, figures).
+    """
+    outcomes: list[Outcome] = []
+    extras = extras or [{} for _ in tasks]
+    converted: list[str | PandocError | None] = [None] * len(tasks)
+    if isinstance(backend, ServerBackend) and not stream:
+        existing = [i for i, (book, chapter) in enumerate(tasks) if book.tex_path(chapter).exists()]
+        results = backend.convert_batch(
+            [tasks[i][0].tex_path(tasks[i][1]) for i in existing],
+            to="json" if ast else "markdown",
+        )
+        for i, result in zip(existing, results):
+            converted[i] = result
+
+    if jobs <= 1:
+        for (book, chapter), result, kwargs in zip(tasks, converted, extras):
+            try:
+                outcomes.append(
+                    convert_chapter(book, chapter, timings, backend, result, ast, stream, profile_dir, cprofile, **kwargs)
+                )
+            except Exception as exc:
+                outcomes.append(exc)
+        return outcomes
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(
+                convert_chapter, book, chapter, timings, backend, result, ast, stream, profile_dir, cprofile, **kwargs
+            )
+            for (book, chapter), result, kwargs in zip(tasks, converted, extras)
+        ]
+        for future in futures:
+            try:
+                outcomes.append(future.result())
+            except Exception as exc:
+                outcomes.append(exc)
+    return outcomes
+
+
+def build_books(
+    books: list[Book],
+    jobs: int = 1,
+    force: bool = False,
+    timings: bool = False,
+    backend: SubprocessBackend | ServerBackend | None = None,
+    ast: bool = False,
+    stream: bool = False,
+    profile_dir: Path | None = None,
+    cprofile: bool = False,
+    ref_targets: dict[tuple[str, str], dict[str, RefTarget]] | None = None,
+) -> bool:
+    """Convert every chapter of `books`, skipping up-to-date ones. Prints a report; False if a chapter failed.
+
+    Chapters of all books share one process pool (jobs <= 0: one worker per CPU) and one
+    pandoc backend (default: the pandoc executable). ast=True post-processes pandoc's JSON AST;
+    stream=True converts chapters section by section. With profile_dir, every chapter is
+    reconverted and profiled, and a per-stage summary is printed (see profiling.py).
+    `ref_targets` (from refindex.corpus_ref_targets) resolves references across chapters and books.
+    The figures of every chapter are converted and copied next to its .qmd (see figures.py).
+    """
+    force = force or profile_dir is not None
+    backend = backend or SubprocessBackend()
+    mode = "stream" if stream else "ast" if ast else "markdown"
+    common_key_parts = (backend.version(), pipeline_fingerprint(), mode)
+    legislation_key = legislation_fingerprint(LEGISLATION_ENTRIES)
+    caches: dict[str, BuildCache] = {}
+    keys: dict[tuple[str, str], str] = {}
+    todo: list[tuple[Book, Chapter]] = []
+    messages: dict[tuple[str, str], Outcome] = {}
+    links: dict[tuple[str, str], dict[str, str]] = {}
+    missing_figures: dict[tuple[str, str], list[str]] = {}
+    all_figures = []
+    for book in books:
+        (book.out_dir / "chapters").mkdir(parents=True, exist_ok=True)
+        cache = caches[book.name] = BuildCache(book.out_dir)
+        for chapter in book.chapters:
+            tex_path = book.tex_path(chapter)
+            if tex_path.exists():
+                tex_bytes = tex_path.read_bytes()
+                figures, missing_figures[book.name, chapter.qmd] = chapter_figures(book, chapter, decode_tex(tex_bytes))
+                all_figures.extend(figures)
+                links[book.name, chapter.qmd] = figure_links(figures)
+                key = chapter_key(
+                    tex_bytes,
+                    chapter.qmd,
+                    chapter.title,
+                    chapter.inject or "",
+                    *common_key_parts,
+                    legislation_key if book.legislation else "",
+                    book.table_format,
+                    json.dumps(sorted(ref_targets.get((book.name, chapter.qmd), {}).items())) if ref_targets else "",
+                    json.dumps(sorted(links[book.name, chapter.qmd].items())),
+                )
+                keys[book.name, chapter.qmd] = key
+                if not force and cache.is_fresh(chapter.qmd, key, book.qmd_path(chapter)):
+                    messages[book.name, chapter.qmd] = (True, f"Up to date: {chapter.tex} -> {chapter.qmd}")
+                    # Reported when the chapter is converted, not on every build
+                    missing_figures.pop((book.name, chapter.qmd))
+                    continue
+            todo.append((book, chapter))
+
+    pool_size = jobs if jobs > 0 else (os.cpu_count() or 1)
+    jobs = max(1, min(pool_size, len(todo)))
+    extras = [
+        {
+            "refs": ref_targets.get((book.name, chapter.qmd)) if ref_targets else None,
+            "figures": links.get((book.name, chapter.qmd)),
+        }
+        for book, chapter in todo
+    ]
+    outcomes = _run_chapters(todo, jobs, timings, backend, ast, stream, profile_dir, cprofile, extras)
+    for (book, chapter), outcome in zip(todo, outcomes):
+        messages[book.name, chapter.qmd] = outcome
+        cache = caches[book.name]
+        qmd_path = book.qmd_path(chapter)
+        key = keys.get((book.name, chapter.qmd))
+        if isinstance(outcome, tuple) and outcome[0] and key and qmd_path.exists():
+            cache.record(chapter.qmd, key, qmd_path)
+        else:
+            cache.forget(chapter.qmd)
+    for cache in caches.values():
+        cache.save()
+    # Figures of up-to-date chapters too: a deleted copy comes back, unchanged ones are not rewritten
+    figures_converted, figures_copied, figure_errors = convert_figures(all_figures, pool_size)
+
+    failed = False
+    # Results are reported in manifest order, whatever the completion order in the pool
+    for book in books:
+        prefix = f"[{book.name}] " if len(books) > 1 else ""
+        for chapter in book.chapters:
+            outcome = messages[book.name, chapter.qmd]
+            if isinstance(outcome, BaseException):
+                failed = True
+                print(f"{prefix}Error converting {chapter.tex} -> {chapter.qmd}: {outcome!r}", file=sys.stderr)
+                continue
+            ok, message = outcome
+            failed = failed or not ok
+            print(prefix + message, file=sys.stdout if ok else sys.stderr)
+            if missing_figures.get((book.name, chapter.qmd)):
+                names = ", ".join(missing_figures[book.name, chapter.qmd])
+                print(f"{prefix}Missing figure(s) in {chapter.tex}: {names}", file=sys.stderr)
+        if book.legislation:
+            if write_legislation_bib(book.out_dir / "legislation.bib", LEGISLATION_ENTRIES):
+                print(f"{prefix}OK: legislation.bib written")
+            else:
+                print(f"{prefix}OK: legislation.bib unchanged")
+
+    if all_figures:
+        print(f"Figures: {len(all_figures)} ({figures_converted} converted, {figures_copied} copied)")
+    for error in figure_errors:
+        print(f"Figure not converted: {error}", file=sys.stderr)
+
+    if profile_dir is not None:
+        report, profiled = write_profile_report(
+            profile_dir, [chapter_profile_path(profile_dir, book.name, chapter.qmd) for book, chapter in todo]
+        )
+        print(f"Profile ({report}):")
+        print(format_profile_summary(profiled))
+    return not failed
@@ -0,0 +1,148 @@
+"""Incremental rebuild cache: skip chapters whose inputs did not change since the last run.
+
+The manifest (``<book>/.tex2qmd-cache/manifest.json``) maps each output .qmd to the key of
+the inputs it was built from and the hash of the bytes written. A chapter is up to date when
+its key is unchanged and the .qmd on disk still has the recorded hash.
+"""
+from functools import lru_cache
+from pathlib import Path
+import hashlib
+import json
+import os
+import shutil
+
+from . import PACKAGE_DIR
+from .output import write_if_changed
+
+CACHE_DIRNAME = ".tex2qmd-cache"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+VERSION_MEMO_NAME = "pandoc-version.json"  # under $XDG_CACHE_HOME/tex2qmd/
+
+# Modules whose code shapes the generated .qmd (a change invalidates every chapter)
+PIPELINE_MODULES = (
+    "convert.py",
+    "legislation.py",
+    "pipeline.py",
+    "pandoc_ast.py",
+    "stream.py",
+    "backend.py",
+    "tabular.py",
+    "refindex.py",
+    "figures.py",
+    "book.py",
+    "fiscalite.py",
+)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _version_memo_path() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "tex2qmd" / VERSION_MEMO_NAME
+
+
+@lru_cache(maxsize=None)
+def pandoc_version(pandoc: str = "pandoc") -> str:
+    """First line of `pandoc --version` ('' if pandoc cannot be run).
+
+    Memoized on disk per executable (real path, size, mtime), so an up-to-date rebuild does
+    not start pandoc at all.
+    """
+    executable = shutil.which(pandoc)
+    if executable is None:
+        return ""
+    real = os.path.realpath(executable)
+    try:
+        stat = os.stat(real)
+    except OSError:
+        return ""
+    stamp = f"{real}:{stat.st_size}:{stat.st_mtime_ns}"
+    memo_path = _version_memo_path()
+    try:
+        memo = json.loads(memo_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        memo = {}
+    if isinstance(memo, dict) and isinstance(memo.get(stamp), str):
+        return memo[stamp]
+
+    import subprocess
+
+    try:
+        result = subprocess.run([executable, "--version"], capture_output=True, text=True)
+    except OSError:
+        return ""
+    if result.returncode != 0 or not result.stdout:
+        return ""
+    version = result.stdout.splitlines()[0].strip()
+    # One entry per executable: a reinstalled pandoc replaces its old stamp
+    memo = {k: v for k, v in memo.items() if not k.startswith(real + ":")} if isinstance(memo, dict) else {}
+    memo[stamp] = version
+    try:
+        memo_path.parent.mkdir(parents=True, exist_ok=True)
+        memo_path.write_text(json.dumps(memo, indent=2) + "\n", encoding="utf-8")
+    except OSError:
+        pass
+    return version
+
+
+@lru_cache(maxsize=None)
+def pipeline_fingerprint() -> str:
+    """Hash of the transform pipeline code (PIPELINE_MODULES in the tex2qmd package)."""
+    h = hashlib.sha256()
+    for name in PIPELINE_MODULES:
+        path = PACKAGE_DIR / name
+        h.update(name.encode("utf-8"))
+        h.update(path.read_bytes() if path.exists() else b"")
+    return h.hexdigest()
+
+
+def legislation_fingerprint(entries: list[dict]) -> str:
+    """Hash of the legislation entries (order matters: it drives the .bib)."""
+    return _sha256(json.dumps(entries, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+
+
+def chapter_key(tex_bytes: bytes, *parts: str) -> str:
+    """Cache key of a chapter: source .tex bytes plus any other inputs (versions, hashes, title...)."""
+    h = hashlib.sha256(tex_bytes)
+    for part in parts:
+        h.update(b"\0")
+        h.update(part.encode("utf-8"))
+    return h.hexdigest()
+
+
+class BuildCache:
+    """Manifest of built chapters, stored as JSON under `<out_dir>/.tex2qmd-cache/`."""
+
+    def __init__(self, out_dir: Path):
+        self.path = out_dir / CACHE_DIRNAME / MANIFEST_NAME
+        self.entries: dict[str, dict[str, str]] = {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = None
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            self.entries = data.get("chapters", {})
+
+    def is_fresh(self, name: str, key: str, output_path: Path) -> bool:
+        """True if `output_path` was built from `key` and has not been modified since."""
+        entry = self.entries.get(name)
+        if not entry or entry.get("key") != key:
+            return False
+        try:
+            return _sha256(output_path.read_bytes()) == entry.get("output")
+        except OSError:
+            return False
+
+    def record(self, name: str, key: str, output_path: Path) -> None:
+        self.entries[name] = {"key": key, "output": _sha256(output_path.read_bytes())}
+
+    def forget(self, name: str) -> None:
+        self.entries.pop(name, None)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": MANIFEST_VERSION, "chapters": self.entries}
+        write_if_changed(self.path, json.dumps(data, indent=2, sort_keys=True) + "\n")
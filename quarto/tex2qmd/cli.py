@@ -0,0 +1,244 @@
+"""Command line entry point.
+
+`tex2qmd build <manifest.yml>` converts every book of a manifest; `tex2qmd watch` keeps them
+up to date while the sources are edited (see watch.py).
+"""
+from pathlib import Path
+import argparse
+import os
+import sys
+
+from . import QUARTO_DIR
+from .backend import PANDOC_SERVER_ENV_VAR, get_backend
+from .cache import CACHE_DIRNAME
+from .profiling import PROFILE_DIRNAME
+
+DEFAULT_MANIFEST = QUARTO_DIR / "books.yml"
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="tex2qmd",
+        description="Generate Quarto books (.qmd) from LaTeX sources.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser(
+        "build",
+        help="Convert the books of a manifest, all chapters sharing one worker pool.",
+    )
+    build.add_argument(
+        "manifest",
+        nargs="?",
+        type=Path,
+        default=DEFAULT_MANIFEST,
+        help=f"Book manifest (YAML or JSON). Default: {DEFAULT_MANIFEST}.",
+    )
+    build.add_argument(
+        "-b", "--book",
+        action="append",
+        default=[],
+        metavar="NAME",
+        help="Only convert this book (repeatable). Default: every book of the manifest.",
+    )
+    build.add_argument(
+        "-c", "--chapter",
+        action="append",
+        default=[],
+        metavar="QMD",
+        help="Only convert this chapter, by .qmd name (repeatable). Default: every chapter.",
+    )
+    build.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="Number of chapters converted in parallel (process pool). 0 = one per CPU. Default: 1.",
+    )
+    build.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print the duration of each post-processing stage for every converted chapter.",
+    )
+    mode = build.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--ast",
+        action="store_true",
+        help="Post-process pandoc's JSON AST in one tree walk instead of rewriting Markdown text.",
+    )
+    mode.add_argument(
+        "--stream",
+        action="store_true",
+        help="Convert each chapter section by section (bounded memory, output written as it comes).",
+    )
+    build.add_argument(
+        "--pandoc-server",
+        metavar="URL",
+        default=os.environ.get(PANDOC_SERVER_ENV_VAR),
+        help=(
+            "Send chapters to a running `pandoc server` (e.g. http://localhost:3030) instead of one "
+            f"pandoc process per chapter. Default: ${PANDOC_SERVER_ENV_VAR}; falls back to the pandoc executable."
+        ),
+    )
+    build.add_argument(
+        "--profile",
+        nargs="?",
+        type=Path,
+        const=Path(PROFILE_DIRNAME),
+        metavar="DIR",
+        help=(
+            "Reconvert every chapter and profile each stage (wall/CPU time, bytes in/out, peak memory): "
+            f"JSON per chapter and profile.json in DIR (default: ./{PROFILE_DIRNAME}), plus a summary table."
+        ),
+    )
+    build.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="With --profile, also write a cProfile dump (<chapter>.pstats) for each chapter.",
+    )
+    build.add_argument(
+        "--force",
+        action="store_true",
+        help=f"Reconvert every chapter, ignoring the incremental cache ({CACHE_DIRNAME}/).",
+    )
+    build.add_argument(
+        "--no-ref-index",
+        action="store_true",
+        help=(
+            f"Do not resolve references across chapters and books (label index in {CACHE_DIRNAME}/refs.sqlite "
+            "next to the manifest, updated on each build)."
+        ),
+    )
+
+    watch = commands.add_parser(
+        "watch",
+        help="Poll the LaTeX sources, legislation.py and table modules; reconvert only what changed.",
+    )
+    watch.add_argument(
+        "manifest",
+        nargs="?",
+        type=Path,
+        default=DEFAULT_MANIFEST,
+        help=f"Book manifest (YAML or JSON). Default: {DEFAULT_MANIFEST}.",
+    )
+    watch.add_argument(
+        "-b", "--book",
+        action="append",
+        default=[],
+        metavar="NAME",
+        help="Only watch this book (repeatable). Default: every book of the manifest.",
+    )
+    watch.add_argument(
+        "--render",
+        action="store_true",
+        help="Run `quarto render` on each reconverted chapter (and on chapters whose table modules changed).",
+    )
+    watch.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        metavar="SECONDS",
+        help="Polling interval. Default: 0.5.",
+    )
+    watch.add_argument(
+        "--pandoc-server",
+        metavar="URL",
+        default=os.environ.get(PANDOC_SERVER_ENV_VAR),
+        help=f"Passed to `tex2qmd build` (see build --help). Default: ${PANDOC_SERVER_ENV_VAR}.",
+    )
+    return parser.parse_args(argv)
+
+
+def _load_books(manifest: Path, names: list[str]) -> list["Book"]:
+    """Books of `manifest`, restricted to `names` if given; exits on errors."""
+    from .book import load_manifest
+
+    try:
+        books = load_manifest(manifest)
+    except (OSError, ValueError, RuntimeError) as exc:
+        print(f"Cannot read manifest {manifest}: {exc}", file=sys.stderr)
+        sys.exit(1)
+    if names:
+        unknown = sorted(set(names) - {book.name for book in books})
+        if unknown:
+            print(f"Unknown book(s) in {manifest}: {', '.join(unknown)}", file=sys.stderr)
+            sys.exit(1)
+        books = [book for book in books if book.name in names]
+    return books
+
+
+def build(args: argparse.Namespace) -> None:
+    from .book import build_books
+    from .refindex import REF_INDEX_NAME, corpus_ref_targets
+
+    books = _load_books(args.manifest, args.book)
+    if args.chapter:
+        unknown = sorted(set(args.chapter) - {c.qmd for book in books for c in book.chapters})
+        if unknown:
+            print(f"Unknown chapter(s) in {args.manifest}: {', '.join(unknown)}", file=sys.stderr)
+            sys.exit(1)
+        for book in books:
+            book.chapters = [c for c in book.chapters if c.qmd in args.chapter]
+        books = [book for book in books if book.chapters]
+
+    missing = [book for book in books if not book.source_dir.is_dir()]
+    for book in missing:
+        print(f"[{book.name}] Source directory not found: {book.source_dir}", file=sys.stderr)
+    books = [book for book in books if book not in missing]
+
+    ref_targets = None
+    if not args.no_ref_index:
+        # Every book of the manifest, every chapter: refs may point outside what is rebuilt
+        corpus = [book for book in _load_books(args.manifest, []) if book.source_dir.is_dir()]
+        index_path = args.manifest.resolve().parent / CACHE_DIRNAME / REF_INDEX_NAME
+        ref_targets = corpus_ref_targets(index_path, corpus, args.jobs) if corpus else None
+
+    ok = build_books(
+        books,
+        jobs=args.jobs,
+        force=args.force,
+        timings=args.timings,
+        backend=get_backend(args.pandoc_server),
+        ast=args.ast,
+        stream=args.stream,
+        profile_dir=args.profile,
+        cprofile=args.cprofile,
+        ref_targets=ref_targets,
+    )
+    for book in books:
+        print(f"Done: {book.name}. To render HTML + PDF: cd {book.out_dir} && quarto render")
+    if missing or not ok:
+        sys.exit(1)
+
+
+def watch(args: argparse.Namespace) -> None:
+    from .refindex import REF_INDEX_NAME
+    from .watch import Watcher
+
+    books = [book for book in _load_books(args.manifest, args.book) if book.source_dir.is_dir()]
+    if not books:
+        print("No book to watch (missing source directories?)", file=sys.stderr)
+        sys.exit(1)
+    build_args = ["--pandoc-server", args.pandoc_server] if args.pandoc_server else []
+    watcher = Watcher(
+        args.manifest.resolve(),
+        books,
+        render=args.render,
+        interval=args.interval,
+        build_args=build_args,
+        ref_index=args.manifest.resolve().parent / CACHE_DIRNAME / REF_INDEX_NAME,
+    )
+    # Bring every chapter up to date first (cached chapters are skipped)
+    watcher.convert([(book, chapter) for book in books for chapter in book.chapters])
+    watcher.run()
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = _parse_args(argv)
+    if args.command == "build":
+        build(args)
+    elif args.command == "watch":
+        watch(args)
+
+
+if __name__ == "__main__":
+    main()
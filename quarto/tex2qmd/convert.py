@@ -1,5 +1,9 @@
 """LaTeX→QMD conversion: headings, placeholders, tabular blocks, comments."""
+import bisect
 import re
+from typing import Iterable, Iterator
+
+from .tabular import parse_tabular
 
 
 def extract_tex_comments(tex_content: str) -> list[tuple[str, str]]:
@@ -52,105 +56,125 @@ def _escape_html_comment(text: str) -> str:
 def inject_qmd_comments(qmd_content: str, comments_with_anchors: list[tuple[str, str]]) -> str:
     """Insert HTML comments into QMD before the line containing each anchor.
 
-    If anchor is empty or not found, the comment is appended at the end.
+    If anchor is empty or not found, the comment is appended at the end. Several comments
+    anchored on the same line are inserted in reverse order of appearance.
     """
     if not comments_with_anchors:
         return qmd_content
     qmd_lines = qmd_content.splitlines(keepends=True)
-    # Build list of (insert_line_index, comment_text)
-    inserts: list[tuple[int, str]] = []
-    used_anchors: set[str] = set()
+    # A line contains the anchor iff it contains its first 50 chars, so only the key is searched.
+    # Anchors come from single .tex lines, so a match never spans two QMD lines: the first
+    # occurrence in the whole text is on the first matching line.
+    first_line = _first_lines_containing(qmd_lines, {anchor[:50] for _c, anchor in comments_with_anchors if anchor})
+    # insert_line_index -> comment lines, in order of appearance
+    inserts: dict[int, list[str]] = {}
     for comment_text, anchor in comments_with_anchors:
         safe = _escape_html_comment(comment_text)
         comment_line = "<!-- " + safe + " -->\n"
-        if not anchor:
-            inserts.append((len(qmd_lines), comment_line))
-            continue
-        # Find first line that contains anchor (avoid reusing same anchor for multiple comments)
-        anchor_key = anchor[:50]
-        found = False
-        for idx, qline in enumerate(qmd_lines):
-            if anchor in qline or anchor_key in qline:
-                inserts.append((idx, comment_line))
-                found = True
-                break
-        if not found:
-            inserts.append((len(qmd_lines), comment_line))
-    # Apply inserts in reverse order so indices stay valid
-    inserts.sort(key=lambda x: x[0], reverse=True)
-    for idx, comment_line in inserts:
-        qmd_lines.insert(idx, comment_line)
-    return "".join(qmd_lines)
+        idx = first_line.get(anchor[:50], len(qmd_lines)) if anchor else len(qmd_lines)
+        inserts.setdefault(idx, []).append(comment_line)
+    out: list[str] = []
+    for idx, qline in enumerate(qmd_lines):
+        if idx in inserts:
+            out.extend(reversed(inserts[idx]))
+        out.append(qline)
+    out.extend(reversed(inserts.get(len(qmd_lines), [])))
+    return "".join(out)
+
+
+def _first_lines_containing(lines: list[str], keys: set[str]) -> dict[str, int]:
+    """Map each key to the index of the first line containing it (missing keys are absent).
+
+    One C-level substring search per distinct key over the joined text, then a bisect on
+    line start offsets: no per-line Python loop.
+    """
+    if not keys:
+        return {}
+    text = "".join(lines)
+    starts: list[int] = []
+    offset = 0
+    for line in lines:
+        starts.append(offset)
+        offset += len(line)
+    found: dict[str, int] = {}
+    for key in keys:
+        pos = text.find(key)
+        if pos >= 0:
+            found[key] = bisect.bisect_right(starts, pos) - 1
+    return found
+
+
+# Patterns that open a "title" block: \caption{ or \begin{tab}[...]{ or \begin{fig}[...]{
+CAPTION_OPEN_RE = re.compile(
+    r"\\caption\s*\{|"
+    r"\\begin\s*\{\s*tab\s*\}\s*\[[^\]]*\]\s*\{|"
+    r"\\begin\s*\{\s*fig\s*\}\s*\[[^\]]*\]\s*\{"
+)
+# Tokens that matter inside a title block: \label{id}, escaped braces, braces
+CAPTION_TOKEN_RE = re.compile(r"\\label\s*\{\s*([^}]+)\s*\}|\\[{}]|[{}]")
+TRAILING_BACKSLASH_RE = re.compile(r"\\\s*$")
 
 
 def extract_tex_label_captions(tex_content: str) -> dict[str, str]:
     """Extract label -> caption (title) from \\caption{...\\label{id}} and \\begin{tab|fig}[...]{...\\label{id}}.
 
     Returns a dict: label -> caption text (the title just before \\label in the .tex).
-    Handles nested braces in the caption.
+    Handles nested braces in the caption. Tokens are matched in place with
+    ``pattern.search(text, pos)`` (no slicing), so the scan is linear in the block length.
     """
     result: dict[str, str] = {}
-    # Patterns that open a "title" block: \caption{ or \begin{tab}[...]{ or \begin{fig}[...]{
-    open_pat = re.compile(
-        r"\\caption\s*\{|"
-        r"\\begin\s*\{\s*tab\s*\}\s*\[[^\]]*\]\s*\{|"
-        r"\\begin\s*\{\s*fig\s*\}\s*\[[^\]]*\]\s*\{" 
-    )
     i = 0
-    while i < len(tex_content):
-        m = open_pat.search(tex_content, i)
+    while True:
+        m = CAPTION_OPEN_RE.search(tex_content, i)
         if not m:
             break
-        start = m.end()  # first char inside the opening {
         depth = 1
-        j = start
-        caption_start = j
-        while j < len(tex_content) and depth > 0:
-            if tex_content[j] == "\\" and j + 1 < len(tex_content):
-                # Check for \label{...}
-                rest = tex_content[j:]
-                label_m = re.match(r"\\label\s*\{\s*([^}]+)\s*\}", rest)
-                if label_m and depth == 1:
-                    caption = tex_content[caption_start:j].strip()
+        j = caption_start = m.end()  # first char inside the opening {
+        while depth > 0:
+            tok = CAPTION_TOKEN_RE.search(tex_content, j)
+            if not tok:
+                break
+            text = tok.group(0)
+            if tok.group(1) is not None:
+                if depth == 1:
+                    caption = tex_content[caption_start:tok.start()].strip()
                     # Strip trailing backslash and LaTeX cruft
-                    caption = re.sub(r"\\\s*$", "", caption).strip()
+                    caption = TRAILING_BACKSLASH_RE.sub("", caption).strip()
                     if caption:
-                        result[label_m.group(1).strip()] = caption
-                    j += label_m.end()
-                    continue
-                # Check for \{ or \}
-                if rest.startswith("\\{"):
-                    j += 2
-                    if depth == 1:
-                        caption_start = j
-                    depth += 1
-                    continue
-                if rest.startswith("\\}"):
-                    j += 2
-                    depth -= 1
-                    continue
-            if tex_content[j] == "{":
-                depth += 1
-                j += 1
+                        result[tok.group(1).strip()] = caption
+                    j = tok.end()
+                else:
+                    # Nested \label: only its braces count
+                    j = tok.start() + 1
                 continue
-            if tex_content[j] == "}":
+            j = tok.end()
+            if text == "\\{":
+                if depth == 1:
+                    caption_start = j
+                depth += 1
+            elif text == "\\}" or text == "}":
                 depth -= 1
-                j += 1
-                continue
-            j += 1
+            else:
+                depth += 1
         i = m.end()
     return result
 
 
+# Backslash-commands stripped from captions: \'E, \er, \emph{...}, other commands
+LATEX_ACCENT_RE = re.compile(r"\\['`^\"~]\s*\{?([^}]*)\}?")
+LATEX_ER_RE = re.compile(r"\\er\b")
+LATEX_EMPH_RE = re.compile(r"\\emph\s*\{([^}]*)\}")
+LATEX_COMMAND_RE = re.compile(r"\\[a-zA-Z]+\s*")
+
+
 def _latex_caption_to_plain(text: str) -> str:
     """Strip common LaTeX from caption for use as link text."""
     s = text.replace("~", " ").strip()
-    # Remove backslash-commands: \'E, \er, \emph{...}, etc.
-    s = re.sub(r"\\['`^\"~]\s*\{?([^}]*)\}?", r"\1", s)
-    s = re.sub(r"\\er\b", "er", s)
-    s = re.sub(r"\\emph\s*\{([^}]*)\}", r"\1", s)
-    s = re.sub(r"\\[a-zA-Z]+\s*", " ", s)
-    s = re.sub(r"\\", "", s)
+    s = LATEX_ACCENT_RE.sub(r"\1", s)
+    s = LATEX_ER_RE.sub("er", s)
+    s = LATEX_EMPH_RE.sub(r"\1", s)
+    s = LATEX_COMMAND_RE.sub(" ", s)
+    s = s.replace("\\", "")
     return " ".join(s.split())
 
 
@@ -159,37 +183,60 @@ def _normalize_anchor_id(anchor: str) -> str:
     return anchor.strip().replace(" ", "-")
 
 
-def replace_ref_with_caption(qmd_content: str, label_to_caption: dict[str, str]) -> str:
+# [number or \[label\]](#anchor){reference-type="ref" reference="ref"} (attributes may span lines)
+# Linktext: allow \] and \[ (escaped brackets) or single-line non-bracket chars so we don't
+# match from a stray "[" in table content and eat the table.
+REF_LINK_RE = re.compile(
+    r'\[\s*(?P<linktext>(?:\\[\[\]]|[^\n\[\]])*?)\s*\]\s*\(#(?P<anchor>[^)]+)\)'
+    r'\s*\{\s*reference-type\s*=\s*["\']ref["\']\s+reference\s*=\s*["\'](?P<ref>[^"\']+)["\']\s*\}',
+    re.DOTALL,
+)
+
+
+def replace_ref_with_caption(
+    qmd_content: str,
+    label_to_caption: dict[str, str],
+    external: dict[str, tuple[str | None, str | None]] | None = None,
+) -> str:
     """Replace Pandoc ref link text (number or [\\label]) with the table/figure caption when available.
 
     Patterns: [1](#id){reference-type="ref" reference="id"} or
     [\\[id\\]](#id){reference-type="ref" reference="id"}.
+    `external` maps labels of other chapters to (caption, href) (see refindex.py): the link
+    points to href, or becomes the caption as plain text when href is None (another book).
     """
-    if not label_to_caption:
+    if not label_to_caption and not external:
         return qmd_content
 
-    # [number or \[label\]](#anchor){reference-type="ref" reference="ref"} (attributes may span lines)
-    # Linktext: allow \] and \[ (escaped brackets) or single-line non-bracket chars so we don't
-    # match from a stray "[" in table content and eat the table.
-    ref_re = re.compile(
-        r'\[\s*(?P<linktext>(?:\\[\[\]]|[^\n\[\]])*?)\s*\]\s*\(#(?P<anchor>[^)]+)\)'
-        r'\s*\{\s*reference-type\s*=\s*["\']ref["\']\s+reference\s*=\s*["\'](?P<ref>[^"\']+)["\']\s*\}',
-        re.DOTALL,
-    )
-
     def repl(m: re.Match) -> str:
         ref = m.group("ref").strip()
         anchor = m.group("anchor").strip()
         caption = label_to_caption.get(ref)
         if not caption:
-            return m.group(0)
+            target = external.get(ref) if external else None
+            if target is None:
+                return m.group(0)
+            caption, href = target
+            text = _latex_caption_to_plain(caption) if caption else m.group("linktext")
+            if href is None:
+                return text
+            return f"[{text}]({href}){{reference-type=\"ref\" reference=\"{_normalize_anchor_id(ref)}\"}}"
         # Use caption as link text; strip LaTeX for display; normalize anchor for HTML (no spaces in id)
         safe = _latex_caption_to_plain(caption)
         norm_anchor = _normalize_anchor_id(anchor)
         # Use normalized ref so Quarto generates href="#norm_anchor" matching our span id
         return f"[{safe}](#{norm_anchor}){{reference-type=\"ref\" reference=\"{norm_anchor}\"}}"
 
-    return ref_re.sub(repl, qmd_content)
+    return REF_LINK_RE.sub(repl, qmd_content)
+
+
+# " []{#id ...}" or "\n  []{#id ...}"; id can contain spaces (e.g. table:historique taxes sante).
+# Captures the full id, from # until "label=" (one-line and two-line blocks, straight or curly quotes)
+TABLE_ATTRIBUTE_BLOCK_RE = re.compile(
+    r'(?:\n\s*| )\[\]\{(#(?:(?!label\s*=).|\n)+?)\s*label\s*=\s*["\'\u201c\u201d][^"\'\u201c\u201d]*["\'\u201c\u201d]\s*\}'
+)
+FIRST_JANUARY_RE = re.compile(r"(\D)1\s+janvier\b")
+GLUED_FOOTNOTE_RE = re.compile(r"([a-zA-Zàâäéèêëïîôùûüç])\[\^")
 
 
 def remove_pandoc_table_attribute_blocks(content: str) -> str:
@@ -198,38 +245,37 @@ def remove_pandoc_table_attribute_blocks(content: str) -> str:
     Pandoc emits these after the caption inside ::: tab blocks. We keep the id so in-text
     refs (e.g. [Caption](#table:xyz)) have a target. Handles straight and curly quotes.
     """
-    # Match " []{#id ...}" or "\n  []{#id ...}"; id can contain spaces (e.g. table:historique taxes sante)
-    # Capture full id: from # until "label=" (handles both one-line and two-line blocks)
     # Replace with " []{#id}" so the anchor exists and ref links work
     def _keep_anchor(m: re.Match) -> str:
         anchor_id = m.group(1).strip()
         norm_id = _normalize_anchor_id(anchor_id)
         return f" []{{{norm_id}}}"
 
-    content = re.sub(
-        r'(?:\n\s*| )\[\]\{(#(?:(?!label\s*=).|\n)+?)\s*label\s*=\s*["\'\u201c\u201d][^"\'\u201c\u201d]*["\'\u201c\u201d]\s*\}',
-        _keep_anchor,
-        content,
-    )
+    content = TABLE_ATTRIBUTE_BLOCK_RE.sub(_keep_anchor, content)
     # Restore ordinal "1er" in dates (Pandoc drops \er from "1\er janvier")
-    content = re.sub(r"(\D)1\s+janvier\b", r"\g<1>1er janvier", content)
+    content = FIRST_JANUARY_RE.sub(r"\g<1>1er janvier", content)
     # Ensure space before footnote ref when glued to word (avoids "solidarité11" in output)
-    content = re.sub(r"([a-zA-Zàâäéèêëïîôùûüç])\[\^", r"\1 [^", content)
+    content = GLUED_FOOTNOTE_RE.sub(r"\1 [^", content)
     return content
 
 
-def shift_heading_levels(content: str) -> str:
-    """Shift markdown heading levels by one so they become chapter sections (X.1, X.2)."""
-    lines = content.split("\n")
-    result = []
+HEADING_RE = re.compile(r"^(#{1,6})\s")
+PLACEHOLDER = "*[À rédiger.]*"
+
+
+def iter_shift_heading_levels(lines: Iterable[str]) -> Iterator[str]:
+    """Line-stream version of shift_heading_levels."""
     for line in lines:
-        match = re.match(r"^(#{1,6})\s(.*)$", line)
+        match = HEADING_RE.match(line)
         if match:
-            hashes, rest = match.groups()
-            new_depth = min(len(hashes) + 1, 6)
-            line = "#" * new_depth + " " + rest
-        result.append(line)
-    return "\n".join(result)
+            depth = len(match.group(1))
+            line = "#" * min(depth + 1, 6) + " " + line[depth + 1:]
+        yield line
+
+
+def shift_heading_levels(content: str) -> str:
+    """Shift markdown heading levels by one so they become chapter sections (X.1, X.2)."""
+    return "\n".join(iter_shift_heading_levels(content.split("\n")))
 
 
 FOOTNOTE_DEF_RE = re.compile(r"^\[\^([^\]\s]+)\]:(?=\s|$)", re.MULTILINE)
@@ -237,166 +283,75 @@ FOOTNOTE_REF_RE = re.compile(r"\[\^([^\]\s]+)\]")
 
 
 def prefix_footnote_labels(content: str, prefix: str) -> str:
-    """Prefix footnote labels so they are unique across chapters in a book."""
+    """Prefix footnote labels so they are unique across chapters in a book.
+
+    FOOTNOTE_REF_RE also matches the label of definitions ([^1]: ...), so a single
+    substitution handles both.
+    """
     if not prefix:
         return content
 
-    def _pref(label: str) -> str:
+    def _ref_repl(m: re.Match) -> str:
+        label = m.group(1)
         if label.startswith(prefix + "-"):
-            return label
-        return f"{prefix}-{label}"
-
-    def _def_repl(m: re.Match) -> str:
-        return f"[^{_pref(m.group(1))}]:"
+            return m.group(0)
+        return f"[^{prefix}-{label}]"
 
-    def _ref_repl(m: re.Match) -> str:
-        return f"[^{_pref(m.group(1))}]"
+    return FOOTNOTE_REF_RE.sub(_ref_repl, content)
 
-    content = FOOTNOTE_DEF_RE.sub(_def_repl, content)
-    content = FOOTNOTE_REF_RE.sub(_ref_repl, content)
-    return content
 
+def iter_add_placeholders_to_empty_sections(
+    lines: Iterable[str],
+    placeholder: str = PLACEHOLDER,
+) -> Iterator[str]:
+    """Line-stream version of add_placeholders_to_empty_sections.
 
-HEADING_RE = re.compile(r"^(#{1,6})\s")
-PLACEHOLDER = "*[À rédiger.]*"
+    Blank lines after a heading are held back until the next non-blank line tells
+    whether the section has a body.
+    """
+    in_heading = False
+    held: list[str] = []
+    for line in lines:
+        if in_heading:
+            if not HEADING_RE.match(line) and not line.strip():
+                held.append(line)
+                continue
+            if HEADING_RE.match(line):
+                yield ""
+                yield placeholder
+                yield ""
+            yield from held
+            held = []
+            in_heading = False
+        yield line
+        if HEADING_RE.match(line):
+            in_heading = True
+    if in_heading:
+        yield ""
+        yield placeholder
+        yield ""
+        yield from held
 
 
 def add_placeholders_to_empty_sections(content: str, placeholder: str = PLACEHOLDER) -> str:
     """Insert placeholder in sections that have no body (heading then only blank lines or next heading)."""
-    lines = content.split("\n")
-    result = []
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        result.append(line)
-        if HEADING_RE.match(line):
-            has_content = False
-            j = i + 1
-            while j < len(lines):
-                next_line = lines[j]
-                if HEADING_RE.match(next_line):
-                    break
-                if next_line.strip():
-                    has_content = True
-                    break
-                j += 1
-            if not has_content:
-                result.append("")
-                result.append(placeholder)
-                result.append("")
-        i += 1
-    return "\n".join(result)
+    return "\n".join(iter_add_placeholders_to_empty_sections(content.split("\n"), placeholder))
 
 
 TABULAR_BLOCK_RE = re.compile(
     r"::: tabular\s*\n(.*?)\n\s*:::",
     re.DOTALL,
 )
-COLSPEC_RE = re.compile(r"^\\\|(?:c\\\|)+\\?\s*")
 
 
-def _clean_cell(cell: str) -> str:
-    return cell.strip().rstrip("\\").strip()
+def tabular_to_markdown(inner: str, table_format: str = "pipe") -> str:
+    """Markdown table ("pipe" or "grid") from the Markdown text of a broken tabular (rows split on "&")."""
+    table = parse_tabular(inner)
+    return "" if table is None else table.to_markdown(table_format)
 
 
-def _is_data_row(cells: list[str]) -> bool:
-    if not cells:
-        return False
-    first = _clean_cell(cells[0])
-    if re.match(r"^(19|20)\d{2}$", first):
-        return True
-    return any("€" in c for c in cells)
-
-
-def _fix_tabular_block(match: re.Match) -> str:
-    inner = match.group(1)
-    lines = [ln.strip() for ln in inner.split("\n") if ln.strip()]
-    rows: list[list[str]] = []
-    for line in lines:
-        cells = [_clean_cell(c) for c in line.split("&")]
-        if not any(cells):
-            continue
-        if not rows and cells:
-            cell0 = COLSPEC_RE.sub("", cells[0]).strip()
-            cell0 = re.sub(r"^c\\\|(?:c\\\|)*\s*", "", cell0)
-            if cell0.startswith("\\***"):
-                cell0 = "**" + cell0[4:]
-            cells[0] = cell0
-        rows.append(cells)
-    if not rows:
-        return ""
-
-    ncols = max(len(r) for r in rows)
-    for r in rows:
-        while len(r) < ncols:
-            r.append("")
-
-    header_rows: list[list[str]] = []
-    data_rows: list[list[str]] = []
-    for row in rows:
-        if not data_rows and _is_data_row(row):
-            data_rows.append(row)
-        elif data_rows:
-            data_rows.append(row)
-        else:
-            header_rows.append(row)
-
-    if not header_rows and data_rows:
-        header_rows = [data_rows[0]]
-        data_rows = data_rows[1:]
-
-    if header_rows:
-        header = []
-        for c in range(ncols):
-            for hr in header_rows:
-                if c < len(hr) and hr[c].strip():
-                    cell = hr[c].strip()
-                    if cell.startswith("\\***"):
-                        cell = "**" + cell[4:]
-                    header.append(cell)
-                    break
-            else:
-                header.append("")
-        header_row = header[:ncols]
-        while len(header_row) < ncols:
-            header_row.append("")
-    else:
-        header_row = [""] * ncols
-
-    if data_rows and not data_rows[0][0].strip() and ncols >= 2:
-        next_year = None
-        for dr in data_rows[1:]:
-            if dr[0].strip() and re.match(r"^200[1-9]$", dr[0].strip()):
-                next_year = dr[0].strip()
-                break
-        if next_year == "2001":
-            data_rows[0][0] = "2000"
-
-    non_empty_header = sum(1 for c in header_row if c.strip())
-    has_fragment = any(
-        len(c.strip()) <= 4 and c.strip() and not re.match(r"^\*\*[^*]+\*\*$", c.strip())
-        or (c.strip().startswith("**") and c.strip().endswith("**") and len(c.strip()) < 10)
-        for c in header_row
-    )
-    is_likely_malformatted = (
-        ncols > 1
-        and (non_empty_header < ncols / 2 or (non_empty_header == 1 and ncols > 2) or has_fragment)
-    )
-    TABLE_MALFORMED_COMMENT = "<!-- Tableau converti depuis LaTeX : en-têtes potentiellement incomplets ou mal fusionnés (vérifier et corriger si besoin). -->"
-
-    def row_to_md(r: list[str]) -> str:
-        return "| " + " | ".join(r) + " |"
-
-    out = []
-    if is_likely_malformatted:
-        out.append(TABLE_MALFORMED_COMMENT)
-    out.append(row_to_md(header_row))
-    out.append("|" + "|".join(["---"] * ncols) + "|")
-    for dr in data_rows:
-        out.append(row_to_md(dr[:ncols]))
-    return "\n".join(out)
-
-
-def fix_tabular_blocks(content: str) -> str:
-    """Replace ::: tabular ... ::: blocks (broken LaTeX-style) with markdown tables."""
-    return TABULAR_BLOCK_RE.sub(_fix_tabular_block, content)
+def fix_tabular_blocks(content: str, table_format: str = "pipe") -> str:
+    """Replace ::: tabular ... ::: blocks (broken LaTeX-style) with markdown tables (see tabular.py)."""
+    if "::: tabular" not in content:
+        return content
+    return TABULAR_BLOCK_RE.sub(lambda m: tabular_to_markdown(m.group(1), table_format), content)
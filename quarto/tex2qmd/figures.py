@@ -0,0 +1,311 @@
+"""Figures of the LaTeX chapters: resolve \\includegraphics, convert them for the web, copy them next to the .qmd.
+
+The graphics of a chapter (``\\includegraphics{...}`` and the books' ``\\graphique{...}``
+macro, which reads ``Figures/<name>``) are resolved against the chapter's directory, its
+``Figures/`` subdirectory and the book's source directory. Each figure is copied to
+``chapters/<chapter>/figures/`` and the images of the generated Markdown are pointed there:
+
+- PDF pages are rasterized to PNG with ``pdftocairo`` (poppler), EMF / WMF / EPS with
+  ``inkscape``, when the tool is installed (otherwise the file is copied as is);
+- PNG and JPEG are downscaled to MAX_WIDTH pixels and re-encoded when Pillow is installed,
+  keeping the original bytes when that does not make them smaller.
+
+Conversions run in a process pool and are cached by content hash under
+``<book>/.tex2qmd-cache/figures/``: a figure is converted again only when its bytes (or
+the conversion settings) change, and copies are skipped when the target is unchanged.
+``stamps.json`` there records the (mtime, size) of sources and copies, so a no-op build
+neither hashes the sources nor reads the copies.
+"""
+from functools import lru_cache
+from pathlib import Path
+import hashlib
+import io
+import json
+import re
+import shutil
+
+from .cache import CACHE_DIRNAME
+from .output import write_if_changed
+from .refindex import TEX_COMMENT_RE
+
+FIGURES_DIRNAME = "figures"  # next to each chapter's .qmd, and under .tex2qmd-cache/
+FIGURE_CACHE_VERSION = 1
+STAMPS_NAME = "stamps.json"  # in the figure cache directory
+MAX_WIDTH = 1600  # pixels: twice a typical HTML column
+RASTER_DPI = 192
+JPEG_QUALITY = 85
+
+# Tried in this order for \includegraphics{name} without an extension (as LaTeX does)
+GRAPHIC_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".eps", ".emf", ".wmf", ".svg", ".gif")
+WEB_EXTENSIONS = frozenset({".png", ".jpg", ".jpeg", ".svg", ".gif"})
+RASTER_EXTENSIONS = frozenset({".png", ".jpg", ".jpeg"})
+# Source extension -> external tool rasterizing it to PNG
+CONVERTERS = {".pdf": "pdftocairo", ".eps": "inkscape", ".emf": "inkscape", ".wmf": "inkscape"}
+
+# \includegraphics[opts]{path} or \graphique[scale]{name}
+GRAPHICS_RE = re.compile(r"\\(?:includegraphics\*?|graphique)\s*(?:\[[^\]]*\]\s*)?\{([^}]+)\}")
+# Macros in a graphics path (\cfcurrentfolder Figures/x.pdf)
+PATH_MACRO_RE = re.compile(r"\\[a-zA-Z@]+\s*")
+# Markdown image: ![alt](target ...), target possibly in <...>
+IMAGE_RE = re.compile(r"(!\[(?:[^\]\\]|\\.)*\]\()(<[^>\n]+>|[^)\s]+)")
+
+
+class FigureError(RuntimeError):
+    """A figure could not be converted."""
+
+
+class Figure:
+    """One graphics file of a chapter and where its web version goes."""
+
+    __slots__ = ("source", "dest", "cache_dir")
+
+    def __init__(self, source: Path, dest: Path, cache_dir: Path):
+        self.source = source
+        self.dest = dest  # chapters/<chapter>/figures/<stem><web suffix>
+        self.cache_dir = cache_dir
+
+    @property
+    def link(self) -> str:
+        """Target of the Markdown image, relative to the .qmd."""
+        link = f"{FIGURES_DIRNAME}/{self.dest.name}"
+        return f"<{link}>" if " " in link else link
+
+
+@lru_cache(maxsize=None)
+def _tool(name: str) -> str | None:
+    return shutil.which(name)
+
+
+def web_suffix(source: Path) -> str:
+    """Extension of the web version of `source`: .png when it has to (and can) be rasterized."""
+    suffix = source.suffix.lower()
+    if suffix in WEB_EXTENSIONS:
+        return suffix
+    converter = CONVERTERS.get(suffix)
+    return ".png" if converter and _tool(converter) else suffix
+
+
+def find_graphics(tex_content: str) -> list[str]:
+    """Graphics paths of a chapter, as written (comments skipped, macros removed), in order."""
+    names: list[str] = []
+    for raw in GRAPHICS_RE.findall(TEX_COMMENT_RE.sub("", tex_content)):
+        name = PATH_MACRO_RE.sub("", raw).strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def resolve_graphic(name: str, search_dirs: list[Path]) -> Path | None:
+    """File for a graphics path: tried in each directory as written, then by file name; extensions added if missing."""
+    relative = Path(name)
+    for candidate in [relative, Path(relative.name)]:
+        for directory in search_dirs:
+            path = directory / candidate
+            paths = [path] if path.suffix.lower() in GRAPHIC_EXTENSIONS else [
+                path.with_name(path.name + ext) for ext in GRAPHIC_EXTENSIONS
+            ]
+            for path in paths:
+                if path.is_file():
+                    return path
+    return None
+
+
+def chapter_figures(book: "Book", chapter: "Chapter", tex_content: str) -> tuple[list[Figure], list[str]]:
+    """(figures, graphics paths that could not be resolved) of a chapter."""
+    tex_dir = book.tex_path(chapter).parent
+    search_dirs = [tex_dir, tex_dir / "Figures", book.source_dir, book.source_dir / "Figures"]
+    figures_dir = book.qmd_path(chapter).parent / FIGURES_DIRNAME
+    cache_dir = book.out_dir / CACHE_DIRNAME / FIGURES_DIRNAME
+    figures: list[Figure] = []
+    missing: list[str] = []
+    stems: set[str] = set()
+    for name in find_graphics(tex_content):
+        source = resolve_graphic(name, search_dirs)
+        if source is None:
+            missing.append(name)
+        elif source.stem not in stems:
+            stems.add(source.stem)
+            figures.append(Figure(source, figures_dir / (source.stem + web_suffix(source)), cache_dir))
+    return figures, missing
+
+
+def figure_links(figures: list[Figure]) -> dict[str, str]:
+    """File stem -> image target for link_figures()."""
+    return {figure.source.stem: figure.link for figure in figures}
+
+
+def link_figures(content: str, links: dict[str, str]) -> str:
+    """Point the Markdown images whose file stem is in `links` to the chapter's copy."""
+    if not links or "![" not in content:
+        return content
+
+    def repl(m: re.Match) -> str:
+        target = m.group(2).strip("<>")
+        link = links.get(Path(PATH_MACRO_RE.sub("", target)).stem)
+        return m.group(1) + link if link else m.group(0)
+
+    return IMAGE_RE.sub(repl, content)
+
+
+def _optimize_raster(data: bytes, suffix: str) -> bytes:
+    """Downscale to MAX_WIDTH and re-encode (Pillow); the original bytes if Pillow is missing or it does not help."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+    out = io.BytesIO()
+    with Image.open(io.BytesIO(data)) as image:
+        resized = image.width > MAX_WIDTH
+        if resized:
+            image = image.resize((MAX_WIDTH, round(image.height * MAX_WIDTH / image.width)), Image.LANCZOS)
+        if suffix == ".png":
+            image.save(out, "PNG", optimize=True)
+        else:
+            image.convert("RGB").save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    optimized = out.getvalue()
+    return optimized if resized or len(optimized) < len(data) else data
+
+
+def convert_figure(source: str, suffix: str) -> bytes:
+    """Web version of `source` with extension `suffix`. Top-level so it can run in a process pool."""
+    path = Path(source)
+    if path.suffix.lower() == suffix:
+        data = path.read_bytes()
+        return _optimize_raster(data, suffix) if suffix in RASTER_EXTENSIONS else data
+
+    import subprocess
+    import tempfile
+
+    converter = _tool(CONVERTERS[path.suffix.lower()])
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "figure.png"
+        if path.suffix.lower() == ".pdf":
+            # First page only, like \includegraphics
+            command = [converter, "-png", "-singlefile", "-r", str(RASTER_DPI), source, str(out.with_suffix(""))]
+        else:
+            command = [converter, source, "--export-type=png", f"--export-dpi={RASTER_DPI}", f"--export-filename={out}"]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0 or not out.exists():
+            message = (result.stderr.strip().splitlines() or ["no output"])[-1]
+            raise FigureError(f"{Path(converter).name} failed on {path.name}: {message}")
+        return _optimize_raster(out.read_bytes(), ".png")
+
+
+def _cache_key(data: bytes, suffix: str) -> str:
+    h = hashlib.sha256(data)
+    h.update(f"\0{FIGURE_CACHE_VERSION}\0{suffix}\0{MAX_WIDTH}\0{RASTER_DPI}\0{JPEG_QUALITY}".encode())
+    return h.hexdigest()
+
+
+def _stamp(path: Path) -> list[int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class _Stamps:
+    """(mtime, size) of figure sources and chapter copies, per cache directory.
+
+    A source whose stamp is unchanged keeps its cache file without being read and hashed
+    again; a copy whose stamp is unchanged is not compared with the cache file.
+    """
+
+    __slots__ = ("path", "sources", "copies", "loaded")
+
+    def __init__(self, cache_dir: Path):
+        self.path = cache_dir / STAMPS_NAME
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        valid = isinstance(data, dict) and data.get("version") == FIGURE_CACHE_VERSION
+        self.sources: dict[str, list] = data.get("sources", {}) if valid else {}
+        self.copies: dict[str, list] = data.get("copies", {}) if valid else {}
+        self.loaded = json.dumps([self.sources, self.copies], sort_keys=True)
+
+    def save(self) -> None:
+        if json.dumps([self.sources, self.copies], sort_keys=True) == self.loaded:
+            return
+        data = {"version": FIGURE_CACHE_VERSION, "sources": self.sources, "copies": self.copies}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_if_changed(self.path, json.dumps(data, indent=1, sort_keys=True) + "\n")
+
+
+def convert_figures(figures: list[Figure], jobs: int = 1) -> tuple[int, int, list[str]]:
+    """Convert (or take from the cache) and copy `figures`. Returns (converted, copied, errors).
+
+    Figures missing from the cache are converted in a process pool when jobs > 1; a figure that
+    fails (whatever the exception) is reported in `errors` and the others go on. `copied`
+    counts the chapter copies actually written (unchanged ones are left alone). Sources and
+    copies whose (mtime, size) match the stamps of the cache directory are not read at all.
+    """
+    stamps: dict[Path, _Stamps] = {}
+    cached: dict[Figure, Path] = {}
+    pending: dict[Path, tuple[str, str]] = {}  # cache path -> (source, suffix)
+    errors: list[str] = []
+    for figure in figures:
+        suffix = figure.dest.suffix
+        if figure.cache_dir not in stamps:
+            stamps[figure.cache_dir] = _Stamps(figure.cache_dir)
+        dir_stamps = stamps[figure.cache_dir]
+        source_key = f"{figure.source}|{suffix}"
+        stamp = _stamp(figure.source)
+        entry = dir_stamps.sources.get(source_key)
+        if stamp is not None and entry is not None and entry[:2] == stamp and (figure.cache_dir / entry[2]).exists():
+            cached[figure] = figure.cache_dir / entry[2]
+            continue
+        try:
+            data = figure.source.read_bytes()
+        except OSError as exc:
+            errors.append(f"{figure.source}: {exc}")
+            continue
+        cache_path = cached[figure] = figure.cache_dir / (_cache_key(data, suffix) + suffix)
+        if stamp is not None:
+            dir_stamps.sources[source_key] = [*stamp, cache_path.name]
+        if not cache_path.exists():
+            pending[cache_path] = (str(figure.source), suffix)
+
+    if jobs > 1 and len(pending) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            futures = {path: pool.submit(convert_figure, *args) for path, args in pending.items()}
+            outcomes = {}
+            for path, future in futures.items():
+                try:
+                    outcomes[path] = future.result()
+                except Exception as exc:  # any Pillow failure (truncated file, decompression bomb...)
+                    outcomes[path] = exc
+    else:
+        outcomes = {}
+        for path, args in pending.items():
+            try:
+                outcomes[path] = convert_figure(*args)
+            except Exception as exc:
+                outcomes[path] = exc
+    for path, outcome in outcomes.items():
+        if isinstance(outcome, FigureError):
+            errors.append(str(outcome))
+            continue
+        if isinstance(outcome, Exception):
+            errors.append(f"{pending[path][0]}: {type(outcome).__name__}: {outcome}")
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_if_changed(path, outcome)
+
+    copied = 0
+    for figure, cache_path in cached.items():
+        if not cache_path.exists():
+            continue
+        dir_stamps = stamps[figure.cache_dir]
+        entry = dir_stamps.copies.get(str(figure.dest))
+        if entry is not None and entry[2] == cache_path.name and entry[:2] == _stamp(figure.dest):
+            continue
+        figure.dest.parent.mkdir(parents=True, exist_ok=True)
+        copied += write_if_changed(figure.dest, cache_path.read_bytes())
+        dir_stamps.copies[str(figure.dest)] = [*_stamp(figure.dest), cache_path.name]
+    for dir_stamps in stamps.values():
+        dir_stamps.save()
+    return sum(1 for outcome in outcomes.values() if not isinstance(outcome, Exception)), copied, errors
@@ -1,26 +1,14 @@
 """Generate Quarto fiscalité book from LaTeX sources. Source dir: TEX2QMD_SOURCE_DIR."""
 from pathlib import Path
+import argparse
+import os
 import re
-import subprocess
 import sys
 
 from . import IPP_ROOT, get_source_dir
-from .convert import (
-    shift_heading_levels,
-    add_placeholders_to_empty_sections,
-    fix_tabular_blocks,
-    extract_tex_comments,
-    inject_qmd_comments,
-    extract_tex_label_captions,
-    replace_ref_with_caption,
-    remove_pandoc_table_attribute_blocks,
-    prefix_footnote_labels,
-)
-from .legislation import (
-    LEGISLATION_ENTRIES,
-    link_legislation_citations,
-    write_legislation_bib,
-)
+from .backend import PANDOC_SERVER_ENV_VAR, get_backend
+from .cache import CACHE_DIRNAME
+from .profiling import PROFILE_DIRNAME
 
 OUT_DIR = IPP_ROOT / "quarto" / "fiscalite"
 
@@ -35,70 +23,136 @@ CHAPTERS = [
 ]
 
 
-def main() -> None:
+def fiscalite_book(source_dir: Path | None = None) -> "Book":
+    """The fiscalité book (CHAPTERS of get_source_dir() -> OUT_DIR)."""
+    from .book import Book, Chapter
+
+    chapters = [
+        Chapter(
+            tex_name,
+            qmd_name,
+            title,
+            inject="tex2qmd.fiscalite:inject_openfisca_tables_indirecte" if qmd_name == "indirecte.qmd" else None,
+        )
+        for tex_name, qmd_name, title in CHAPTERS
+    ]
+    return Book("fiscalite", source_dir or get_source_dir(), OUT_DIR, chapters, legislation=True)
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="tex2qmd-fiscalite",
+        description="Generate the fiscalité Quarto book (.qmd + legislation.bib) from LaTeX sources.",
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="Number of chapters converted in parallel (process pool). 0 = one per CPU. Default: 1.",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print the duration of each post-processing stage for every converted chapter.",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--ast",
+        action="store_true",
+        help="Post-process pandoc's JSON AST in one tree walk instead of rewriting Markdown text.",
+    )
+    mode.add_argument(
+        "--stream",
+        action="store_true",
+        help="Convert each chapter section by section (bounded memory, output written as it comes).",
+    )
+    parser.add_argument(
+        "--pandoc-server",
+        metavar="URL",
+        default=os.environ.get(PANDOC_SERVER_ENV_VAR),
+        help=(
+            "Send chapters to a running `pandoc server` (e.g. http://localhost:3030) instead of one "
+            f"pandoc process per chapter. Default: ${PANDOC_SERVER_ENV_VAR}; falls back to the pandoc executable."
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        type=Path,
+        const=Path(PROFILE_DIRNAME),
+        metavar="DIR",
+        help=(
+            "Reconvert every chapter and profile each stage (wall/CPU time, bytes in/out, peak memory): "
+            f"JSON per chapter and profile.json in DIR (default: ./{PROFILE_DIRNAME}), plus a summary table."
+        ),
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="With --profile, also write a cProfile dump (<chapter>.pstats) for each chapter.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help=f"Reconvert every chapter, ignoring the incremental cache ({CACHE_DIRNAME}/).",
+    )
+    parser.add_argument(
+        "--no-ref-index",
+        action="store_true",
+        help=f"Do not resolve references across chapters (label index in {OUT_DIR.name}/{CACHE_DIRNAME}/refs.sqlite).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = _parse_args(argv)
+    # Imported after parsing so --help does not load the conversion modules
+    from .book import build_books
+    from .refindex import REF_INDEX_NAME, corpus_ref_targets
+
     source_dir = get_source_dir()
     source_dir.mkdir(parents=True, exist_ok=True)
     OUT_DIR.mkdir(parents=True, exist_ok=True)
-    (OUT_DIR / "chapters").mkdir(parents=True, exist_ok=True)
 
     if not source_dir.exists():
         print(f"Source directory not found: {source_dir}", file=sys.stderr)
         print("Set TEX2QMD_SOURCE_DIR to the LaTeX chapters directory.", file=sys.stderr)
         sys.exit(1)
 
-    for tex_name, qmd_name, title in CHAPTERS:
-        tex_path = source_dir / tex_name
-        chapter_name = qmd_name.replace(".qmd", "")
-        chapter_dir = OUT_DIR / "chapters" / chapter_name
-        chapter_dir.mkdir(parents=True, exist_ok=True)
-        qmd_path = chapter_dir / qmd_name
-
-        if not tex_path.exists():
-            print(f"Skip (missing): {tex_path}")
-            continue
-
-        # Match pandoc's encoding so anchor text finds the right line in qmd (pandoc uses latin1 when tex is not UTF-8)
-        try:
-            tex_content = tex_path.read_text(encoding="utf-8")
-        except UnicodeDecodeError:
-            tex_content = tex_path.read_text(encoding="latin-1")
-        comments_with_anchors = extract_tex_comments(tex_content)
-
-        result = subprocess.run(
-            [
-                "pandoc",
-                str(tex_path),
-                "-f", "latex",
-                "-t", "markdown",
-                "-o", str(qmd_path),
-            ],
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode != 0:
-            print(f"Pandoc failed for {tex_name}: {result.stderr}", file=sys.stderr)
-            continue
-
-        content = qmd_path.read_text(encoding="utf-8", errors="replace")
-        label_to_caption = extract_tex_label_captions(tex_content)
-        content = replace_ref_with_caption(content, label_to_caption)
-        content = inject_qmd_comments(content, comments_with_anchors)
-        content = remove_pandoc_table_attribute_blocks(content)
-        content = shift_heading_levels(content)
-        content = add_placeholders_to_empty_sections(content)
-        content = fix_tabular_blocks(content)
-        content = prefix_footnote_labels(content, chapter_name)
-        content = link_legislation_citations(content, LEGISLATION_ENTRIES)
-        if qmd_name == "indirecte.qmd":
-            content = inject_openfisca_tables_indirecte(content)
-        header = f"---\ntitle: \"{title}\"\n---\n\n"
-        qmd_path.write_text(header + content, encoding="utf-8")
-        print(f"OK: {tex_name} -> {qmd_name}")
-
-    write_legislation_bib(OUT_DIR / "legislation.bib", LEGISLATION_ENTRIES)
-    print("OK: legislation.bib written")
-
+    book = fiscalite_book(source_dir)
+    ref_targets = None
+    if not args.no_ref_index:
+        ref_targets = corpus_ref_targets(OUT_DIR / CACHE_DIRNAME / REF_INDEX_NAME, [book], args.jobs)
+    ok = build_books(
+        [book],
+        jobs=args.jobs,
+        force=args.force,
+        timings=args.timings,
+        backend=get_backend(args.pandoc_server),
+        ast=args.ast,
+        stream=args.stream,
+        profile_dir=args.profile,
+        cprofile=args.cprofile,
+        ref_targets=ref_targets,
+    )
     print(f"Done. To render HTML + PDF: cd {OUT_DIR} && quarto render")
+    if not ok:
+        sys.exit(1)
+
+
+# Blocks of indirecte.qmd rewritten by inject_openfisca_tables_indirecte
+SYS_PATH_CHUNK_RE = re.compile(
+    r"```{python}\n#\| include: false\n# OpenFisca tables import path.*?```\n\n",
+    re.DOTALL,
+)
+TABAC_SENTENCE_RE = re.compile(
+    r"tableau\s*\[Fiscalité applicable aux tabacs au 1er janvier 2013\.\]\(#table:taxes-tabac\)\{reference-type=\"ref\" reference=\"table:taxes-tabac\"\}.*?tabacs\.\s*\\?\n",
+    re.DOTALL,
+)
+ALCOOLS_SENTENCE_RE = re.compile(
+    r"tableau\s*\[Fiscalité applicable aux alcools au 1er janvier 2013\.\]\(#table:taxes-alcools\)\{reference-type=\"ref\" reference=\"table:taxes-alcools\"\}.*?2013\.\s*\\?\n",
+    re.DOTALL,
+)
 
 
 def inject_openfisca_tables_indirecte(content: str) -> str:
@@ -131,9 +185,9 @@ def inject_openfisca_tables_indirecte(content: str) -> str:
         "#| tbl-cap: \"Évolution des taux de TVA en France depuis 1972.\"\n"
         "#| cap-location: top\n"
         "#| echo: false\n"
-        "from quarto.openfisca_tables.core import get_table_or_static\n"
-        "from chapters.indirecte.openfisca_tables import table_tva_historique_df\n"
-        "get_table_or_static(table_tva_historique_df, \"chapters/indirecte/tables/tva_historique_static.md\").style.hide(axis=\"index\")\n"
+        "from quarto.openfisca_tables.registry import get_table\n"
+        "import chapters.indirecte.openfisca_tables  # registers the chapter's tables\n"
+        "get_table(\"tva_historique\")\n"
         "```\n"
     )
     tabac_chunk = (
@@ -142,9 +196,9 @@ def inject_openfisca_tables_indirecte(content: str) -> str:
         "#| tbl-cap: \"Évolution des taux normaux du droit de consommation sur les tabacs (par type).\"\n"
         "#| cap-location: top\n"
         "#| echo: false\n"
-        "from quarto.openfisca_tables.core import get_table_or_static\n"
-        "from chapters.indirecte.openfisca_tables import table_tabac_taux_normal_df\n"
-        "get_table_or_static(table_tabac_taux_normal_df, \"chapters/indirecte/tables/tabac_taux_normal_static.md\").style.hide(axis=\"index\")\n"
+        "from quarto.openfisca_tables.registry import get_table\n"
+        "import chapters.indirecte.openfisca_tables  # registers the chapter's tables\n"
+        "get_table(\"tabac_taux_normal\")\n"
         "```\n"
     )
     alcools_chunk = (
@@ -153,19 +207,14 @@ def inject_openfisca_tables_indirecte(content: str) -> str:
         "#| tbl-cap: \"Évolution des droits par type de boisson (€/hl ou assimilé).\"\n"
         "#| cap-location: top\n"
         "#| echo: false\n"
-        "from quarto.openfisca_tables.core import get_table_or_static\n"
-        "from chapters.indirecte.openfisca_tables import table_alcools_droits_df\n"
-        "get_table_or_static(table_alcools_droits_df, \"chapters/indirecte/tables/alcools_droits_static.md\").style.hide(axis=\"index\")\n"
+        "from quarto.openfisca_tables.registry import get_table\n"
+        "import chapters.indirecte.openfisca_tables  # registers the chapter's tables\n"
+        "get_table(\"alcools_droits\")\n"
         "```\n"
     )
 
     if "OpenFisca tables import path" in content:
-        content = re.sub(
-            r"```{python}\n#\| include: false\n# OpenFisca tables import path.*?```\n\n",
-            sys_path_chunk,
-            content,
-            flags=re.DOTALL,
-        )
+        content = SYS_PATH_CHUNK_RE.sub(sys_path_chunk, content)
     else:
         content = sys_path_chunk + content
 
@@ -174,22 +223,18 @@ def inject_openfisca_tables_indirecte(content: str) -> str:
     content = _replace_table_block_by_id(content, "table:taxes-alcools", alcools_chunk)
 
     # Update tabac sentence to match the new OpenFisca table
-    content = re.sub(
-        r"tableau\s*\[Fiscalité applicable aux tabacs au 1er janvier 2013\.\]\(#table:taxes-tabac\)\{reference-type=\"ref\" reference=\"table:taxes-tabac\"\}.*?tabacs\.\s*\\?\n",
+    content = TABAC_SENTENCE_RE.sub(
         "tableau [Évolution des taux normaux du droit de consommation sur les tabacs (par type).](#table:taxes-tabac){reference-type=\"ref\" reference=\"table:taxes-tabac\"} résume les changements intervenus sur les taux.\n",
         content,
-        flags=re.DOTALL,
     )
 
     # Update alcools sentence to match the new OpenFisca table; insert chunk if missing
     if "table:taxes-alcools" in content:
-        content = re.sub(
-            r"tableau\s*\[Fiscalité applicable aux alcools au 1er janvier 2013\.\]\(#table:taxes-alcools\)\{reference-type=\"ref\" reference=\"table:taxes-alcools\"\}.*?2013\.\s*\\?\n",
+        content = ALCOOLS_SENTENCE_RE.sub(
             "tableau [Évolution des droits par type de boisson (€/hl ou assimilé).](#table:taxes-alcools){reference-type=\"ref\" reference=\"table:taxes-alcools\"} présente l'évolution des droits applicables aux boissons alcoolisées.\n",
             content,
-            flags=re.DOTALL,
         )
-        if "table_alcools_droits_df" not in content:
+        if "#| label: taxes-alcools" not in content:
             content = content.replace(
                 "tableau [Évolution des droits par type de boisson (€/hl ou assimilé).](#table:taxes-alcools){reference-type=\"ref\" reference=\"table:taxes-alcools\"} présente l'évolution des droits applicables aux boissons alcoolisées.\n",
                 "tableau [Évolution des droits par type de boisson (€/hl ou assimilé).](#table:taxes-alcools){reference-type=\"ref\" reference=\"table:taxes-alcools\"} présente l'évolution des droits applicables aux boissons alcoolisées.\n"
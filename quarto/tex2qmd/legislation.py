@@ -1,5 +1,9 @@
 """Legislation: in-text patterns → [@key], and .bib generation. Single source of truth in LEGISLATION_ENTRIES."""
+from functools import lru_cache
 from pathlib import Path
+import re
+
+from .output import write_if_changed
 
 # Each entry: key, patterns, title, issued (YYYY-MM-DD), optional shorthand, optional url (Légifrance LODA).
 # Longer patterns first. URL: Légifrance LODA (legifrance.gouv.fr/loda/id/JORFTEXT...).
@@ -25,29 +29,72 @@ LEGISLATION_ENTRIES: list[dict] = [
 ]
 
 
-def _link_legislation_one(content: str, key: str, pattern: str) -> str:
-    citation_suffix = f" [@{key}]"
-    placeholder = "\uE000LEGREF\uE001" + key + "\uE002"
-    content = content.replace(pattern + citation_suffix, placeholder)
-    content = content.replace(pattern, pattern + citation_suffix)
-    content = content.replace(placeholder, pattern + citation_suffix)
-    return content
+def _trie_pattern(words: list[str]) -> str:
+    """Regex source matching any of `words`, built as a character trie.
+
+    At each node the continuations are tried before stopping (greedy optional group), so the
+    longest word starting at a position wins; the regex engine walks the trie once per
+    position instead of trying every word.
+    """
+    end = ""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[end] = True
+
+    def _serialize(node: dict) -> str:
+        branches = [re.escape(ch) + _serialize(child) for ch, child in sorted(node.items()) if ch != end]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end in node:
+            body = "(?:" + body + ")?"
+        return body
+
+    return _serialize(trie)
+
+
+@lru_cache(maxsize=32)
+def _legislation_matcher(pairs: tuple[tuple[str, tuple[str, ...]], ...]) -> tuple[re.Pattern | None, dict[str, str]]:
+    """Compiled matcher and pattern -> key map for ((key, patterns), ...). First entry wins on duplicates."""
+    pattern_to_key: dict[str, str] = {}
+    for key, patterns in pairs:
+        for p in patterns:
+            if p:
+                pattern_to_key.setdefault(p, key)
+    if not pattern_to_key:
+        return None, pattern_to_key
+    return re.compile(_trie_pattern(list(pattern_to_key))), pattern_to_key
 
 
 def link_legislation_citations(content: str, entries: list[dict]) -> str:
-    """Replace legislation phrases with 'phrase [@key]'. Longer patterns first."""
-    pairs: list[tuple[str, str]] = []
-    for e in entries:
-        for p in e["patterns"]:
-            pairs.append((e["key"], p))
-    pairs.sort(key=lambda x: -len(x[1]))
-    for key, pattern in pairs:
-        content = _link_legislation_one(content, key, pattern)
-    return content
+    """Replace legislation phrases with 'phrase [@key]'. Longer patterns first.
+
+    Single pass over the text: at each position the longest pattern wins, and a phrase already
+    followed by its ' [@key]' is left as is (idempotent).
+    """
+    matcher, pattern_to_key = _legislation_matcher(
+        tuple((e["key"], tuple(e["patterns"])) for e in entries)
+    )
+    if matcher is None:
+        return content
+
+    def _repl(m: re.Match) -> str:
+        citation_suffix = f" [@{pattern_to_key[m.group(0)]}]"
+        if content.startswith(citation_suffix, m.end()):
+            return m.group(0)
+        return m.group(0) + citation_suffix
+
+    return matcher.sub(_repl, content)
+
 
+def write_legislation_bib(path: Path, entries: list[dict]) -> bool:
+    """Write legislation.bib from LEGISLATION_ENTRIES. Uses @misc with type=legislation for CSL.
 
-def write_legislation_bib(path: Path, entries: list[dict]) -> None:
-    """Write legislation.bib from LEGISLATION_ENTRIES. Uses @misc with type=legislation for CSL."""
+    The file is left untouched when its content would not change; returns True if written.
+    """
     lines = [
         "% Textes de loi — généré par le package quarto/tex2qmd (tex2qmd-fiscalite).",
         "% Ne pas éditer à la main ; modifier LEGISLATION_ENTRIES dans quarto/tex2qmd/legislation.py.",
@@ -70,4 +117,4 @@ def write_legislation_bib(path: Path, entries: list[dict]) -> None:
             lines.append(f'  url = {{{url}}},')
         lines.append("}")
         lines.append("")
-    path.write_text("\n".join(lines), encoding="utf-8")
+    return write_if_changed(path, "\n".join(lines))
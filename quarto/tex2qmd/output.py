@@ -0,0 +1,106 @@
+"""Generated files (.qmd, .bib, cache manifests): atomic writes that skip unchanged content.
+
+Output goes to a temporary file in the target directory, renamed over the target only when
+its bytes differ, so readers never see a half-written file and an identical output keeps
+its mtime (Quarto's freeze and render caches stay warm after a full rebuild).
+
+open_streaming is the exception, for --stream: the file is written in place so its first
+sections are visible early, and only the mtime of an unchanged file is preserved.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+import filecmp
+import hashlib
+import os
+import tempfile
+
+
+def _new_file_mode(path: Path) -> int:
+    """Permissions for `path`: those of the file it replaces, else what open() would give."""
+    try:
+        return path.stat().st_mode & 0o777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _replace_if_changed(tmp: str, path: Path) -> bool:
+    if path.exists() and filecmp.cmp(tmp, path, shallow=False):
+        os.unlink(tmp)
+        return False
+    os.chmod(tmp, _new_file_mode(path))
+    os.replace(tmp, path)
+    return True
+
+
+@contextmanager
+def open_if_changed(path: Path, encoding: str = "utf-8") -> Iterator[IO[str]]:
+    """Text file to write `path` through (for output produced piece by piece).
+
+    On success the temporary file replaces `path` unless the content is identical; on error
+    it is removed and `path` is left as it was.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline="\n") as f:
+            yield f
+        _replace_if_changed(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _digest(path: Path) -> bytes | None:
+    """SHA-256 of a file, read in chunks (None if it cannot be read)."""
+    h = hashlib.sha256()
+    try:
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.digest()
+
+
+@contextmanager
+def open_streaming(path: Path, encoding: str = "utf-8") -> Iterator[IO[str]]:
+    """Text file writing `path` in place, for output that should be readable while it grows.
+
+    Unlike open_if_changed this is not atomic: readers can see a partial file, and an error
+    leaves it truncated (the caller reports the failure, so the chapter is reconverted next
+    time). When the final bytes equal the previous content, the previous mtime is restored,
+    so an unchanged file still looks untouched to Quarto's caches.
+    """
+    try:
+        before = path.stat()
+    except OSError:
+        before = None
+    old_digest = _digest(path) if before is not None else None
+    with path.open("w", encoding=encoding, newline="\n") as f:
+        yield f
+    if old_digest is not None and path.stat().st_size == before.st_size and _digest(path) == old_digest:
+        os.utime(path, ns=(before.st_atime_ns, before.st_mtime_ns))
+
+
+def write_if_changed(path: Path, text: str | bytes, encoding: str = "utf-8") -> bool:
+    """Write `text` (or bytes) to `path` atomically unless it already holds these bytes. True if written."""
+    data = text if isinstance(text, bytes) else text.encode(encoding)
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, _new_file_mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return True
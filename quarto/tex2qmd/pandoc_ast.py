@@ -0,0 +1,248 @@
+"""Chapter post-processing on pandoc's JSON AST (``pandoc -t json``), in one walk over the tree.
+
+The AST counterparts of the Markdown text transforms in convert.py:
+
+- Header levels shifted by one (shift_heading_levels);
+- ref links get the table/figure caption as text (replace_ref_with_caption);
+- ``[]{#id label="id"}`` anchor spans keep only a normalized id, "1 janvier" becomes
+  "1er janvier", a space is put before a footnote glued to a word
+  (remove_pandoc_table_attribute_blocks);
+- Divs of class "tabular" become raw Markdown tables (fix_tabular_blocks);
+- empty top-level sections get the placeholder (add_placeholders_to_empty_sections).
+
+Footnote labels, comments and legislation links only exist in the Markdown written back by
+pandoc; they stay text transforms.
+"""
+import json
+from typing import Any
+
+from .convert import PLACEHOLDER, _latex_caption_to_plain, _normalize_anchor_id, tabular_to_markdown
+
+# Element types whose lists hold blocks / inlines (pandoc-types 1.23)
+BLOCK_TYPES = frozenset({
+    "Plain", "Para", "LineBlock", "CodeBlock", "RawBlock", "BlockQuote", "OrderedList",
+    "BulletList", "DefinitionList", "Header", "HorizontalRule", "Table", "Figure", "Div",
+})
+INLINE_TYPES = frozenset({
+    "Str", "Emph", "Underline", "Strong", "Strikeout", "Superscript", "Subscript", "SmallCaps",
+    "Quoted", "Cite", "Code", "Space", "SoftBreak", "LineBreak", "Math", "RawInline", "Link",
+    "Image", "Note", "Span",
+})
+# Characters escaped by pandoc's Markdown writer that the tabular repair relies on
+MARKDOWN_ESCAPES = str.maketrans({c: "\\" + c for c in "\\|*_[]"})
+
+SPACE = {"t": "Space"}
+
+
+def _str(text: str) -> dict:
+    return {"t": "Str", "c": text}
+
+
+def _words(text: str) -> list[dict]:
+    """Inlines for plain text: Str per word separated by Space."""
+    inlines: list[dict] = []
+    for word in text.split():
+        if inlines:
+            inlines.append(SPACE)
+        inlines.append(_str(word))
+    return inlines
+
+
+def _raw_markdown(text: str) -> dict:
+    return {"t": "RawBlock", "c": ["markdown", text]}
+
+
+def _kind(value: Any) -> str | None:
+    """'blocks' or 'inlines' if `value` is a list of such elements, else None."""
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        t = value[0].get("t")
+        if t in BLOCK_TYPES:
+            return "blocks"
+        if t in INLINE_TYPES:
+            return "inlines"
+    return None
+
+
+class AstTransformer:
+    """One walk over a pandoc document applying every chapter transform."""
+
+    def __init__(
+        self,
+        label_to_caption: dict[str, str],
+        table_format: str = "pipe",
+        external: dict[str, tuple[str | None, str | None]] | None = None,
+    ):
+        self.label_to_caption = label_to_caption
+        self.table_format = table_format
+        self.external = external or {}  # labels of other chapters (see refindex.py)
+
+    def document(self, doc: dict) -> dict:
+        blocks = self._blocks(doc.get("blocks", []))
+        doc["blocks"] = self._add_placeholders(blocks)
+        return doc
+
+    def _walk(self, value: Any) -> Any:
+        """Transform any JSON value, dispatching block and inline lists."""
+        kind = _kind(value)
+        if kind == "blocks":
+            return self._blocks(value)
+        if kind == "inlines":
+            return self._inlines(value)
+        if isinstance(value, list):
+            return [self._walk(v) for v in value]
+        if isinstance(value, dict) and "c" in value:
+            value["c"] = self._walk(value["c"])
+        return value
+
+    def _blocks(self, blocks: list[dict]) -> list[dict]:
+        out: list[dict] = []
+        for block in blocks:
+            t = block.get("t")
+            if t == "Header":
+                level, attr, inlines = block["c"]
+                block["c"] = [min(level + 1, 6), attr, self._inlines(inlines)]
+            elif t == "Div" and "tabular" in block["c"][0][1]:
+                table = tabular_to_markdown(blocks_to_markdown(block["c"][1]), self.table_format)
+                if table:
+                    out.append(_raw_markdown(table))
+                continue
+            elif "c" in block:
+                block["c"] = self._walk(block["c"])
+            out.append(block)
+        return out
+
+    def _inlines(self, inlines: list[dict]) -> list[dict]:
+        out: list[dict] = []
+        n = len(inlines)
+        for i, inline in enumerate(inlines):
+            t = inline.get("t")
+            if t == "Link":
+                inline = self._ref_link(inline)
+            elif t == "Span":
+                inline = self._anchor_span(inline)
+            elif t == "Str":
+                text = inline["c"]
+                # Pandoc drops \er from "1\er janvier"
+                if (
+                    text.endswith("1")
+                    and (len(text) == 1 or not text[-2].isdigit())
+                    and i + 2 < n
+                    and inlines[i + 1].get("t") in ("Space", "SoftBreak")
+                    and inlines[i + 2].get("t") == "Str"
+                    and inlines[i + 2]["c"].startswith("janvier")
+                    and not inlines[i + 2]["c"][7:8].isalnum()
+                ):
+                    inline = _str(text + "er")
+            elif t == "Note":
+                # Footnote glued to a word: "solidarité11" in the output
+                if out and out[-1].get("t") == "Str" and out[-1]["c"][-1:].isalpha():
+                    out.append(SPACE)
+            if "c" in inline and t not in ("Str",):
+                inline["c"] = self._walk(inline["c"])
+            out.append(inline)
+        return out
+
+    def _ref_link(self, link: dict) -> dict:
+        attr, inlines, target = link["c"]
+        attrs = dict(attr[2])
+        if attrs.get("reference-type") != "ref" or "reference" not in attrs:
+            return link
+        ref = attrs["reference"].strip()
+        caption = self.label_to_caption.get(ref)
+        if not caption:
+            return self._external_ref_link(link, ref)
+        anchor = _normalize_anchor_id(target[0].lstrip("#"))
+        kv = [[k, anchor if k == "reference" else v] for k, v in attr[2]]
+        return {"t": "Link", "c": [[attr[0], attr[1], kv], _words(_latex_caption_to_plain(caption)), ["#" + anchor, target[1]]]}
+
+    def _external_ref_link(self, link: dict, ref: str) -> dict:
+        """Ref to a label of another chapter: link to its .qmd, or caption text (another book)."""
+        target = self.external.get(ref)
+        if target is None:
+            return link
+        attr, inlines, target_url = link["c"]
+        caption, href = target
+        text = _words(_latex_caption_to_plain(caption)) if caption else inlines
+        if href is None:
+            return {"t": "Span", "c": [["", [], []], text]}
+        kv = [[k, _normalize_anchor_id(ref) if k == "reference" else v] for k, v in attr[2]]
+        return {"t": "Link", "c": [[attr[0], attr[1], kv], text, [href, target_url[1]]]}
+
+    def _anchor_span(self, span: dict) -> dict:
+        attr, inlines = span["c"]
+        ident, _classes, kv = attr
+        if inlines or not ident or not any(k == "label" for k, _v in kv):
+            return span
+        return {"t": "Span", "c": [[_normalize_anchor_id(ident), [], []], []]}
+
+    def _add_placeholders(self, blocks: list[dict]) -> list[dict]:
+        """Placeholder after top-level headers directly followed by a header or the end."""
+        out: list[dict] = []
+        for i, block in enumerate(blocks):
+            out.append(block)
+            if block.get("t") == "Header" and (i + 1 == len(blocks) or blocks[i + 1].get("t") == "Header"):
+                out.append(_raw_markdown(PLACEHOLDER))
+        return out
+
+
+def inlines_to_markdown(inlines: list[dict]) -> str:
+    """Approximate Markdown of inlines, escaped like pandoc's writer (for tabular repair)."""
+    parts: list[str] = []
+    for inline in inlines:
+        t = inline.get("t")
+        c = inline.get("c")
+        if t == "Str":
+            parts.append(c.translate(MARKDOWN_ESCAPES))
+        elif t == "Space":
+            parts.append(" ")
+        elif t == "SoftBreak":
+            parts.append("\n")
+        elif t == "LineBreak":
+            parts.append("\\\n")
+        elif t == "Strong":
+            parts.append("**" + inlines_to_markdown(c) + "**")
+        elif t == "Emph":
+            parts.append("*" + inlines_to_markdown(c) + "*")
+        elif t == "Math":
+            parts.append("$" + c[1] + "$")
+        elif t == "Code":
+            parts.append("`" + c[1] + "`")
+        elif t == "RawInline":
+            parts.append(c[1])
+        elif t in ("Link", "Image"):
+            parts.append(inlines_to_markdown(c[1]))
+        elif t in ("Span", "Quoted", "Cite"):
+            parts.append(inlines_to_markdown(c[1]))
+        elif t == "Note":
+            continue
+        elif isinstance(c, list):
+            parts.append(inlines_to_markdown(c))
+    return "".join(parts)
+
+
+def blocks_to_markdown(blocks: list[dict]) -> str:
+    """Lines of the blocks' text content (tabular Divs hold paragraphs of "a & b \\\\" rows)."""
+    lines: list[str] = []
+    for block in blocks:
+        t = block.get("t")
+        c = block.get("c")
+        if t in ("Para", "Plain"):
+            lines.append(inlines_to_markdown(c))
+        elif t == "LineBlock":
+            lines.extend(inlines_to_markdown(line) for line in c)
+        elif t == "RawBlock":
+            lines.append(c[1])
+        elif t in ("Div", "BlockQuote"):
+            lines.append(blocks_to_markdown(c[1] if t == "Div" else c))
+    return "\n".join(lines)
+
+
+def transform_ast_json(
+    doc_json: str,
+    label_to_caption: dict[str, str],
+    table_format: str = "pipe",
+    external: dict[str, tuple[str | None, str | None]] | None = None,
+) -> str:
+    """Pandoc JSON in, transformed pandoc JSON out."""
+    doc = AstTransformer(label_to_caption, table_format, external).document(json.loads(doc_json))
+    return json.dumps(doc, ensure_ascii=False)
@@ -0,0 +1,108 @@
+"""Post-processing pipeline for converted QMD, with per-stage timing.
+
+Stages are either text transforms (str -> str) or line transforms (iterable of lines ->
+iterator of lines). Consecutive line stages are fused: the document is split once, streamed
+through the chained generators and joined once, instead of being split and rebuilt per stage.
+"""
+from time import perf_counter
+from typing import Callable, Iterable, Iterator
+
+TextTransform = Callable[[str], str]
+LineTransform = Callable[[Iterable[str]], Iterator[str]]
+
+
+class Pipeline:
+    """Ordered list of named stages. `timings` holds (stage name, seconds) for the last run."""
+
+    def __init__(self) -> None:
+        self._stages: list[tuple[str, bool, Callable]] = []
+        self.timings: list[tuple[str, float]] = []
+
+    def text(self, name: str, func: TextTransform) -> "Pipeline":
+        """Append a whole-document transform."""
+        self._stages.append((name, False, func))
+        return self
+
+    def lines(self, name: str, func: LineTransform) -> "Pipeline":
+        """Append a line transform (fused with adjacent line transforms)."""
+        self._stages.append((name, True, func))
+        return self
+
+    @property
+    def stage_names(self) -> list[str]:
+        return [name for name, _is_lines, _func in self._stages]
+
+    def run(self, content: str, recorder=None) -> str:
+        """Apply every stage to `content`.
+
+        With a profiling.StageRecorder, stages run one by one through the recorder (line
+        stages are not fused, so each gets its own figures).
+        """
+        if recorder is not None:
+            for name, is_lines, func in self._stages:
+                if is_lines:
+                    content = recorder.run(name, lambda c, f=func: "\n".join(f(c.split("\n"))), content)
+                else:
+                    content = recorder.run(name, func, content)
+            self.timings = recorder.timings[-len(self._stages):] if self._stages else []
+            return content
+        self.timings = []
+        i = 0
+        while i < len(self._stages):
+            name, is_lines, func = self._stages[i]
+            if not is_lines:
+                t0 = perf_counter()
+                content = func(content)
+                self.timings.append((name, perf_counter() - t0))
+                i += 1
+                continue
+            j = i
+            while j < len(self._stages) and self._stages[j][1]:
+                j += 1
+            content = self._run_lines(self._stages[i:j], content)
+            i = j
+        return content
+
+    def _run_lines(self, stages: list[tuple[str, bool, Callable]], content: str) -> str:
+        # inclusive[k]: time spent pulling lines out of stage k (includes the stages before it)
+        inclusive = [0.0] * (len(stages) + 1)
+        t0 = perf_counter()
+        lines: Iterable[str] = content.split("\n")
+        inclusive[0] = perf_counter() - t0
+        for k, (_name, _is_lines, func) in enumerate(stages, start=1):
+            lines = _timed(func(lines), inclusive, k)
+        t0 = perf_counter()
+        content = "\n".join(lines)
+        join_time = perf_counter() - t0 - inclusive[-1]
+        for k, (name, _is_lines, _func) in enumerate(stages, start=1):
+            own = inclusive[k] - inclusive[k - 1]
+            if k == 1:
+                own += inclusive[0]  # split
+            if k == len(stages):
+                own += join_time
+            self.timings.append((name, own))
+        return content
+
+
+def _timed(lines: Iterator[str], acc: list[float], index: int) -> Iterator[str]:
+    """Yield from `lines`, adding the time spent in each next() to acc[index]."""
+    while True:
+        t0 = perf_counter()
+        try:
+            line = next(lines)
+        except StopIteration:
+            acc[index] += perf_counter() - t0
+            return
+        acc[index] += perf_counter() - t0
+        yield line
+
+
+def format_timings(timings: list[tuple[str, float]]) -> str:
+    """One line per stage with its duration and share of the total, for console output."""
+    if not timings:
+        return ""
+    total = sum(t for _name, t in timings) or 1.0
+    width = max(len(name) for name, _t in timings)
+    return "\n".join(
+        f"  {name:<{width}}  {t * 1000:8.2f} ms  {t / total:6.1%}" for name, t in timings
+    )
@@ -0,0 +1,156 @@
+"""Profiling of tex2qmd runs (--profile): per chapter and per stage, wall and CPU time,
+bytes in and out, and peak Python memory (tracemalloc).
+
+Each converted chapter writes ``<dir>/<book>/<chapter>.json`` (and ``.pstats`` with
+--cprofile) from the worker that converted it; the caller then merges them into
+``<dir>/profile.json`` and prints a summary table. Times include tracemalloc's overhead.
+"""
+from pathlib import Path
+from time import perf_counter, process_time
+import json
+import sys
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_DIRNAME = ".tex2qmd-profile"
+REPORT_NAME = "profile.json"
+
+
+def _size(data) -> int | None:
+    if isinstance(data, str):
+        return len(data.encode("utf-8", errors="replace"))
+    if isinstance(data, bytes):
+        return len(data)
+    if isinstance(data, Path):
+        try:
+            return data.stat().st_size
+        except OSError:
+            return None
+    return None
+
+
+def process_peak_rss() -> int | None:
+    """Peak resident set size of this process in bytes (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, kilobytes elsewhere
+
+
+class StageRecorder:
+    """Run functions as named stages and record their cost in `stages` (list of dicts)."""
+
+    def __init__(self) -> None:
+        self.stages: list[dict] = []
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    def run(self, name: str, func, data, bytes_in: int | None = None):
+        """Return func(data), recording the stage."""
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        wall, cpu = perf_counter(), process_time()
+        result = func(data)
+        wall, cpu = perf_counter() - wall, process_time() - cpu
+        peak = tracemalloc.get_traced_memory()[1] - base
+        self.stages.append({
+            "stage": name,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "bytes_in": _size(data) if bytes_in is None else bytes_in,
+            "bytes_out": _size(result),
+            "peak_mem_bytes": max(peak, 0),
+        })
+        return result
+
+    @property
+    def timings(self) -> list[tuple[str, float]]:
+        return [(s["stage"], s["wall_s"]) for s in self.stages]
+
+    def close(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+
+def chapter_profile_path(profile_dir: Path, book_name: str, qmd_name: str) -> Path:
+    return profile_dir / book_name / qmd_name.replace(".qmd", ".json")
+
+
+def write_chapter_profile(
+    profile_dir: Path,
+    book_name: str,
+    qmd_name: str,
+    tex_name: str,
+    mode: str,
+    recorder: StageRecorder,
+) -> Path:
+    path = chapter_profile_path(profile_dir, book_name, qmd_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "book": book_name,
+        "chapter": qmd_name,
+        "tex": tex_name,
+        "mode": mode,
+        "wall_s": sum(s["wall_s"] for s in recorder.stages),
+        "cpu_s": sum(s["cpu_s"] for s in recorder.stages),
+        "process_peak_rss_bytes": process_peak_rss(),
+        "stages": recorder.stages,
+    }
+    path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    return path
+
+
+def write_profile_report(profile_dir: Path, chapter_paths: list[Path]) -> tuple[Path, list[dict]]:
+    """Merge the chapter profiles that exist into <profile_dir>/profile.json."""
+    chapters = []
+    for path in chapter_paths:
+        try:
+            chapters.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    report = profile_dir / REPORT_NAME
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    report.write_text(json.dumps({"chapters": chapters}, indent=2) + "\n", encoding="utf-8")
+    return report, chapters
+
+
+def _mb(n: int | None) -> str:
+    return "" if n is None else f"{n / 1e6:.2f}"
+
+
+def format_profile_summary(chapters: list[dict]) -> str:
+    """Table of stages summed over chapters, then one line per chapter."""
+    if not chapters:
+        return "No chapter profiled."
+    totals: dict[str, dict] = {}
+    for chapter in chapters:
+        for s in chapter["stages"]:
+            t = totals.setdefault(s["stage"], {"wall_s": 0.0, "cpu_s": 0.0, "bytes_in": 0, "bytes_out": 0, "peak": 0})
+            t["wall_s"] += s["wall_s"]
+            t["cpu_s"] += s["cpu_s"]
+            t["bytes_in"] += s["bytes_in"] or 0
+            t["bytes_out"] += s["bytes_out"] or 0
+            t["peak"] = max(t["peak"], s["peak_mem_bytes"])
+    total_wall = sum(t["wall_s"] for t in totals.values()) or 1.0
+    width = max(len(name) for name in totals)
+    lines = [
+        f"  {'stage':<{width}}  {'wall ms':>10}  {'cpu ms':>10}  {'share':>6}  {'in MB':>8}  {'out MB':>8}  {'peak MB':>8}"
+    ]
+    for name, t in sorted(totals.items(), key=lambda item: -item[1]["wall_s"]):
+        lines.append(
+            f"  {name:<{width}}  {t['wall_s'] * 1000:10.1f}  {t['cpu_s'] * 1000:10.1f}  {t['wall_s'] / total_wall:6.1%}"
+            f"  {_mb(t['bytes_in']):>8}  {_mb(t['bytes_out']):>8}  {_mb(t['peak']):>8}"
+        )
+    lines.append("")
+    for chapter in sorted(chapters, key=lambda c: -c["wall_s"]):
+        lines.append(
+            f"  {chapter['book']}/{chapter['chapter']}: {chapter['wall_s'] * 1000:.1f} ms wall, "
+            f"{chapter['cpu_s'] * 1000:.1f} ms cpu, peak RSS {_mb(chapter['process_peak_rss_bytes'])} MB"
+        )
+    return "\n".join(lines)
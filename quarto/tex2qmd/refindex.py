@@ -0,0 +1,311 @@
+"""Corpus-wide index of LaTeX labels, captions, \\ref, \\cite and \\input, for references across chapters.
+
+replace_ref_with_caption() only knows the captions of the chapter being converted, so a
+\\ref to a table of another chapter stays a bare number or ``[\\[label\\]]``. RefIndex scans
+every .tex under a root directory (the common parent of the books' source directories) into
+a SQLite file (``.tex2qmd-cache/refs.sqlite``) and keeps it up to date: on each build only
+the files whose mtime or size changed are rescanned, in a process pool when there are many.
+
+chapter_ref_targets() then resolves, for each chapter, the labels it refers to that are
+defined in another chapter: a chapter of the same book gives a link to that chapter's .qmd
+(``../revenu/revenu.qmd#micro``); a chapter of another book only gives the caption as
+text, since books are rendered separately. A label defined in several chapters is left as
+pandoc wrote it.
+"""
+from pathlib import Path
+import hashlib
+import os
+import re
+
+from .backend import TEX_INPUT_RE, read_tex
+from .convert import _normalize_anchor_id, extract_tex_label_captions
+
+REF_INDEX_NAME = "refs.sqlite"  # under <dir>/.tex2qmd-cache/
+SCHEMA_VERSION = 1
+# Below this many files to scan, starting a process pool costs more than it saves (~0.5 ms per file)
+PARALLEL_SCAN_MIN_FILES = 256
+
+# Unescaped % to the end of the line
+TEX_COMMENT_RE = re.compile(r"(?<!\\)%.*")
+LABEL_RE = re.compile(r"\\label\s*\{([^}]+)\}")
+# \ref, \autoref, \cref, \pageref, \eqref, \nameref... (comma-separated labels for \cref)
+REF_RE = re.compile(r"\\(?:auto|c|C|page|eq|name|v)?ref\*?\s*\{([^}]+)\}")
+# \cite, \citep, \citet, \nocite... with optional [pre][post] notes
+CITE_RE = re.compile(r"\\(?:no)?cite[a-zA-Z]*\*?\s*(?:\[[^\]]*\]\s*)*\{([^}]+)\}")
+# \chapter{\label{id}Title}, \section{Title \label{id}} or \section{Title}\label{id} (one level of
+# nested braces in the title): the title is the label's caption
+HEADING_RE = re.compile(
+    r"\\(?:chapter|(?:sub)*section|paragraph)\*?\s*(?:\[[^\]]*\]\s*)?\{((?:[^{}]|\{[^{}]*\})*)\}"
+    r"(?:\s*\\label\s*\{([^}]+)\})?"
+)
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE files (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL);
+CREATE TABLE labels (path TEXT NOT NULL, label TEXT NOT NULL, caption TEXT);
+CREATE TABLE refs (path TEXT NOT NULL, label TEXT NOT NULL);
+CREATE TABLE cites (path TEXT NOT NULL, key TEXT NOT NULL);
+CREATE TABLE inputs (path TEXT NOT NULL, target TEXT NOT NULL);
+CREATE INDEX labels_label ON labels (label);
+CREATE INDEX labels_path ON labels (path);
+CREATE INDEX refs_label ON refs (label);
+CREATE INDEX refs_path ON refs (path);
+CREATE INDEX cites_key ON cites (key);
+CREATE INDEX cites_path ON cites (path);
+CREATE INDEX inputs_path ON inputs (path);
+"""
+
+# (caption or None, href or None): what a reference to a label of another chapter becomes
+RefTarget = tuple[str | None, str | None]
+
+
+def scanner_fingerprint() -> str:
+    """Hash of the scanning code (this module and convert.py): a change rebuilds the index."""
+    h = hashlib.sha256()
+    for path in (Path(__file__), Path(__file__).with_name("convert.py")):
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def _split_keys(raw: str) -> list[str]:
+    return [key.strip() for key in raw.split(",") if key.strip()]
+
+
+class TexRefs:
+    """What one .tex file defines and refers to."""
+
+    __slots__ = ("labels", "refs", "cites", "inputs")
+
+    def __init__(
+        self,
+        labels: list[tuple[str, str | None]],
+        refs: list[str],
+        cites: list[str],
+        inputs: list[str],
+    ):
+        self.labels = labels  # (label, caption or None), in order
+        self.refs = refs
+        self.cites = cites
+        self.inputs = inputs  # as written in \input{...}, relative to the file's directory
+
+
+def scan_tex(text: str) -> TexRefs:
+    """Labels (with the caption or section title they name), \\ref, \\cite and \\input of a .tex."""
+    text = TEX_COMMENT_RE.sub("", text)
+    captions: dict[str, str] = {}
+    for heading, after in HEADING_RE.findall(text):
+        title = LABEL_RE.sub("", heading).strip()
+        if title:
+            for label in [*LABEL_RE.findall(heading), after]:
+                if label.strip():
+                    captions[label.strip()] = title
+    captions.update(extract_tex_label_captions(text))
+    labels: list[tuple[str, str | None]] = []
+    seen: set[str] = set()
+    for raw in LABEL_RE.findall(text):
+        label = raw.strip()
+        if label not in seen:
+            seen.add(label)
+            labels.append((label, captions.get(label)))
+    return TexRefs(
+        labels,
+        sorted({label for raw in REF_RE.findall(text) for label in _split_keys(raw)}),
+        sorted({key for raw in CITE_RE.findall(text) for key in _split_keys(raw)}),
+        [name.strip() for name in TEX_INPUT_RE.findall(text)],
+    )
+
+
+def _input_path(tex_path: Path, name: str) -> Path:
+    dep = tex_path.parent / name
+    return dep if dep.suffix else dep.with_suffix(".tex")
+
+
+def scan_tex_file(path: str) -> TexRefs | None:
+    """scan_tex() of a file (None if it cannot be read). Top-level so it can run in a process pool."""
+    try:
+        return scan_tex(read_tex(Path(path)))
+    except OSError:
+        return None
+
+
+class RefIndex:
+    """SQLite index of the labels, captions, refs, citations and inputs of every .tex under `root`."""
+
+    def __init__(self, path: Path, root: Path):
+        self.path = path
+        self.root = root
+        path.parent.mkdir(parents=True, exist_ok=True)
+        import sqlite3
+
+        self.db = sqlite3.connect(path)
+        fingerprint = scanner_fingerprint()
+        try:
+            version = self.db.execute("PRAGMA user_version").fetchone()[0]
+            stored = self.db.execute("SELECT value FROM meta WHERE key = 'scanner'").fetchone()
+        except sqlite3.DatabaseError:
+            # Older schema, or not a database: it is only a cache, start again
+            self.db.close()
+            path.unlink(missing_ok=True)
+            self.db = sqlite3.connect(path)
+            version = stored = None
+        if version != SCHEMA_VERSION or stored != (fingerprint,):
+            self._create(fingerprint)
+
+    def _create(self, fingerprint: str) -> None:
+        """Empty index (the next update() scans every file)."""
+        with self.db:
+            for (name,) in self.db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+                self.db.execute(f"DROP TABLE {name}")
+        self.db.executescript(SCHEMA)
+        with self.db:
+            self.db.execute("INSERT INTO meta VALUES ('scanner', ?)", (fingerprint,))
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "RefIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def update(self, jobs: int = 1) -> tuple[int, int]:
+        """Rescan the .tex files added or changed (mtime, size) since the last update; drop deleted ones.
+
+        Returns (files scanned, files removed). With jobs > 1, a large rescan (first build, new
+        scanner) runs in a process pool.
+        """
+        stamps: dict[str, tuple[int, int]] = {}
+        for tex_path in self.root.rglob("*.tex"):
+            try:
+                stat = tex_path.stat()
+            except OSError:
+                continue
+            stamps[str(tex_path.resolve())] = (stat.st_mtime_ns, stat.st_size)
+        known = {path: (mtime, size) for path, mtime, size in self.db.execute("SELECT path, mtime_ns, size FROM files")}
+        changed = [path for path, stamp in stamps.items() if known.get(path) != stamp]
+        removed = [path for path in known if path not in stamps]
+
+        if jobs > 1 and len(changed) >= PARALLEL_SCAN_MIN_FILES:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=min(jobs, len(changed))) as pool:
+                scanned = list(pool.map(scan_tex_file, changed, chunksize=max(1, len(changed) // (4 * jobs))))
+        else:
+            scanned = [scan_tex_file(path) for path in changed]
+
+        with self.db:
+            for path in removed:
+                self._forget(path)
+            for path, refs in zip(changed, scanned):
+                self._forget(path)
+                if refs is not None:
+                    self._store(path, stamps[path], refs)
+        return len(changed), len(removed)
+
+    def update_file(self, tex_path: Path) -> None:
+        """Rescan one file (or forget it if it no longer exists)."""
+        path = str(tex_path.resolve())
+        with self.db:
+            self._forget(path)
+            try:
+                stat = tex_path.stat()
+            except OSError:
+                return
+            refs = scan_tex_file(path)
+            if refs is not None:
+                self._store(path, (stat.st_mtime_ns, stat.st_size), refs)
+
+    def _forget(self, path: str) -> None:
+        for table in ("files", "labels", "refs", "cites", "inputs"):
+            self.db.execute(f"DELETE FROM {table} WHERE path = ?", (path,))
+
+    def _store(self, path: str, stamp: tuple[int, int], refs: TexRefs) -> None:
+        self.db.execute("INSERT INTO files VALUES (?, ?, ?)", (path, *stamp))
+        self.db.executemany("INSERT INTO labels VALUES (?, ?, ?)", [(path, label, caption) for label, caption in refs.labels])
+        self.db.executemany("INSERT INTO refs VALUES (?, ?)", [(path, label) for label in refs.refs])
+        self.db.executemany("INSERT INTO cites VALUES (?, ?)", [(path, key) for key in refs.cites])
+        self.db.executemany(
+            "INSERT INTO inputs VALUES (?, ?)",
+            [(path, str(_input_path(Path(path), name).resolve())) for name in refs.inputs],
+        )
+
+    def definitions(self, label: str) -> list[tuple[str, str | None]]:
+        """(path, caption) of every file defining `label`."""
+        return self.db.execute("SELECT path, caption FROM labels WHERE label = ?", (label,)).fetchall()
+
+    def labels_in(self, tex_path: Path) -> list[str]:
+        return [label for (label,) in self.db.execute("SELECT label FROM labels WHERE path = ?", (str(tex_path.resolve()),))]
+
+    def referencing(self, labels: list[str]) -> set[str]:
+        """Paths of the files with a \\ref to one of `labels`."""
+        found: set[str] = set()
+        for label in set(labels):
+            found.update(path for (path,) in self.db.execute("SELECT path FROM refs WHERE label = ?", (label,)))
+        return found
+
+    def citing(self, key: str) -> list[str]:
+        """Paths of the files citing bibliography `key`."""
+        return [path for (path,) in self.db.execute("SELECT DISTINCT path FROM cites WHERE key = ? ORDER BY path", (key,))]
+
+    def files_of(self, tex_path: Path) -> list[str]:
+        """`tex_path` and the files it pulls with \\input / \\include, recursively."""
+        files = [str(tex_path.resolve())]
+        for path in files:
+            for (target,) in self.db.execute("SELECT target FROM inputs WHERE path = ?", (path,)):
+                if target not in files:
+                    files.append(target)
+        return files
+
+
+def corpus_root(books: list["Book"]) -> Path:
+    """Common parent directory of the books' sources."""
+    return Path(os.path.commonpath([str(book.source_dir) for book in books]))
+
+
+def chapter_ref_targets(index: RefIndex, books: list["Book"]) -> dict[tuple[str, str], dict[str, RefTarget]]:
+    """(book name, qmd) -> {label: RefTarget} for the labels each chapter refers to in other chapters of `books`."""
+    files: dict[tuple[str, str], list[str]] = {}
+    owners: dict[str, list[tuple["Book", "Chapter"]]] = {}
+    for book in books:
+        for chapter in book.chapters:
+            chapter_files = files[book.name, chapter.qmd] = index.files_of(book.tex_path(chapter))
+            for path in chapter_files:
+                owners.setdefault(path, []).append((book, chapter))
+
+    targets: dict[tuple[str, str], dict[str, RefTarget]] = {}
+    for book in books:
+        for chapter in book.chapters:
+            own = files[book.name, chapter.qmd]
+            labels = {
+                label
+                for path in own
+                for (label,) in index.db.execute("SELECT label FROM refs WHERE path = ?", (path,))
+            }
+            resolved: dict[str, RefTarget] = {}
+            for label in sorted(labels):
+                defs = [(path, caption) for path, caption in index.definitions(label) if path in owners]
+                if not defs or any(path in own for path, _caption in defs):
+                    continue
+                places = {(b.name, c.qmd): (b, c, caption) for path, caption in defs for b, c in owners[path]}
+                same_book = {key: place for key, place in places.items() if key[0] == book.name}
+                candidates = same_book or places
+                if len(candidates) != 1:
+                    continue
+                target_book, target_chapter, caption = next(iter(candidates.values()))
+                if target_book is book:
+                    href = f"../{target_chapter.name}/{target_chapter.qmd}#{_normalize_anchor_id(label)}"
+                    resolved[label] = (caption, href)
+                elif caption:
+                    resolved[label] = (caption, None)
+            if resolved:
+                targets[book.name, chapter.qmd] = resolved
+    return targets
+
+
+def corpus_ref_targets(index_path: Path, books: list["Book"], jobs: int = 1) -> dict[tuple[str, str], dict[str, RefTarget]]:
+    """Update the index at `index_path` for the sources of `books`, then chapter_ref_targets()."""
+    with RefIndex(index_path, corpus_root(books)) as index:
+        index.update(jobs if jobs > 0 else (os.cpu_count() or 1))
+        return chapter_ref_targets(index, books)
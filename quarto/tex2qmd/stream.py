@@ -0,0 +1,158 @@
+"""Streaming conversion: one chapter converted section by section (split on \\section).
+
+Only one section of LaTeX and its Markdown are held at a time: the .tex is read line by
+line, each section goes through pandoc and the text transforms on its own, and the line
+transforms (heading shift, placeholders) are chained generators feeding the .qmd, which is
+written in place and flushed as sections come out of pandoc, so the first sections can be
+read while later ones convert. The price is a non-atomic write (see output.open_streaming):
+a failed conversion leaves a partial .qmd, reported as an error and reconverted next time.
+
+Differences with the whole-document conversion:
+
+- macro definitions (\\newcommand, \\def...) seen in earlier sections are prepended to each
+  section so pandoc still expands them;
+- footnote labels are prefixed per section (``<chapter>-s<N>-<label>``), since pandoc
+  numbers the notes of each section from 1;
+- chapter injections (``inject``) need the whole document: such chapters are not streamed.
+"""
+from pathlib import Path
+from time import perf_counter
+import re
+from typing import Iterator
+
+from .convert import (
+    extract_tex_comments,
+    extract_tex_label_captions,
+    fix_tabular_blocks,
+    inject_qmd_comments,
+    iter_add_placeholders_to_empty_sections,
+    iter_shift_heading_levels,
+    prefix_footnote_labels,
+    remove_pandoc_table_attribute_blocks,
+    replace_ref_with_caption,
+)
+from .figures import link_figures
+from .legislation import LEGISLATION_ENTRIES, link_legislation_citations
+from .output import open_streaming
+from .pipeline import Pipeline, format_timings
+
+SECTION_RE = re.compile(r"^\s*\\section\*?\s*[\[{]")
+MACRO_DEF_RE = re.compile(r"^\s*\\(?:(?:re|provide)?newcommand|def|DeclareMathOperator|newenvironment)\b")
+
+
+def detect_encoding(tex_path: Path) -> str:
+    """'utf-8' if every line decodes as UTF-8, else 'latin-1' (pandoc's fallback), read line by line."""
+    with tex_path.open("rb") as f:
+        for line in f:
+            try:
+                line.decode("utf-8")
+            except UnicodeDecodeError:
+                return "latin-1"
+    return "utf-8"
+
+
+def iter_tex_sections(tex_path: Path, encoding: str) -> Iterator[str]:
+    """Yield the text before the first \\section, then each \\section with its body."""
+    buffer: list[str] = []
+    with tex_path.open(encoding=encoding, newline="") as f:
+        for line in f:
+            if buffer and SECTION_RE.match(line):
+                yield "".join(buffer)
+                buffer = []
+            buffer.append(line)
+    if buffer:
+        yield "".join(buffer)
+
+
+def _macro_definitions(section_tex: str) -> list[str]:
+    """Single-line macro definitions of a section (balanced braces), newline-terminated."""
+    return [
+        line if line.endswith("\n") else line + "\n"
+        for line in section_tex.splitlines(keepends=True)
+        if MACRO_DEF_RE.match(line) and line.count("{") == line.count("}")
+    ]
+
+
+def build_section_pipeline(
+    book: "Book",
+    chapter: "Chapter",
+    index: int,
+    label_to_caption: dict[str, str],
+    comments_with_anchors: list[tuple[str, str]],
+    refs: dict[str, tuple[str | None, str | None]] | None = None,
+    figures: dict[str, str] | None = None,
+) -> Pipeline:
+    """Text transforms of one section, in the order of the whole-document pipeline."""
+    pipeline = (
+        Pipeline()
+        .text("replace_ref_with_caption", lambda c: replace_ref_with_caption(c, label_to_caption, refs))
+        .text("inject_qmd_comments", lambda c: inject_qmd_comments(c, comments_with_anchors))
+        .text("remove_pandoc_table_attribute_blocks", remove_pandoc_table_attribute_blocks)
+        .text("fix_tabular_blocks", lambda c: fix_tabular_blocks(c, book.table_format))
+        .text("prefix_footnote_labels", lambda c: prefix_footnote_labels(c, f"{chapter.name}-s{index}"))
+    )
+    if book.legislation:
+        pipeline.text("link_legislation_citations", lambda c: link_legislation_citations(c, LEGISLATION_ENTRIES))
+    if figures:
+        pipeline.text("link_figures", lambda c: link_figures(c, figures))
+    return pipeline
+
+
+def convert_chapter_streaming(
+    book: "Book",
+    chapter: "Chapter",
+    backend,
+    timings: bool = False,
+    refs: dict[str, tuple[str | None, str | None]] | None = None,
+    figures: dict[str, str] | None = None,
+) -> tuple[bool, str]:
+    """Streaming counterpart of book.convert_chapter (same result tuple and messages).
+
+    Pandoc errors (PandocError) propagate to the caller.
+    """
+    tex_path = book.tex_path(chapter)
+    qmd_path = book.qmd_path(chapter)
+    encoding = detect_encoding(tex_path)
+
+    # Refs may point to a table of another section: collect captions in a first pass
+    label_to_caption: dict[str, str] = {}
+    for section_tex in iter_tex_sections(tex_path, encoding):
+        label_to_caption.update(extract_tex_label_captions(section_tex))
+
+    totals: dict[str, float] = {}
+
+    def add_time(name: str, seconds: float) -> None:
+        totals[name] = totals.get(name, 0.0) + seconds
+
+    def iter_markdown_lines(out) -> Iterator[str]:
+        macros: list[str] = []
+        for index, section_tex in enumerate(iter_tex_sections(tex_path, encoding)):
+            # Previous section on disk before pandoc runs on this one
+            out.flush()
+            t0 = perf_counter()
+            markdown = backend.convert_text("".join(macros) + section_tex, "latex", "markdown")
+            add_time("pandoc", perf_counter() - t0)
+            macros.extend(_macro_definitions(section_tex))
+            pipeline = build_section_pipeline(
+                book, chapter, index, label_to_caption, extract_tex_comments(section_tex), refs, figures
+            )
+            markdown = pipeline.run(markdown)
+            for name, seconds in pipeline.timings:
+                add_time(name, seconds)
+            if index:
+                yield ""
+            yield from markdown.rstrip("\n").split("\n")
+
+    qmd_path.parent.mkdir(parents=True, exist_ok=True)
+    # Written in place, section by section: an unchanged chapter keeps its mtime, not atomicity
+    with open_streaming(qmd_path) as out:
+        out.write(f"---\ntitle: \"{chapter.title}\"\n---\n\n")
+        lines = iter_add_placeholders_to_empty_sections(iter_shift_heading_levels(iter_markdown_lines(out)))
+        for line in lines:
+            out.write(line)
+            out.write("\n")
+
+    message = f"OK: {chapter.tex} -> {chapter.qmd} (streamed)"
+    if timings:
+        message += "\n" + format_timings(list(totals.items()))
+    return True, message
@@ -0,0 +1,220 @@
+"""Repair of pandoc's broken ``::: tabular`` blocks into Markdown tables.
+
+Pandoc leaves some LaTeX tabulars as a Div of raw rows ("a & b \\"). parse_tabular() reads
+such a block once into a column-major Tabular: header cells, data columns and an inferred
+type per column (year, amount, percent, text). The table is then written as a pipe table
+(default, what fix_tabular_blocks has always produced) or as a grid table, aligned from
+the column types. Tabular.stats() and tabular_quality() measure how well blocks were
+repaired (header fill, typed columns, padded cells, tables flagged as malformed).
+"""
+import re
+
+COLSPEC_RE = re.compile(r"^\\\|(?:c\\\|)+\\?\s*")
+LEFTOVER_COLSPEC_RE = re.compile(r"^c\\\|(?:c\\\|)*\s*")
+YEAR_RE = re.compile(r"^(19|20)\d{2}$")
+YEAR_2001_2009_RE = re.compile(r"^200[1-9]$")
+BOLD_CELL_RE = re.compile(r"^\*\*[^*]+\*\*$")
+PERCENT_RE = re.compile(r"^[-+−]?\d[\d\s.,]*\s*\\?%$")
+AMOUNT_RE = re.compile(r"^[-+−]?\d[\d\s.,]*(?:\s*(?:€|\\euro\{?\}?|euros?|k€|M€|Md€))?$")
+
+TABLE_MALFORMED_COMMENT = "<!-- Tableau converti depuis LaTeX : en-têtes potentiellement incomplets ou mal fusionnés (vérifier et corriger si besoin). -->"
+
+TABLE_FORMATS = ("pipe", "grid")
+YEAR, AMOUNT, PERCENT, TEXT = "year", "amount", "percent", "text"
+NUMERIC_KINDS = frozenset({YEAR, AMOUNT, PERCENT})
+
+
+def cell_kind(cell: str) -> str | None:
+    """Type of one cell: year, amount, percent or text (None when empty)."""
+    if not cell:
+        return None
+    if YEAR_RE.match(cell):
+        return YEAR
+    if "%" in cell and PERCENT_RE.match(cell):
+        return PERCENT
+    if "€" in cell or AMOUNT_RE.match(cell):
+        return AMOUNT
+    return TEXT
+
+
+def column_kind(cells: list[str]) -> str:
+    """Type shared by every non-empty cell of a column, else text."""
+    kinds = {cell_kind(c) for c in cells}
+    kinds.discard(None)
+    return kinds.pop() if len(kinds) == 1 else TEXT
+
+
+class Tabular:
+    """A repaired tabular: header row and data columns (column-major), all `ncols` wide."""
+
+    __slots__ = ("header", "columns", "header_rows", "padded_cells", "malformed", "_kinds")
+
+    def __init__(
+        self,
+        header: list[str],
+        columns: list[list[str]],
+        header_rows: int,
+        padded_cells: int,
+        malformed: bool,
+    ):
+        self.header = header
+        self.columns = columns
+        self.header_rows = header_rows
+        self.padded_cells = padded_cells
+        self.malformed = malformed
+        self._kinds: list[str] | None = None
+
+    @property
+    def kinds(self) -> list[str]:
+        """Type of each column (computed on first use: pipe output does not need it)."""
+        if self._kinds is None:
+            self._kinds = [column_kind(col) for col in self.columns]
+        return self._kinds
+
+    @property
+    def ncols(self) -> int:
+        return len(self.header)
+
+    @property
+    def nrows(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def rows(self) -> list[list[str]]:
+        return [list(row) for row in zip(*self.columns)]
+
+    def to_pipe(self) -> str:
+        out = [TABLE_MALFORMED_COMMENT] if self.malformed else []
+        out.append("| " + " | ".join(self.header) + " |")
+        out.append("|" + "|".join(["---"] * self.ncols) + "|")
+        out.extend("| " + " | ".join(row) + " |" for row in zip(*self.columns))
+        return "\n".join(out)
+
+    def to_grid(self) -> str:
+        """Grid table; columns of numbers (years, amounts, percents) are right-aligned."""
+        rows = self.rows()
+        widths = [max(3, len(h), *(len(r[c]) for r in rows)) for c, h in enumerate(self.header)]
+
+        def rule(fill: str, aligned: bool = False) -> str:
+            parts = []
+            for width, kind in zip(widths, self.kinds):
+                part = fill * (width + 2)
+                if aligned and kind in NUMERIC_KINDS:
+                    part = part[:-1] + ":"
+                parts.append(part)
+            return "+" + "+".join(parts) + "+"
+
+        def line(cells: list[str]) -> str:
+            return "| " + " | ".join(cell.ljust(width) for cell, width in zip(cells, widths)) + " |"
+
+        out = [TABLE_MALFORMED_COMMENT] if self.malformed else []
+        out.extend([rule("-"), line(self.header), rule("=", aligned=True)])
+        for row in rows:
+            out.extend([line(row), rule("-")])
+        if not rows:
+            out[-1] = rule("-", aligned=True)
+        return "\n".join(out)
+
+    def to_markdown(self, table_format: str = "pipe") -> str:
+        if table_format == "grid":
+            return self.to_grid()
+        if table_format != "pipe":
+            raise ValueError(f"Unknown table format: {table_format!r} (expected 'pipe' or 'grid')")
+        return self.to_pipe()
+
+    def stats(self) -> dict:
+        """Repair quality figures of this table."""
+        cells = self.ncols * (self.header_rows + self.nrows)
+        return {
+            "ncols": self.ncols,
+            "nrows": self.nrows,
+            "header_rows": self.header_rows,
+            "header_fill": sum(1 for h in self.header if h) / self.ncols,
+            "typed_columns": sum(1 for k in self.kinds if k in NUMERIC_KINDS),
+            "empty_cells": sum(1 for col in self.columns for c in col if not c),
+            "cells": cells,  # header rows included
+            "padded_cells": self.padded_cells,
+            "malformed": self.malformed,
+        }
+
+
+def parse_tabular(inner: str) -> Tabular | None:
+    """Parse the text of a broken tabular (one row per line, cells split on "&"); None if empty.
+
+    The first rows are header rows until a data row (a year in the first cell, or a "€" in
+    the row); a header cell is the first non-empty cell of its column in the header rows.
+    """
+    rows: list[list[str]] = []
+    data_start = -1
+    for line in inner.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        cells = [c.strip().rstrip("\\").strip() for c in line.split("&")]
+        if not any(cells):
+            continue
+        if not rows:
+            cell0 = COLSPEC_RE.sub("", cells[0]).strip()
+            cell0 = LEFTOVER_COLSPEC_RE.sub("", cell0)
+            if cell0.startswith("\\***"):
+                cell0 = "**" + cell0[4:]
+            cells[0] = cell0
+        # Cleaning is not idempotent ("2001 \\ \\"): the first cell is cleaned again, as it always was
+        if data_start < 0 and ("€" in line or YEAR_RE.match(cells[0].strip().rstrip("\\").strip())):
+            data_start = len(rows)
+        rows.append(cells)
+    if not rows:
+        return None
+
+    ncols = max(len(r) for r in rows)
+    padded_cells = 0
+    for r in rows:
+        if len(r) < ncols:
+            padded_cells += ncols - len(r)
+            r.extend([""] * (ncols - len(r)))
+
+    if data_start < 0:
+        data_start = len(rows)
+    header_rows, data_rows = rows[:data_start], rows[data_start:]
+    if not header_rows:
+        header_rows, data_rows = data_rows[:1], data_rows[1:]
+
+    header = []
+    for c in range(ncols):
+        cell = next((hr[c] for hr in header_rows if hr[c]), "")
+        if cell.startswith("\\***"):
+            cell = "**" + cell[4:]
+        header.append(cell)
+
+    if data_rows and not data_rows[0][0] and ncols >= 2:
+        next_year = next((dr[0] for dr in data_rows[1:] if YEAR_2001_2009_RE.match(dr[0])), None)
+        if next_year == "2001":
+            data_rows[0][0] = "2000"
+
+    non_empty_header = sum(1 for c in header if c)
+    has_fragment = any(
+        len(c) <= 4 and c and not BOLD_CELL_RE.match(c)
+        or (c.startswith("**") and c.endswith("**") and len(c) < 10)
+        for c in header
+    )
+    malformed = ncols > 1 and (
+        non_empty_header < ncols / 2 or (non_empty_header == 1 and ncols > 2) or has_fragment
+    )
+    columns = [list(col) for col in zip(*data_rows)] if data_rows else [[] for _ in range(ncols)]
+    return Tabular(header, columns, len(header_rows), padded_cells, malformed)
+
+
+def tabular_quality(tables: list[Tabular]) -> dict:
+    """Aggregate repair quality over tables (see Tabular.stats)."""
+    stats = [t.stats() for t in tables]
+    n = len(stats) or 1
+    cells = sum(s["cells"] for s in stats) or 1
+    columns = sum(s["ncols"] for s in stats) or 1
+    return {
+        "tables": len(stats),
+        "malformed": sum(s["malformed"] for s in stats),
+        "malformed_rate": sum(s["malformed"] for s in stats) / n,
+        "header_fill": sum(s["header_fill"] for s in stats) / n,
+        "typed_column_rate": sum(s["typed_columns"] for s in stats) / columns,
+        "empty_cell_rate": sum(s["empty_cells"] for s in stats) / (sum(s["ncols"] * s["nrows"] for s in stats) or 1),
+        "padded_cell_rate": sum(s["padded_cells"] for s in stats) / cells,
+    }
@@ -0,0 +1,279 @@
+"""Watch mode (`tex2qmd watch`): reconvert, and optionally render, only what an edit touches.
+
+Files are polled (mtime and size) every `interval` seconds; no inotify dependency. What a
+change triggers:
+
+- a chapter's .tex, a file it pulls with \\input / \\include, or one of its figures: that
+  chapter is reconverted (figures converted again and copied, see figures.py),
+  and so are the chapters with a \\ref to one of its labels (with the label index, see
+  refindex.py);
+- legislation.py: the chapters of legislation books that cite a changed entry (its
+  ``[@key]`` or one of its patterns in the current .qmd) are reconverted;
+- a Python module next to a chapter's .qmd (table specs, e.g.
+  ``chapters/indirecte/openfisca_tables.py``): the chapter is only re-rendered.
+
+Conversions run `tex2qmd build -b BOOK -c QMD...` in a subprocess, so edits to
+legislation.py are picked up without restarting the watcher; the incremental cache skips
+anything that did not change. With render=True, `quarto render` runs on each affected .qmd.
+"""
+from pathlib import Path
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+
+from . import PACKAGE_DIR, QUARTO_DIR
+from .backend import read_tex
+from .book import Book, Chapter
+from .cache import BuildCache
+from .figures import chapter_figures
+from .refindex import TEX_INPUT_RE, RefIndex, corpus_root, scan_tex_file
+
+LEGISLATION_PATH = PACKAGE_DIR / "legislation.py"
+
+Stamp = tuple[int, int] | None
+
+
+def _stamp(path: Path) -> Stamp:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def tex_dependencies(tex_path: Path) -> list[Path]:
+    """Files pulled by \\input / \\include in `tex_path`, recursively (relative to its directory)."""
+    found: list[Path] = []
+    pending = [tex_path]
+    while pending:
+        path = pending.pop()
+        try:
+            text = path.read_bytes().decode("utf-8", errors="replace")
+        except OSError:
+            continue
+        for line in text.splitlines():
+            if line.lstrip().startswith("%"):
+                continue
+            for name in TEX_INPUT_RE.findall(line):
+                dep = path.parent / name.strip()
+                if not dep.suffix:
+                    dep = dep.with_suffix(".tex")
+                if dep not in found and dep != tex_path:
+                    found.append(dep)
+                    pending.append(dep)
+    return found
+
+
+def load_legislation_entries(path: Path = LEGISLATION_PATH) -> list[dict] | None:
+    """LEGISLATION_ENTRIES as currently on disk (None if the file does not run, e.g. mid-edit)."""
+    # Fresh module object in the tex2qmd package (legislation.py has relative imports)
+    spec = importlib.util.spec_from_file_location(f"{__package__}._legislation_on_disk", path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+        return module.LEGISLATION_ENTRIES
+    except Exception as exc:
+        print(f"Cannot load {path.name}: {exc!r}", file=sys.stderr)
+        return None
+
+
+def changed_legislation_entries(old: list[dict], new: list[dict]) -> list[dict]:
+    """Entries added, removed or modified between two LEGISLATION_ENTRIES lists (old and new versions)."""
+    old_by_key = {e["key"]: e for e in old}
+    new_by_key = {e["key"]: e for e in new}
+    changed: list[dict] = []
+    for key in old_by_key.keys() | new_by_key.keys():
+        if old_by_key.get(key) != new_by_key.get(key):
+            changed.extend(e for e in (old_by_key.get(key), new_by_key.get(key)) if e is not None)
+    return changed
+
+
+def cites_legislation(qmd_text: str, entries: list[dict]) -> bool:
+    return any(
+        f"[@{e['key']}]" in qmd_text or any(p in qmd_text for p in e["patterns"])
+        for e in entries
+    )
+
+
+class Watcher:
+    """Poll the sources of `books` and reconvert / render the chapters they affect."""
+
+    def __init__(
+        self,
+        manifest: Path,
+        books: list[Book],
+        render: bool = False,
+        interval: float = 0.5,
+        build_args: list[str] | None = None,
+        ref_index: Path | None = None,
+    ):
+        self.manifest = manifest
+        self.books = books
+        self.render = render
+        self.interval = interval
+        self.build_args = build_args or []
+        self.ref_index = ref_index  # label index kept up to date by `tex2qmd build`
+        self.legislation_entries = load_legislation_entries() or []
+        self.stamps: dict[Path, Stamp] = {}
+        self._scan()
+
+    def _watched(self) -> dict[Path, list[tuple[Book, Chapter, str]]]:
+        """path -> (book, chapter, action) triggered by a change, action 'convert' or 'render'."""
+        watched: dict[Path, list[tuple[Book, Chapter, str]]] = {LEGISLATION_PATH: []}
+        for book in self.books:
+            for chapter in book.chapters:
+                tex_path = book.tex_path(chapter)
+                figures = chapter_figures(book, chapter, read_tex(tex_path))[0] if tex_path.exists() else []
+                for path in [tex_path, *tex_dependencies(tex_path), *(figure.source for figure in figures)]:
+                    watched.setdefault(path, []).append((book, chapter, "convert"))
+                for path in book.qmd_path(chapter).parent.glob("*.py"):
+                    if path.name != "__init__.py":
+                        watched.setdefault(path, []).append((book, chapter, "render"))
+        return watched
+
+    def _scan(self) -> None:
+        """Recompute the watched paths; paths already watched keep their last seen stamp."""
+        self.targets = self._watched()
+        self.stamps = {path: self.stamps[path] if path in self.stamps else _stamp(path) for path in self.targets}
+
+    def poll(self) -> list[Path]:
+        """Watched paths whose mtime or size changed since the last poll."""
+        changed = []
+        for path, stamp in self.stamps.items():
+            current = _stamp(path)
+            if current != stamp:
+                self.stamps[path] = current
+                changed.append(path)
+        return changed
+
+    def affected(self, changed: list[Path]) -> tuple[list[tuple[Book, Chapter]], list[tuple[Book, Chapter]]]:
+        """(chapters to reconvert, chapters to render only), in manifest order."""
+        convert: set[tuple[str, str]] = set()
+        render: set[tuple[str, str]] = set()
+        for path in changed:
+            if path == LEGISLATION_PATH:
+                convert.update(self._legislation_affected())
+            for book, chapter, action in self.targets.get(path, []):
+                (convert if action == "convert" else render).add((book.name, chapter.qmd))
+        tex_changed = [path for path in changed if path.suffix == ".tex"]
+        if tex_changed and self.ref_index is not None:
+            convert.update(self._referencing_affected(tex_changed))
+        render -= convert
+        ordered = [(book, chapter) for book in self.books for chapter in book.chapters]
+        return (
+            [(b, c) for b, c in ordered if (b.name, c.qmd) in convert],
+            [(b, c) for b, c in ordered if (b.name, c.qmd) in render],
+        )
+
+    def _legislation_affected(self) -> set[tuple[str, str]]:
+        entries = load_legislation_entries()
+        if entries is None:
+            return set()
+        changed = changed_legislation_entries(self.legislation_entries, entries)
+        self.legislation_entries = entries
+        affected = set()
+        for book in self.books:
+            if not book.legislation:
+                continue
+            for chapter in book.chapters:
+                try:
+                    text = book.qmd_path(chapter).read_text(encoding="utf-8")
+                except OSError:
+                    text = None
+                if text is None or cites_legislation(text, changed):
+                    affected.add((book.name, chapter.qmd))
+        return affected
+
+    def _referencing_affected(self, tex_paths: list[Path]) -> set[tuple[str, str]]:
+        """Chapters with a \\ref to a label defined (before or after the edit) in `tex_paths`."""
+        if not self.ref_index.exists():
+            return set()
+        with RefIndex(self.ref_index, corpus_root(self.books)) as index:
+            labels = [label for path in tex_paths for label in index.labels_in(path)]
+            for path in tex_paths:
+                refs = scan_tex_file(str(path))
+                if refs is not None:
+                    labels.extend(label for label, _caption in refs.labels)
+            referencing = index.referencing(labels)
+        # The index holds resolved paths
+        targets = {path.resolve(): entries for path, entries in self.targets.items()}
+        return {
+            (book.name, chapter.qmd)
+            for path in referencing
+            for book, chapter, action in targets.get(Path(path), [])
+            if action == "convert"
+        }
+
+    def convert(self, chapters: list[tuple[Book, Chapter]]) -> list[tuple[Book, Chapter]]:
+        """Run `tex2qmd build` on `chapters`, one subprocess per book. Returns the chapters converted.
+
+        A failed chapter is dropped from its book's cache manifest (see build_books): when a
+        build fails, the chapters still recorded there are the ones that converted.
+        """
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(QUARTO_DIR), env.get("PYTHONPATH")]))
+        converted: list[tuple[Book, Chapter]] = []
+        for book in self.books:
+            selected = [(b, chapter) for b, chapter in chapters if b is book]
+            if not selected:
+                continue
+            command = [sys.executable, "-m", "tex2qmd", "build", str(self.manifest), "-b", book.name]
+            for _book, chapter in selected:
+                command += ["-c", chapter.qmd]
+            if subprocess.run(command + self.build_args, env=env).returncode == 0:
+                converted += selected
+            else:
+                recorded = BuildCache(book.out_dir).entries
+                converted += [(b, chapter) for b, chapter in selected if chapter.qmd in recorded]
+        return converted
+
+    def render_chapters(self, chapters: list[tuple[Book, Chapter]]) -> None:
+        for book, chapter in chapters:
+            qmd_path = book.qmd_path(chapter)
+            print(f"[{book.name}] quarto render {qmd_path.relative_to(book.out_dir)}")
+            try:
+                subprocess.run(["quarto", "render", str(qmd_path)], cwd=book.out_dir)
+            except OSError as exc:
+                print(f"Cannot run quarto: {exc}", file=sys.stderr)
+                return
+
+    def step(self) -> bool:
+        """One poll; reconvert / render what changed. True if something was done."""
+        changed = self.poll()
+        if not changed:
+            return False
+        # Editors often write a file in several steps: wait for it to settle
+        time.sleep(min(self.interval, 0.2))
+        changed += [p for p in self.poll() if p not in changed]
+        to_convert, to_render = self.affected(changed)
+        started = time.perf_counter()
+        failed = []
+        if to_convert:
+            converted = self.convert(to_convert)
+            failed = [(book, chapter) for book, chapter in to_convert if (book, chapter) not in converted]
+            if self.render:
+                self.render_chapters(converted)
+        if to_render and self.render:
+            self.render_chapters(to_render)
+        elif to_render:
+            names = ", ".join(chapter.qmd for _book, chapter in to_render)
+            print(f"Python modules changed for {names} (use --render to re-render)")
+        if failed:
+            names = ", ".join(chapter.qmd for _book, chapter in failed)
+            print(f"Conversion failed for {names} (not rendered)", file=sys.stderr, flush=True)
+        if to_convert or (to_render and self.render):
+            print(f"Done in {time.perf_counter() - started:.2f} s", flush=True)
+        # \input lists may have changed
+        self._scan()
+        return True
+
+    def run(self) -> None:
+        print(f"Watching {len(self.stamps)} files every {self.interval} s (Ctrl-C to stop)", flush=True)
+        try:
+            while True:
+                self.step()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            print("Stopped.")
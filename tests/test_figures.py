@@ -0,0 +1,43 @@
+"""convert_figures: a figure that fails, whatever the exception, does not stop the others."""
+import pytest
+
+from tex2qmd import figures
+from tex2qmd.figures import Figure, convert_figures
+
+_convert_figure = figures.convert_figure
+
+
+class DecompressionBombError(Exception):
+    """Stands for PIL.Image.DecompressionBombError (Pillow is optional)."""
+
+
+def failing_convert_figure(source: str, suffix: str) -> bytes:
+    """convert_figure, except for the sources named like a Pillow failure. Module-level for the pool."""
+    if source.endswith("truncated.png"):
+        raise SyntaxError("broken PNG file")
+    if source.endswith("bomb.png"):
+        raise DecompressionBombError("Image size exceeds limit")
+    return _convert_figure(source, suffix)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_failing_figures_are_reported(tmp_path, monkeypatch, jobs):
+    monkeypatch.setattr(figures, "convert_figure", failing_convert_figure)
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    chapter_figures = []
+    for name in ("bon.png", "truncated.png", "bomb.png"):
+        (source_dir / name).write_bytes(b"\x89PNG " + name.encode())
+        chapter_figures.append(Figure(source_dir / name, tmp_path / "chapter" / "figures" / name, tmp_path / "cache"))
+
+    converted, copied, errors = convert_figures(chapter_figures, jobs)
+
+    assert (converted, copied) == (1, 1)
+    assert (tmp_path / "chapter" / "figures" / "bon.png").read_bytes() == b"\x89PNG bon.png"
+    assert sorted(errors) == [
+        f"{source_dir / 'bomb.png'}: DecompressionBombError: Image size exceeds limit",
+        f"{source_dir / 'truncated.png'}: SyntaxError: broken PNG file",
+    ]
+    # Failed figures are retried on the next build, the converted one is not
+    converted, copied, errors = convert_figures(chapter_figures, jobs)
+    assert (converted, copied, len(errors)) == (0, 0, 2)
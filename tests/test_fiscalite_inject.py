@@ -0,0 +1,59 @@
+"""inject_openfisca_tables_indirecte must be idempotent: a rebuild never duplicates its chunks.
+
+Quarto refuses to render a chapter with two cells of the same label, so each table chunk
+must appear once however many times the injection runs.
+"""
+from pathlib import Path
+
+import pytest
+
+from tex2qmd.fiscalite import inject_openfisca_tables_indirecte
+
+INDIRECTE_QMD = Path(__file__).resolve().parent.parent / "quarto" / "fiscalite" / "chapters" / "indirecte" / "indirecte.qmd"
+LABELS = ("#| label: historique-taux-tva", "#| label: taxes-tabac", "#| label: taxes-alcools")
+
+# Pandoc output for the parts of 5-Indirecte.tex the injection rewrites
+PANDOC_OUTPUT = """\
+# La fiscalité indirecte
+
+::: tab
+Évolution des taux de TVA
+
+[]{#table:historique-taux-tva label="table:historique-taux-tva"}
+:::
+
+Le tableau [Fiscalité applicable aux alcools au 1er janvier 2013.](#table:taxes-alcools){reference-type="ref" reference="table:taxes-alcools"} détaille les droits en vigueur en 2013.
+
+::: tab
+Fiscalité applicable aux alcools au 1er janvier 2013.
+
+[]{#table:taxes-alcools label="table:taxes-alcools"}
+:::
+
+Fin du chapitre.
+"""
+
+
+@pytest.mark.parametrize("source", ["pandoc", "committed"])
+def test_injection_is_idempotent(source):
+    content = PANDOC_OUTPUT if source == "pandoc" else INDIRECTE_QMD.read_text(encoding="utf-8")
+    once = inject_openfisca_tables_indirecte(content)
+    twice = inject_openfisca_tables_indirecte(once)
+    assert twice == once
+    assert once.count("OpenFisca tables import path") == 1
+    assert once.count("#| label: taxes-alcools") == 1
+
+
+def test_committed_chapter_is_up_to_date():
+    content = INDIRECTE_QMD.read_text(encoding="utf-8")
+    assert inject_openfisca_tables_indirecte(content) == content
+    for label in LABELS:
+        assert content.count(label) == 1, label
+
+
+def test_alcools_block_replaced_in_place():
+    out = inject_openfisca_tables_indirecte(PANDOC_OUTPUT)
+    assert "::: tab" not in out
+    assert 'get_table("alcools_droits")' in out
+    assert "présente l'évolution des droits applicables aux boissons alcoolisées." in out
+    assert out.index('get_table("alcools_droits")') < out.index("Fin du chapitre.")
@@ -0,0 +1,98 @@
+"""inject_qmd_comments against the implementation it replaced (one scan of the lines per comment).
+
+Placement rules: a comment goes before the first line containing the first 50 characters of
+its anchor; comments landing on the same line come out in reverse order of appearance; a
+comment with an empty or unknown anchor is appended at the end of the file.
+"""
+from pathlib import Path
+
+import pytest
+
+from tex2qmd.backend import read_tex
+from tex2qmd.convert import _escape_html_comment, extract_tex_comments, inject_qmd_comments
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+FISCALITE_TEX_DIR = REPO_ROOT / "source" / "Fiscalité" / "Chapitres"
+FISCALITE_QMD_DIR = REPO_ROOT / "quarto" / "fiscalite" / "chapters"
+
+
+def baseline_inject_qmd_comments(qmd_content: str, comments_with_anchors: list[tuple[str, str]]) -> str:
+    if not comments_with_anchors:
+        return qmd_content
+    qmd_lines = qmd_content.splitlines(keepends=True)
+    inserts: list[tuple[int, str]] = []
+    for comment_text, anchor in comments_with_anchors:
+        safe = _escape_html_comment(comment_text)
+        comment_line = "<!-- " + safe + " -->\n"
+        if not anchor:
+            inserts.append((len(qmd_lines), comment_line))
+            continue
+        anchor_key = anchor[:50]
+        found = False
+        for idx, qline in enumerate(qmd_lines):
+            if anchor in qline or anchor_key in qline:
+                inserts.append((idx, comment_line))
+                found = True
+                break
+        if not found:
+            inserts.append((len(qmd_lines), comment_line))
+    inserts.sort(key=lambda x: x[0], reverse=True)
+    for idx, comment_line in inserts:
+        qmd_lines.insert(idx, comment_line)
+    return "".join(qmd_lines)
+
+
+FIRST = "Premier paragraphe sur la TVA, ses taux normal, intermédiaire et réduits."
+QMD = f"# Titre\n\n{FIRST}\n\nSecond paragraphe sur la TVA.\n"
+# Same first 50 characters as FIRST, different afterwards
+LONG_ANCHOR = FIRST[:50] + " puis un texte absent du qmd"
+
+
+@pytest.mark.parametrize(
+    "comments, expected",
+    [
+        # First line containing the anchor, even if a later one does too
+        (
+            [("note", "sur la TVA")],
+            f"# Titre\n\n<!-- note -->\n{FIRST}\n\nSecond paragraphe sur la TVA.\n",
+        ),
+        # Only the first 50 characters of the anchor are looked for
+        (
+            [("long", LONG_ANCHOR)],
+            f"# Titre\n\n<!-- long -->\n{FIRST}\n\nSecond paragraphe sur la TVA.\n",
+        ),
+        # Same line: reverse order of appearance
+        (
+            [("a", "Second"), ("b", "Second paragraphe"), ("c", "Second")],
+            f"# Titre\n\n{FIRST}\n\n<!-- c -->\n<!-- b -->\n<!-- a -->\nSecond paragraphe sur la TVA.\n",
+        ),
+        # Empty or unknown anchor: end of file, also in reverse order
+        (
+            [("vide", ""), ("absent", "introuvable"), ("titre", "Titre")],
+            f"<!-- titre -->\n# Titre\n\n{FIRST}\n\nSecond paragraphe sur la TVA.\n"
+            "<!-- absent -->\n<!-- vide -->\n",
+        ),
+        # Comment text cannot close the HTML comment early
+        ([("a --> b", "Titre")], None),
+        ([], QMD),
+    ],
+)
+def test_placement(comments, expected):
+    out = inject_qmd_comments(QMD, comments)
+    assert out == baseline_inject_qmd_comments(QMD, comments)
+    if expected is not None:
+        assert out == expected
+
+
+def test_no_trailing_newline():
+    qmd = "ligne un\nligne deux"
+    comments = [("fin", ""), ("deux", "deux")]
+    assert inject_qmd_comments(qmd, comments) == baseline_inject_qmd_comments(qmd, comments)
+
+
+@pytest.mark.parametrize("tex_name", sorted(p.name for p in FISCALITE_TEX_DIR.glob("*.tex")))
+def test_fiscalite_chapters_match_baseline(tex_name):
+    comments = extract_tex_comments(read_tex(FISCALITE_TEX_DIR / tex_name))
+    for qmd_path in sorted(FISCALITE_QMD_DIR.rglob("*.qmd")):
+        qmd = qmd_path.read_text(encoding="utf-8")
+        assert inject_qmd_comments(qmd, comments) == baseline_inject_qmd_comments(qmd, comments), qmd_path.name
@@ -0,0 +1,46 @@
+"""Regression tests for tex2qmd.convert.extract_tex_label_captions.
+
+data/label_captions.json holds the label -> caption dict of every .tex under source/, as
+returned by the implementation that sliced the text at every backslash (before the
+single-pass scanner). Regenerate it only for an intended change of output.
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+from tex2qmd.backend import read_tex
+from tex2qmd.convert import extract_tex_label_captions
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SOURCE_DIR = REPO_ROOT / "source"
+EXPECTED = json.loads((Path(__file__).parent / "data" / "label_captions.json").read_text(encoding="utf-8"))
+SOURCES = sorted(p.relative_to(SOURCE_DIR).as_posix() for p in SOURCE_DIR.rglob("*.tex"))
+
+
+@pytest.mark.parametrize("name", SOURCES)
+def test_source_file_captions_unchanged(name):
+    assert name in EXPECTED, f"{name} is not in data/label_captions.json"
+    assert extract_tex_label_captions(read_tex(SOURCE_DIR / name)) == EXPECTED[name]
+
+
+@pytest.mark.parametrize(
+    "tex, expected",
+    [
+        (r"\caption{Simple title\label{t1}}", {"t1": "Simple title"}),
+        (r"\caption { Spaced \label { sp } }", {"sp": "Spaced"}),
+        (r"\caption{Title with {nested} braces \label{t2}}", {"t2": "Title with {nested} braces"}),
+        # A \label inside nested braces only counts as braces
+        (r"\caption{Outer {inner \label{deep}} tail \label{t3}}", {"t3": r"Outer {inner \label{deep}} tail"}),
+        # An escaped \{ opens a level and restarts the caption after it
+        (r"\caption{\{ set \} title \label{t4}}", {"t4": r"set \} title"}),
+        (r"\caption{Before \{ escaped brace \label{t5}}", {}),
+        (r"\begin{tab}[h]{Table title\label{tab:x}}", {"tab:x": "Table title"}),
+        (r"\begin{fig}[width=3]{Figure title \\ \label{fig:y}}", {"fig:y": "Figure title \\"}),
+        (r"\caption{\label{empty}}", {}),
+        (r"\caption{One\label{a}} text \caption{Two\label{b}}", {"a": "One", "b": "Two"}),
+        (r"\caption{Unclosed \label{u}", {"u": "Unclosed"}),
+    ],
+)
+def test_edge_cases(tex, expected):
+    assert extract_tex_label_captions(tex) == expected
@@ -0,0 +1,88 @@
+"""Tests for tex2qmd.legislation.link_legislation_citations.
+
+Matching is leftmost-longest: the scan takes the first position where a pattern starts and,
+there, the longest pattern. A phrase already followed by its ' [@key]' is left as is, so
+linking twice changes nothing.
+"""
+from pathlib import Path
+
+import pytest
+
+from tex2qmd.legislation import LEGISLATION_ENTRIES, link_legislation_citations
+
+CHAPTERS_DIR = Path(__file__).resolve().parent.parent / "quarto" / "fiscalite" / "chapters"
+
+
+def entry(key: str, *patterns: str) -> dict:
+    return {"key": key, "patterns": list(patterns), "title": key, "issued": "2000-01-01"}
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("la loi du 15 juillet 1914 crée l'impôt", "la loi du 15 juillet 1914 [@loi1914] crée l'impôt"),
+        # Longest pattern at a position: the "(-1352" form, cited once after it
+        (
+            "L'article 74 de la loi de finances pour 2001 (-1352 du 30 décembre 2000)",
+            "L'article 74 de la loi de finances pour 2001 (-1352 [@loi2001] du 30 décembre 2000)",
+        ),
+        ("la loi de finances pour 2001 prévoit", "la loi de finances pour 2001 [@loi2001] prévoit"),
+        # Leftmost wins: "article 190 de la loi 2010-1657" starts before the longer
+        # "loi 2010-1657 du 29 décembre 2010", which is then not cited a second time
+        (
+            "l'article 190 de la loi 2010-1657 du 29 décembre 2010 de finances",
+            "l'article 190 de la loi 2010-1657 [@loi2010-1657] du 29 décembre 2010 de finances",
+        ),
+        (
+            "la loi 2010-1657 du 29 décembre 2010 de finances",
+            "la loi 2010-1657 du 29 décembre 2010 [@loi2010-1657] de finances",
+        ),
+        (
+            "le projet de loi de finances pour 2013 puis la loi de finances pour 2014",
+            "le projet de loi de finances pour 2013 [@loi2013] puis la loi de finances pour 2014 [@loi2014]",
+        ),
+        ("aucune référence ici", "aucune référence ici"),
+    ],
+)
+def test_real_entries(text, expected):
+    assert link_legislation_citations(text, LEGISLATION_ENTRIES) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "la loi de finances pour 2001 (-1352 du 30 décembre 2000) et la loi du 14 mars 1942",
+        "l'article 190 de la loi 2010-1657 du 29 décembre 2010",
+        "la loi 97-1269, la loi 97-1269 et la loi de finances de 1998",
+    ],
+)
+def test_linking_twice_changes_nothing(text):
+    once = link_legislation_citations(text, LEGISLATION_ENTRIES)
+    assert "] [@" not in once
+    assert link_legislation_citations(once, LEGISLATION_ENTRIES) == once
+
+
+@pytest.mark.parametrize("chapter", sorted(p.relative_to(CHAPTERS_DIR).as_posix() for p in CHAPTERS_DIR.rglob("*.qmd")))
+def test_committed_chapters_already_linked(chapter):
+    content = (CHAPTERS_DIR / chapter).read_text(encoding="utf-8")
+    assert link_legislation_citations(content, LEGISLATION_ENTRIES) == content
+
+
+@pytest.mark.parametrize("order", ["short-first", "long-first"])
+def test_prefix_pattern_does_not_win_over_longer_one(order):
+    entries = [entry("court", "décret n° 99"), entry("long", "décret n° 99-12 du 3 mars 1999")]
+    if order == "long-first":
+        entries.reverse()
+    text = "le décret n° 99-12 du 3 mars 1999 et le décret n° 99 seul"
+    assert link_legislation_citations(text, entries) == (
+        "le décret n° 99-12 du 3 mars 1999 [@long] et le décret n° 99 [@court] seul"
+    )
+
+
+def test_duplicate_pattern_keeps_first_entry():
+    entries = [entry("premier", "loi X"), entry("second", "loi X")]
+    assert link_legislation_citations("la loi X", entries) == "la loi X [@premier]"
+
+
+def test_no_patterns():
+    assert link_legislation_citations("la loi X", [entry("vide")]) == "la loi X"
@@ -0,0 +1,54 @@
+"""load_manifest: environment variables in book paths, TEX2QMD_SOURCE_DIR in quarto/books.yml."""
+import json
+from pathlib import Path
+
+import pytest
+
+from tex2qmd.book import load_manifest
+
+SOURCE_DIR_ENV_VAR = "TEX2QMD_SOURCE_DIR"
+BOOKS_YML = Path(__file__).resolve().parent.parent / "quarto" / "books.yml"
+
+
+def write_manifest(tmp_path: Path, source_dir: str) -> Path:
+    path = tmp_path / "books.json"
+    book = {"name": "demo", "source_dir": source_dir, "out_dir": "out", "chapters": []}
+    path.write_text(json.dumps({"books": [book]}), encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("value", [None, ""])
+def test_default_when_variable_unset_or_empty(tmp_path, monkeypatch, value):
+    if value is None:
+        monkeypatch.delenv("DEMO_SOURCES", raising=False)
+    else:
+        monkeypatch.setenv("DEMO_SOURCES", value)
+    (book,) = load_manifest(write_manifest(tmp_path, "${DEMO_SOURCES:-../source/demo}"))
+    assert book.source_dir == (tmp_path / "../source/demo").resolve()
+    assert book.out_dir == tmp_path / "out"
+
+
+def test_variable_overrides_default(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEMO_SOURCES", str(tmp_path / "ailleurs"))
+    (book,) = load_manifest(write_manifest(tmp_path, "${DEMO_SOURCES:-../source/demo}"))
+    assert book.source_dir == tmp_path / "ailleurs"
+
+
+def test_relative_variable_and_plain_vars(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEMO_SOURCES", "rel")
+    monkeypatch.setenv("DEMO_ROOT", str(tmp_path / "racine"))
+    (book,) = load_manifest(write_manifest(tmp_path, "${DEMO_SOURCES:-$DEMO_ROOT}"))
+    assert book.source_dir == tmp_path / "rel"
+    monkeypatch.delenv("DEMO_SOURCES")
+    (book,) = load_manifest(write_manifest(tmp_path, "${DEMO_SOURCES:-$DEMO_ROOT}/Chapitres"))
+    assert book.source_dir == tmp_path / "racine" / "Chapitres"
+
+
+def test_books_yml_follows_source_dir_variable(tmp_path, monkeypatch):
+    pytest.importorskip("yaml")
+    monkeypatch.delenv(SOURCE_DIR_ENV_VAR, raising=False)
+    books = {book.name: book for book in load_manifest(BOOKS_YML)}
+    assert books["fiscalite"].source_dir == (BOOKS_YML.parent / "../source/Fiscalité/Chapitres").resolve()
+    monkeypatch.setenv(SOURCE_DIR_ENV_VAR, str(tmp_path))
+    books = {book.name: book for book in load_manifest(BOOKS_YML)}
+    assert books["fiscalite"].source_dir == tmp_path
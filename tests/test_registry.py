@@ -0,0 +1,82 @@
+"""Precomputed OpenFisca tables: staleness on spec changes and unchanged rebuilds.
+
+TableSpec.build is replaced by a fake so that no openfisca-france is needed: the table
+content only depends on the spec's start year.
+"""
+import os
+
+import pytest
+
+from quarto.openfisca_tables import registry
+from quarto.openfisca_tables.registry import (
+    TABLE_REGISTRY,
+    TABLES_MANIFEST,
+    TableSpec,
+    build_all_tables,
+    get_table,
+    register_table,
+    tables_dir,
+)
+from quarto.openfisca_tables.table import Table
+
+STATIC_MD = "| Taux | 2000 |\n|---|---|\n| Normal | statique |\n"
+
+
+@pytest.fixture
+def book(tmp_path, monkeypatch):
+    (tmp_path / "chapters" / "demo" / "tables").mkdir(parents=True)
+    (tmp_path / "chapters" / "__init__.py").write_text("")
+    (tmp_path / "chapters" / "demo" / "tables" / "taux_static.md").write_text(STATIC_MD, encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(TableSpec, "build", lambda spec: Table(("Taux", str(spec.start_year)), [("Normal", "calculé")]))
+    monkeypatch.setattr(registry, "parameters_available", lambda: False)
+    monkeypatch.setattr(registry, "openfisca_france_version", lambda: "1.0")
+    yield tmp_path
+    TABLE_REGISTRY.pop("taux", None)
+
+
+def register(start_year: int, label: str = "Normal") -> TableSpec:
+    return register_table("taux", [("parameters/demo/taux.yaml", label)], "Taux", start_year, "chapters/demo/tables/taux_static.md")
+
+
+def test_precomputed_table_is_used(book, capsys):
+    build_all_tables(book, [register(2000)])
+    assert get_table("taux").columns == ("Taux", "2000")
+    assert "using precomputed table" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(
+    "changed",
+    [
+        lambda: register(2005),
+        lambda: register(2000, label="Taux normal"),
+        lambda: register_table("taux", [("parameters/demo/autre.yaml", "Normal")], "Taux", 2000, "chapters/demo/tables/taux_static.md"),
+    ],
+)
+def test_changed_spec_makes_table_stale(book, capsys, changed):
+    build_all_tables(book, [register(2000)])
+    changed()
+    assert get_table("taux") == Table(("Taux", "2000"), [("Normal", "statique")])
+    err = capsys.readouterr().err
+    assert "is stale" in err
+    assert "fallback to static table" in err
+
+
+def test_other_openfisca_version_is_stale(book, monkeypatch, capsys):
+    build_all_tables(book, [register(2000)])
+    monkeypatch.setattr(registry, "openfisca_france_version", lambda: "2.0")
+    get_table("taux")
+    assert "fallback to static table" in capsys.readouterr().err
+
+
+def test_unchanged_rebuild_keeps_artifacts(book):
+    build_all_tables(book, [register(2000)])
+    out_dir = tables_dir(book)
+    paths = [out_dir / "taux.md", out_dir / "taux.html", out_dir / TABLES_MANIFEST]
+    for path in paths:
+        os.utime(path, ns=(0, 0))
+    build_all_tables(book, [register(2000)])
+    assert all(path.stat().st_mtime_ns == 0 for path in paths)
+    build_all_tables(book, [register(2005)])
+    assert all(path.stat().st_mtime_ns != 0 for path in paths)
+    assert not list(out_dir.glob("*.tmp"))
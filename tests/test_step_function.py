@@ -0,0 +1,175 @@
+"""StepFunction lookups and change periods against the year-by-year scan they replaced.
+
+baseline_value_at_year and baseline_years_where_any_change are the implementations before
+the step functions (kept here verbatim as the reference); the bisect versions must give the
+same values and change years, null entries and dates not on January 1 included.
+"""
+import datetime
+from typing import Any
+
+import pytest
+
+from openfisca_tables.core import (
+    StepFunction,
+    _years_where_any_change,
+    periods_where_any_change,
+    value_at_date,
+    value_at_year,
+)
+
+
+def baseline_value_at_year(param_data: dict[str, Any], year: int) -> float | None:
+    if not param_data or "values" not in param_data:
+        return None
+
+    def _date_key(d: Any) -> Any:
+        return d if hasattr(d, "year") else str(d)
+
+    dates = sorted(param_data["values"].keys(), key=_date_key, reverse=True)
+    for d in dates:
+        y = d.year if hasattr(d, "year") else int(str(d)[:4])
+        if y <= year:
+            v = param_data["values"][d]
+            if isinstance(v, dict) and v.get("value") is not None:
+                return float(v["value"])
+            if isinstance(v, (int, float)):
+                return float(v)
+    return None
+
+
+def baseline_years_where_any_change(start_year: int, param_data_list: list, max_year: int) -> list[int]:
+    def profile(y: int) -> tuple[float | None, ...]:
+        return tuple(baseline_value_at_year(data, y) for _label, data in param_data_list)
+
+    change_years = [start_year]
+    for y in range(start_year + 1, max_year + 1):
+        if profile(y) != profile(y - 1):
+            change_years.append(y)
+    return change_years
+
+
+PARAMS = {
+    "january": {"values": {"2000-01-01": 0.1, "2005-01-01": 0.2, "2012-01-01": {"value": 0.25}}},
+    "mid_year": {"values": {"2000-07-01": 5, "2003-04-15": 6, "2003-10-01": 7, "2010-12-31": 8}},
+    "null_entries": {"values": {"1998-01-01": {"value": 1.5}, "2002-01-01": {"value": None}, "2006-01-01": 2.0, "2008-01-01": None}},
+    "null_first": {"values": {"2001-01-01": {"value": None}, "2004-06-01": 3}},
+    "unsorted": {"values": {"2015-01-01": 30, "1995-01-01": 10, "2005-03-01": 20}},
+    "date_keys": {"values": {datetime.date(1999, 1, 1): 1, datetime.date(2009, 9, 1): {"value": 2}}},
+    "same_value_again": {"values": {"2000-01-01": 4, "2004-01-01": 4, "2007-01-01": 5}},
+    "metadata_only": {"values": {"2003-01-01": {"value": 9, "metadata": {"reference": "x"}}}},
+    "empty": {"values": {}},
+    "no_values": {"description": "pas de valeurs"},
+}
+YEARS = range(1990, 2021)
+
+
+@pytest.mark.parametrize("name", sorted(PARAMS))
+def test_value_at_year_matches_baseline(name):
+    for year in YEARS:
+        assert value_at_year(PARAMS[name], year) == baseline_value_at_year(PARAMS[name], year), year
+
+
+@pytest.mark.parametrize(
+    "name, year, expected",
+    [
+        ("january", 1999, None),  # before the first breakpoint
+        ("january", 2000, 0.1),
+        ("january", 2012, 0.25),
+        ("mid_year", 2000, 5.0),  # a change during the year counts for that year
+        ("mid_year", 2003, 7.0),  # the latest of two changes in the same year
+        ("null_entries", 2003, 1.5),  # null keeps the previous value
+        ("null_entries", 2010, 2.0),
+        ("null_first", 2002, None),
+    ],
+)
+def test_value_at_year(name, year, expected):
+    assert value_at_year(PARAMS[name], year) == expected
+
+
+@pytest.mark.parametrize(
+    "name, when, expected",
+    [
+        ("mid_year", datetime.date(2000, 6, 30), None),
+        ("mid_year", datetime.date(2000, 7, 1), 5.0),
+        ("mid_year", datetime.date(2003, 4, 14), 5.0),
+        ("mid_year", datetime.date(2003, 4, 15), 6.0),
+        ("mid_year", datetime.date(2003, 12, 1), 7.0),
+        ("null_entries", datetime.date(2002, 6, 1), 1.5),
+        ("null_first", datetime.date(2004, 5, 31), None),
+        ("empty", datetime.date(2004, 5, 31), None),
+    ],
+)
+def test_value_at_date(name, when, expected):
+    assert value_at_date(PARAMS[name], when) == expected
+
+
+@pytest.mark.parametrize(
+    "names",
+    [
+        ("january",),
+        ("mid_year",),
+        ("null_entries",),
+        ("null_first", "january"),
+        ("unsorted", "date_keys", "same_value_again"),
+        ("metadata_only", "empty", "no_values"),
+        tuple(sorted(PARAMS)),
+    ],
+)
+@pytest.mark.parametrize("start_year", [1990, 2000, 2003, 2010])
+def test_years_where_any_change_matches_baseline(names, start_year):
+    param_data_list = [(name, PARAMS[name]) for name in names]
+    assert _years_where_any_change(start_year, param_data_list, 2020) == baseline_years_where_any_change(
+        start_year, param_data_list, 2020
+    )
+
+
+def test_years_where_any_change_skips_equal_values():
+    # 2004 repeats the 2000 value: not a change
+    assert _years_where_any_change(1999, [("p", PARAMS["same_value_again"])], 2010) == [1999, 2000, 2007]
+
+
+def _scan(start: datetime.date, steps: list[StepFunction], granularity: str, end: datetime.date) -> list[datetime.date]:
+    """Reference for month and day granularity: compare every period with the previous one."""
+    def next_period(d: datetime.date) -> datetime.date:
+        if granularity == "month":
+            return datetime.date(d.year + d.month // 12, d.month % 12 + 1, 1)
+        return d + datetime.timedelta(days=1)
+
+    def last_day(d: datetime.date) -> datetime.date:
+        return next_period(d) - datetime.timedelta(days=1)
+
+    period = start if granularity == "day" else start.replace(day=1)
+    out = [period]
+    previous = tuple(step.at(last_day(period)) for step in steps)
+    period = next_period(period)
+    while period <= end:
+        current = tuple(step.at(last_day(period)) for step in steps)
+        if current != previous:
+            out.append(period)
+        previous = current
+        period = next_period(period)
+    return out
+
+
+@pytest.mark.parametrize("granularity", ["month", "day"])
+@pytest.mark.parametrize("start", [datetime.date(1995, 1, 1), datetime.date(2003, 4, 20), datetime.date(2003, 10, 1)])
+def test_sub_year_periods_match_scan(granularity, start):
+    steps = [StepFunction.from_param_data(PARAMS[name]) for name in ("mid_year", "null_entries", "date_keys")]
+    end = datetime.date(2012, 12, 31)
+    assert periods_where_any_change(start, steps, granularity, end) == _scan(start, steps, granularity, end)
+
+
+def test_month_periods():
+    steps = [StepFunction.from_param_data(PARAMS["mid_year"])]
+    assert periods_where_any_change(datetime.date(2000, 1, 1), steps, "month") == [
+        datetime.date(2000, 1, 1),
+        datetime.date(2000, 7, 1),
+        datetime.date(2003, 4, 1),
+        datetime.date(2003, 10, 1),
+        datetime.date(2010, 12, 1),
+    ]
+
+
+def test_unknown_granularity():
+    with pytest.raises(ValueError):
+        periods_where_any_change(datetime.date(2000, 1, 1), [], "week")
@@ -0,0 +1,111 @@
+"""Direct tests of the tabular repair: grid output, column types and quality figures."""
+import pytest
+
+from tex2qmd.convert import fix_tabular_blocks
+from tex2qmd.tabular import (
+    AMOUNT,
+    PERCENT,
+    TABLE_MALFORMED_COMMENT,
+    TEXT,
+    YEAR,
+    column_kind,
+    parse_tabular,
+    tabular_quality,
+)
+
+RATES = (
+    "Année & Taux normal & Plafond annuel & Remarque \\\\\n"
+    "2001 & 5,5 % & 1 200 € & réduit \\\\\n"
+    "2012 & 7 % & 15 € & \\\\\n"
+)
+
+
+def test_grid_right_aligns_numeric_columns():
+    table = parse_tabular(RATES)
+    assert not table.malformed
+    assert table.kinds == [YEAR, PERCENT, AMOUNT, TEXT]
+    assert table.to_markdown("grid") == "\n".join([
+        "+-------+-------------+----------------+----------+",
+        "| Année | Taux normal | Plafond annuel | Remarque |",
+        "+======:+============:+===============:+==========+",
+        "| 2001  | 5,5 %       | 1 200 €        | réduit   |",
+        "+-------+-------------+----------------+----------+",
+        "| 2012  | 7 %         | 15 €           |          |",
+        "+-------+-------------+----------------+----------+",
+    ])
+
+
+def test_pipe_is_the_default():
+    table = parse_tabular(RATES)
+    assert table.to_markdown() == "\n".join([
+        "| Année | Taux normal | Plafond annuel | Remarque |",
+        "|---|---|---|---|",
+        "| 2001 | 5,5 % | 1 200 € | réduit |",
+        "| 2012 | 7 % | 15 € |  |",
+    ])
+    with pytest.raises(ValueError):
+        table.to_markdown("html")
+
+
+def test_table_without_rows():
+    table = parse_tabular("Année & Taux normal \\\\\n")
+    assert (table.ncols, table.nrows, table.rows()) == (2, 0, [])
+    assert table.to_pipe() == "| Année | Taux normal |\n|---|---|"
+    # No body: the header is closed by a plain rule, not a header separator
+    assert table.to_grid() == "+-------+-------------+\n| Année | Taux normal |\n+-------+-------------+"
+    assert table.stats()["cells"] == 2
+    assert tabular_quality([table])["empty_cell_rate"] == 0
+
+
+@pytest.mark.parametrize(
+    "cells, kind",
+    [
+        (["1998", "2001", ""], YEAR),
+        (["5,5 %", "19,6\\%", "-2 %"], PERCENT),
+        (["1 200 €", "15", "3,5 M€"], AMOUNT),
+        (["2001", "5,5 %"], TEXT),  # years and percents mixed
+        (["1 200 €", "exonéré"], TEXT),  # an amount and a word
+        (["", ""], TEXT),  # nothing to infer from
+        (["", "7 %", ""], PERCENT),  # empty cells do not count
+    ],
+)
+def test_column_kind(cells, kind):
+    assert column_kind(cells) == kind
+
+
+def test_quality_of_malformed_table():
+    # Header spread over one cell of four, a short row padded
+    table = parse_tabular("A & & & \\\\\n2001 & 1 & 2 \\\\\n2002 & 3 & 4 & 5 \\\\\n")
+    assert table.malformed
+    assert table.header == ["A", "", "", ""]
+    assert table.to_pipe().startswith(TABLE_MALFORMED_COMMENT + "\n")
+    assert table.stats() == {
+        "ncols": 4,
+        "nrows": 2,
+        "header_rows": 1,
+        "header_fill": 0.25,
+        "typed_columns": 4,
+        "empty_cells": 1,
+        "cells": 12,
+        "padded_cells": 1,
+        "malformed": True,
+    }
+    quality = tabular_quality([table, parse_tabular(RATES)])
+    assert quality["tables"] == 2
+    assert quality["malformed"] == 1
+    assert quality["malformed_rate"] == 0.5
+    assert quality["header_fill"] == pytest.approx((0.25 + 1) / 2)
+    assert quality["typed_column_rate"] == pytest.approx(7 / 8)
+    assert quality["padded_cell_rate"] == pytest.approx(1 / 24)
+
+
+def test_quality_of_no_tables():
+    assert tabular_quality([])["tables"] == 0
+
+
+def test_fix_tabular_blocks_grid():
+    content = "Avant\n\n::: tabular\n" + RATES + ":::\n\nAprès\n"
+    out = fix_tabular_blocks(content, "grid")
+    assert "::: tabular" not in out
+    assert "+======:+============:+===============:+==========+" in out
+    assert out.startswith("Avant\n\n+---") and out.endswith("\n\nAprès\n")